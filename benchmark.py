@@ -0,0 +1,453 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timezone
+
+# Benchmarks offline: o Gemini é trocado por um LLM falso, determinístico e com latência configurável,
+# e cada cenário roda num processo próprio, num diretório temporário (banco, cache e índice novos).
+# O resultado é um JSON com as métricas de cada cenário; --comparar mostra a variação contra uma execução anterior.
+#
+# Uso:
+#   python benchmark.py --saida base.json
+#   python benchmark.py --cenarios consultar_tabela --linhas 10000,100000,1000000 --comparar base.json
+
+FORMATO = 1
+diretorio_repositorio = os.path.dirname(os.path.abspath(__file__))
+VOCABULARIO = ("copel", "banco", "viagem", "patagônia", "passaporte", "consulado", "leite", "agentes", "workflow",
+               "chunking", "embeddings", "estratégia", "reunião", "orçamento", "projeto", "artigo", "curso",
+               "python", "sqlite", "telegram", "ideia", "tarefa", "informação", "camadas", "energia", "crédito")
+
+### LLM FALSO ###
+
+def _frases(texto: str) -> list:
+    return [f.strip() for f in texto.replace("\n", " ").split(".") if f.strip()]
+
+_ITEM_DO_LOTE = re.compile(r'<item id="(\d+)">\n(.*?)\n</item>', re.DOTALL)
+
+def _campos_da_proposta(texto: str) -> dict:
+    frases = _frases(texto) or [texto]
+    semente = hashlib.sha256(texto.encode("utf-8")).digest()[0]
+    return {
+        "informacoes": frases[:2],
+        "ideias": [f"Explorar {frases[0][:40]}"] if semente % 2 else [],
+        "tarefas": [f"Revisar {frases[-1][:40]}"],
+    }
+
+class _SaidaEstruturadaFalsa:
+    """Substitui llm.with_structured_output(...): a proposta depende só do texto do item.
+
+    Na extração em lote (PropostasEmLote) responde uma proposta por <item>; a latência cresce
+    um quarto por item extra, como a geração de mais tokens de saída.
+    """
+
+    def __init__(self, esquema, latencia: float):
+        self.esquema = esquema
+        self.latencia = latencia
+
+    def _resposta(self, mensagens):
+        texto = str(mensagens[-1].content)
+        if "propostas" in self.esquema.model_fields:
+            from graph import PropostaDeItem
+            itens = _ITEM_DO_LOTE.findall(texto)
+            propostas = [PropostaDeItem(item_id=int(item_id), **_campos_da_proposta(conteudo)) for item_id, conteudo in itens]
+            return self.esquema(propostas=propostas), len(itens)
+        return self.esquema(**_campos_da_proposta(texto.split("Texto para análise:\n")[-1])), 1
+
+    def invoke(self, mensagens, config=None):
+        resposta, itens = self._resposta(mensagens)
+        time.sleep(self.latencia * (1 + 0.25 * (itens - 1)))
+        return resposta
+
+    async def ainvoke(self, mensagens, config=None):
+        resposta, itens = self._resposta(mensagens)
+        await asyncio.sleep(self.latencia * (1 + 0.25 * (itens - 1)))
+        return resposta
+
+class _ChatFalso:
+    """Substitui llm.bind_tools(...) do bot: chama ferramentas por palavras-chave, como faria o modelo.
+
+    Em streaming, o texto sai em pedaços de algumas palavras ao longo da mesma latência total.
+    """
+
+    PALAVRAS_POR_PEDACO = 3
+
+    def __init__(self, latencia: float):
+        self.latencia = latencia
+        self.chamadas = 0
+
+    def _resposta(self, mensagens):
+        from langchain_core.messages import AIMessage
+        self.chamadas += 1
+        ultima = mensagens[-1]
+        if ultima.type == "tool":
+            return AIMessage(content=f"Pronto! {ultima.content}")
+        texto = str(ultima.content)
+        if texto.lower().startswith("anote"):
+            chamada = {"name": "adicionar_na_caixa_entrada", "args": {"conteudo": texto[6:]}, "id": "chamada-1"}
+            return AIMessage(content="", tool_calls=[chamada])
+        if "quantos" in texto.lower():
+            return AIMessage(content="", tool_calls=[{"name": "verificar_status_caixa_entrada", "args": {}, "id": "chamada-1"}])
+        return AIMessage(content=f"Entendi: {texto[:80]}")
+
+    async def ainvoke(self, mensagens, config=None):
+        await asyncio.sleep(self.latencia)
+        return self._resposta(mensagens)
+
+    async def astream(self, mensagens, config=None):
+        from langchain_core.messages import AIMessageChunk
+        resposta = self._resposta(mensagens)
+        if resposta.tool_calls:
+            await asyncio.sleep(self.latencia)
+            yield AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(resposta.tool_calls)
+            ])
+            return
+        palavras = resposta.content.split(" ")
+        pedacos = [" ".join(palavras[i:i + self.PALAVRAS_POR_PEDACO]) + " "
+                   for i in range(0, len(palavras), self.PALAVRAS_POR_PEDACO)]
+        for pedaco in pedacos:
+            await asyncio.sleep(self.latencia / len(pedacos))
+            yield AIMessageChunk(content=pedaco)
+
+class LLMFalso:
+    def __init__(self, latencia: float):
+        self.latencia = latencia
+
+    def with_structured_output(self, esquema):
+        return _SaidaEstruturadaFalsa(esquema, self.latencia)
+
+    def bind_tools(self, ferramentas):
+        return _ChatFalso(self.latencia)
+
+def instalar_llm_falso(latencia: float) -> None:
+    """Troca os clientes do Gemini (graph e bot) pelo LLM falso."""
+    import graph
+    graph.llmodel = LLMFalso(latencia)
+    if "infos_n_tasks" in sys.modules:
+        bot = sys.modules["infos_n_tasks"]
+        bot.llm_with_tools = LLMFalso(latencia).bind_tools(bot.FERRAMENTAS)
+
+### DADOS SINTÉTICOS ###
+
+def texto_sintetico(aleatorio: random.Random, frases: int = 2) -> str:
+    return ". ".join(" ".join(aleatorio.choices(VOCABULARIO, k=8)).capitalize() for _ in range(frases)) + "."
+
+def popular(classe, quantidade: int, coluna: str = "conteudo", semente: int = 42) -> None:
+    """Insere `quantidade` linhas sintéticas em lotes (executemany), com conteúdo único por linha."""
+    from sqlalchemy import insert
+    from modelo import nova_sessao
+    aleatorio = random.Random(semente)
+    for inicio in range(0, quantidade, 10000):
+        fim = min(inicio + 10000, quantidade)
+        with nova_sessao() as sessao:
+            sessao.execute(insert(classe), [{coluna: f"{texto_sintetico(aleatorio)} #{i}"} for i in range(inicio, fim)])
+
+def percentis(amostras_s: list) -> dict:
+    """p50, p95 e máximo, em milissegundos."""
+    ordenadas = sorted(amostras_s)
+    p95 = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))]
+    return {"p50_ms": statistics.median(ordenadas) * 1000, "p95_ms": p95 * 1000, "max_ms": ordenadas[-1] * 1000}
+
+### CENÁRIOS ###
+# Cada cenário recebe os parâmetros e retorna um dicionário de métricas (números).
+
+def cenario_esvaziar_caixa(itens: int, workers: int, latencia_llm: float) -> dict:
+    """Vazão do processamento em lote da Caixa de Entrada até a fila esvaziar."""
+    from modelo import CaixaEntrada
+    import processamento_lote
+    popular(CaixaEntrada, itens, coluna="conteudo_bruto")
+    instalar_llm_falso(latencia_llm)
+    processamento_lote.INTERVALO_RELATORIO = 3600
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        progresso = asyncio.run(processamento_lote.processar_lote(workers))
+    segundos = time.perf_counter() - inicio
+    from metricas import metricas
+    series = metricas.resumo()["series"]
+    chamadas = sum(series.get(nome, {}).get("contagem", 0) for nome in ("llm.extracao", "llm.extracao_lote"))
+    return {"segundos": segundos, "itens_por_minuto": progresso.concluidos / segundos * 60, "erros": progresso.erros,
+            "chamadas_llm": chamadas}
+
+def cenario_aplicar_proposta(itens: int) -> dict:
+    """Vazão de gravação de propostas aprovadas (aplicar_proposta, incluindo o índice semântico)."""
+    from modelo import CaixaEntrada
+    from graph import SuggestionClasses, aplicar_proposta
+    from fila_caixa_entrada import reivindicar_varios
+    popular(CaixaEntrada, itens, coluna="conteudo_bruto")
+    # Os itens são aplicados sob o lease de quem os reivindicou, como na revisão pela CLI ou pelo bot
+    dono = "benchmark"
+    reivindicar_varios(dono, itens)
+    aleatorio = random.Random(7)
+    propostas = [SuggestionClasses(informacoes=[f"{texto_sintetico(aleatorio, 1)} #{i}"],
+                                   ideias=[texto_sintetico(aleatorio, 1)],
+                                   tarefas=[texto_sintetico(aleatorio, 1), texto_sintetico(aleatorio, 1)])
+                 for i in range(itens)]
+    amostras = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        aplicar_proposta(propostas[0], 1, dono)  # carrega o índice semântico fora da medição
+        for item_id, proposta in enumerate(propostas[1:], start=2):
+            inicio = time.perf_counter()
+            aplicar_proposta(proposta, item_id, dono)
+            amostras.append(time.perf_counter() - inicio)
+    return {"propostas_por_segundo": len(amostras) / sum(amostras), **percentis(amostras)}
+
+def cenario_consultar_tabela(linhas: int) -> dict:
+    """Primeira página, página profunda e varredura completa da listagem de Tarefas."""
+    import builtins
+    from modelo import Tarefa
+    from db_interface import consultar_tabela, iterar_tabela, listar_pagina
+    popular(Tarefa, linhas)
+    entrada_original = builtins.input
+    builtins.input = lambda *_: "q"
+    try:
+        amostras = []
+        for _ in range(20):
+            inicio = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                consultar_tabela(Tarefa, "Tarefas")
+            amostras.append(time.perf_counter() - inicio)
+    finally:
+        builtins.input = entrada_original
+    inicio = time.perf_counter()
+    for _ in range(20):
+        listar_pagina(Tarefa, apos_id=linhas - 100)
+    pagina_profunda = (time.perf_counter() - inicio) / 20
+    inicio = time.perf_counter()
+    total = sum(1 for _ in iterar_tabela(Tarefa))
+    varredura = time.perf_counter() - inicio
+    return {"primeira_pagina_ms": statistics.median(amostras) * 1000, "pagina_profunda_ms": pagina_profunda * 1000,
+            "varredura_linhas_por_segundo": total / varredura}
+
+def cenario_processar_informacao(ideias: int) -> dict:
+    """Tempo do agente de transformação (ideias relacionadas a uma Informação) conforme o número de Ideias."""
+    from modelo import Ideia, Informacao, processar_informacao
+    popular(Ideia, ideias)
+    aleatorio = random.Random(11)
+    informacoes = [Informacao(conteudo=texto_sintetico(aleatorio, 1)) for _ in range(30)]
+    amostras = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for informacao in informacoes:
+            inicio = time.perf_counter()
+            # Com teto explícito: mede o ranking pelo índice, não o volume de Ideias que casam com o vocabulário sintético
+            processar_informacao(informacao, limite=10)
+            amostras.append(time.perf_counter() - inicio)
+    return percentis(amostras)
+
+def cenario_buscar_vinculos(vetores: int) -> dict:
+    """Latência da busca de vínculos no índice semântico (busca exaustiva: cresce com o número de vetores)."""
+    from indice_semantico import IndiceSemantico
+    indice = IndiceSemantico(os.path.join(os.getcwd(), "indice_benchmark"))
+    aleatorio = random.Random(13)
+    tabelas = ("informacoes", "ideias", "tarefas")
+    for inicio in range(0, vetores, 10000):
+        indice.adicionar([(tabelas[i % 3], i, texto_sintetico(aleatorio, 1))
+                          for i in range(inicio, min(inicio + 10000, vetores))])
+    consultas = [texto_sintetico(aleatorio, 1) for _ in range(240)]
+    uma, lote = [], []
+    for consulta in consultas[:40]:
+        inicio = time.perf_counter()
+        indice.buscar_lote([consulta], k=3, tabelas=["ideias", "tarefas"])
+        uma.append(time.perf_counter() - inicio)
+    # Lote de 8, como ao aplicar uma proposta com vários itens novos
+    for posicao in range(40, 240, 8):
+        inicio = time.perf_counter()
+        indice.buscar_lote(consultas[posicao:posicao + 8], k=3, tabelas=["ideias", "tarefas"])
+        lote.append(time.perf_counter() - inicio)
+    return {**percentis(uma), "lote_8_p50_ms": statistics.median(lote) * 1000}
+
+def cenario_telegram(mensagens: int, latencia_llm: float) -> dict:
+    """Latência do handler de mensagens do bot com Updates sintéticos (conversa e captura na Caixa de Entrada)."""
+    import infos_n_tasks as bot
+    instalar_llm_falso(latencia_llm)
+    usuario = min(bot.allowed_users)
+
+    # Instante da primeira mensagem do bot (provisória, parcial ou completa) para cada Update
+    primeira_resposta = {}
+
+    async def editar(texto, **_):
+        pass
+
+    def update(texto: str, chat_id: int):
+        async def responder(texto_resposta, **_):
+            primeira_resposta.setdefault(id(mensagem), time.perf_counter())
+            return types.SimpleNamespace(edit_text=editar)
+        mensagem = types.SimpleNamespace(text=texto, reply_text=responder)
+        return types.SimpleNamespace(message=mensagem, effective_user=types.SimpleNamespace(id=usuario),
+                                     effective_chat=types.SimpleNamespace(id=chat_id))
+
+    async def acao(**_):
+        pass
+
+    contexto = types.SimpleNamespace(application=types.SimpleNamespace(create_task=asyncio.create_task),
+                                     bot=types.SimpleNamespace(send_chat_action=acao))
+
+    async def medir(textos, chat_id, ate_primeira=None):
+        amostras = []
+        for texto in textos:
+            atualizacao = update(texto, chat_id)
+            inicio = time.perf_counter()
+            await bot.process_message_with_llm(atualizacao, contexto)
+            amostras.append(time.perf_counter() - inicio)
+            if ate_primeira is not None:
+                ate_primeira.append(primeira_resposta.pop(id(atualizacao.message), time.perf_counter()) - inicio)
+        return amostras
+
+    primeiras = []
+
+    async def executar():
+        conversa = await medir([f"Olá, mensagem {i}" for i in range(mensagens)], 1, primeiras)
+        chamadas_antes = bot.llm_with_tools.chamadas
+        captura = await medir([f"anote {texto_sintetico(random.Random(i), 1)}" for i in range(mensagens)], 2)
+        # Capturas diretas costumam ser atendidas pelo roteador local, sem chamar o LLM
+        chamadas_por_captura = (bot.llm_with_tools.chamadas - chamadas_antes) / mensagens
+        # Vários chats em paralelo: cada um com sua sessão e seu lock
+        inicio = time.perf_counter()
+        await asyncio.gather(*(medir([f"Olá {c}-{i}" for i in range(10)], 100 + c) for c in range(10)))
+        paralelo = time.perf_counter() - inicio
+        return conversa, captura, chamadas_por_captura, paralelo
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        conversa, captura, chamadas_por_captura, paralelo = asyncio.run(executar())
+    # Overhead do bot = latência medida menos as chamadas ao LLM falso (1 na conversa; 1 ou nenhuma na captura)
+    return {
+        **{f"conversa_{k}": v for k, v in percentis(conversa).items()},
+        **{f"captura_{k}": v for k, v in percentis(captura).items()},
+        "conversa_overhead_p50_ms": (statistics.median(conversa) - latencia_llm) * 1000,
+        # Com a resposta progressiva, o primeiro texto aparece antes da resposta completa
+        "conversa_primeira_resposta_p50_ms": statistics.median(primeiras) * 1000,
+        "captura_overhead_p50_ms": (statistics.median(captura) - chamadas_por_captura * latencia_llm) * 1000,
+        "captura_chamadas_llm": chamadas_por_captura,
+        "paralelo_mensagens_por_segundo": 100 / paralelo,
+    }
+
+CENARIOS = {
+    "esvaziar_caixa": cenario_esvaziar_caixa,
+    "aplicar_proposta": cenario_aplicar_proposta,
+    "consultar_tabela": cenario_consultar_tabela,
+    "processar_informacao": cenario_processar_informacao,
+    "buscar_vinculos": cenario_buscar_vinculos,
+    "telegram": cenario_telegram,
+}
+
+def planejar(argumentos) -> list:
+    """Lista de (cenário, parâmetros) a executar."""
+    plano = []
+    for nome in argumentos.cenarios.split(","):
+        if nome == "esvaziar_caixa":
+            plano.append((nome, {"itens": argumentos.itens, "workers": argumentos.workers,
+                                 "latencia_llm": argumentos.latencia_llm}))
+        elif nome == "aplicar_proposta":
+            plano.append((nome, {"itens": argumentos.itens}))
+        elif nome == "consultar_tabela":
+            plano.extend((nome, {"linhas": int(n)}) for n in argumentos.linhas.split(","))
+        elif nome == "processar_informacao":
+            plano.extend((nome, {"ideias": int(n)}) for n in argumentos.ideias.split(","))
+        elif nome == "buscar_vinculos":
+            plano.extend((nome, {"vetores": int(n)}) for n in argumentos.vetores.split(","))
+        elif nome == "telegram":
+            plano.append((nome, {"mensagens": argumentos.mensagens, "latencia_llm": argumentos.latencia_llm}))
+        else:
+            raise SystemExit(f"Cenário desconhecido: {nome}. Disponíveis: {', '.join(CENARIOS)}")
+    return plano
+
+def executar_em_processo_novo(nome: str, parametros: dict) -> dict:
+    """Roda o cenário num interpretador novo, num diretório temporário, e retorna as métricas."""
+    with tempfile.TemporaryDirectory() as diretorio:
+        ambiente = dict(os.environ, PYTHONPATH=diretorio_repositorio)
+        # O bot exige estas variáveis na importação; o LLM falso dispensa a chave do Gemini
+        ambiente.setdefault("TELEGRAM_ALLOWED_USER", "1")
+        ambiente.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+        ambiente.setdefault("GOOGLE_API_KEY", "benchmark")
+        # O LLM falso não tem cota: sem limite de taxa no gateway, mede-se só o custo do nosso código
+        ambiente["LLM_REQUISICOES_POR_MINUTO"] = "0"
+        resultado = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--executar-cenario", nome, json.dumps(parametros)],
+            cwd=diretorio, env=ambiente, capture_output=True, text=True,
+        )
+    if resultado.returncode != 0:
+        raise RuntimeError(f"cenário {nome} falhou:\n{resultado.stderr[-2000:]}")
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=diretorio_repositorio,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def _chave(resultado: dict) -> str:
+    return resultado["cenario"] + json.dumps(resultado["parametros"], sort_keys=True)
+
+def comparar(atual: dict, anterior: dict) -> None:
+    """Imprime a variação percentual de cada métrica em relação à execução anterior."""
+    anteriores = {_chave(r): r["metricas"] for r in anterior["resultados"]}
+    print(f"\n=== Comparação com {anterior.get('commit') or 'execução anterior'} ({anterior['data']}) ===")
+    for resultado in atual["resultados"]:
+        metricas_anteriores = anteriores.get(_chave(resultado))
+        if metricas_anteriores is None:
+            continue
+        print(f"{resultado['cenario']} {resultado['parametros']}")
+        for metrica, valor in resultado["metricas"].items():
+            antes = metricas_anteriores.get(metrica)
+            if antes:
+                print(f"  {metrica}: {antes:.2f} -> {valor:.2f} ({(valor - antes) / antes * 100:+.1f}%)")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks offline com LLM falso.")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--latencia-llm", type=float, default=0.05, help="latência do LLM falso (segundos)")
+    parser.add_argument("--itens", type=int, default=300, help="itens para esvaziar_caixa e aplicar_proposta")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--linhas", default="10000,100000", help="tamanhos da tabela em consultar_tabela")
+    parser.add_argument("--ideias", default="1000,10000,100000", help="quantidades de Ideias em processar_informacao")
+    parser.add_argument("--vetores", default="10000,100000,500000", help="tamanhos do índice em buscar_vinculos")
+    parser.add_argument("--mensagens", type=int, default=50, help="mensagens por tipo no cenário telegram")
+    parser.add_argument("--saida", help="arquivo JSON para gravar os resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--executar-cenario", nargs=2, metavar=("NOME", "PARAMETROS"), help=argparse.SUPPRESS)
+    argumentos = parser.parse_args()
+
+    if argumentos.executar_cenario:
+        # Processo filho: já está no diretório temporário
+        nome, parametros = argumentos.executar_cenario
+        print(json.dumps(CENARIOS[nome](**json.loads(parametros))))
+        return
+
+    relatorio = {
+        "formato": FORMATO,
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": [],
+    }
+    for nome, parametros in planejar(argumentos):
+        print(f"▶ {nome} {parametros}", flush=True)
+        metricas = executar_em_processo_novo(nome, parametros)
+        relatorio["resultados"].append({"cenario": nome, "parametros": parametros, "metricas": metricas})
+        for metrica, valor in metricas.items():
+            print(f"  {metrica}: {valor:.2f}")
+    if argumentos.saida:
+        with open(argumentos.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {argumentos.saida}")
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding="utf-8") as f:
+            comparar(relatorio, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from modelo import nova_sessao, TABELAS_BUSCA
+
+NOMES_TABELAS = {
+    'caixa_de_entrada': "Caixa de Entrada",
+    'informacoes': "Informação",
+    'ideias': "Ideia",
+    'tarefas': "Tarefa",
+}
+_TABELA_POR_CODIGO = {codigo: tabela for tabela, (codigo, _) in TABELAS_BUSCA.items()}
+
+# Palavras sem valor de correspondência (já sem acentos, como saem de normalizar_tokens)
+STOPWORDS = set("""
+a ao aos as ate com como da das de dela dele do dos e ela ele eles em entre era essa esse esta este eu foi
+ha isso isto ja la lhe mais mas me meu minha muito na nas nao no nos o os ou para pela pelo por pra qual
+quando que se sem ser seu sua so sobre tambem te tem tenho ter um uma umas uns vai voce
+""".split())
+
+def normalizar_tokens(texto: str) -> List[str]:
+    """Quebra o texto em palavras minúsculas, sem acentos, sem pontuação e sem stopwords."""
+    sem_acentos = "".join(
+        c for c in unicodedata.normalize("NFKD", texto.lower()) if not unicodedata.combining(c)
+    )
+    return [palavra for palavra in re.findall(r"\w+", sem_acentos) if palavra not in STOPWORDS]
+
+def montar_consulta_fts(termo: str) -> Optional[str]:
+    """Converte o texto livre do usuário numa consulta FTS5 segura: todas as palavras, com prefixo."""
+    palavras = re.findall(r"\w+", termo)
+    if not palavras:
+        return None
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+def buscar(termo: str, tabelas: Optional[List[str]] = None, pagina: int = 1,
+           por_pagina: int = 10) -> Tuple[List[dict], bool]:
+    """Busca textual ranqueada (bm25) em Caixa de Entrada, Informações, Ideias e Tarefas.
+
+    Retorna (resultados da página, se há mais páginas). Cada resultado traz
+    'tabela', 'id', 'trecho' e 'rank' (menor é mais relevante).
+    """
+    consulta = montar_consulta_fts(termo)
+    if consulta is None:
+        return [], False
+    pagina = max(1, pagina)
+
+    filtro = ""
+    params = {"consulta": consulta, "limite": por_pagina + 1, "deslocamento": (pagina - 1) * por_pagina}
+    if tabelas:
+        codigos = [TABELAS_BUSCA[tabela][0] for tabela in tabelas]
+        filtro = f" AND (rowid % 4) IN ({', '.join(str(c) for c in codigos)})"
+
+    with nova_sessao() as sessao:
+        linhas = sessao.execute(text(
+            "SELECT rowid, snippet(busca_fts, 0, '[', ']', '…', 16), bm25(busca_fts) "
+            "FROM busca_fts WHERE busca_fts MATCH :consulta" + filtro +
+            " ORDER BY bm25(busca_fts) LIMIT :limite OFFSET :deslocamento"
+        ), params).all()
+
+    resultados = [
+        {"tabela": _TABELA_POR_CODIGO[rowid % 4], "id": rowid // 4, "trecho": trecho, "rank": rank}
+        for rowid, trecho, rank in linhas[:por_pagina]
+    ]
+    return resultados, len(linhas) > por_pagina
+
+def ideias_relacionadas(texto: str, limite: Optional[int] = None) -> List[Tuple[int, str, float]]:
+    """Retorna (id, conteudo, rank) das Ideias que compartilham palavras com o texto, mais relevantes primeiro
+    (todas, ou só as `limite` primeiras).
+
+    Usa o índice invertido do FTS5 (mantido pelos triggers de `ideias`), então só as Ideias
+    candidatas são lidas; o rank é o bm25, um score no estilo TF-IDF (menor é mais relevante).
+    """
+    palavras = sorted(set(normalizar_tokens(texto)))
+    if not palavras:
+        return []
+    consulta = " OR ".join(f'"{palavra}"' for palavra in palavras)
+    codigo_ideias = TABELAS_BUSCA['ideias'][0]
+    with nova_sessao() as sessao:
+        linhas = sessao.execute(text(
+            "SELECT ideias.id, ideias.conteudo, bm25(busca_fts) FROM busca_fts "
+            "JOIN ideias ON ideias.id = busca_fts.rowid / 4 "
+            f"WHERE busca_fts MATCH :consulta AND busca_fts.rowid % 4 = {codigo_ideias} "
+            # LIMIT -1: sem limite no SQLite
+            "ORDER BY bm25(busca_fts) LIMIT :limite"
+        ), {"consulta": consulta, "limite": -1 if limite is None else limite}).all()
+    return [(ideia_id, conteudo, rank) for ideia_id, conteudo, rank in linhas]
+
+def formatar_resultados(resultados: List[dict]) -> str:
+    """Formata os resultados da busca, um por linha."""
+    return "\n".join(
+        f"[{NOMES_TABELAS[r['tabela']]}] ID: {r['id']} | {r['trecho']}" for r in resultados
+    )
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import sqlite3
+import time
+import unicodedata
+from typing import Optional
+
+# Arquivo separado do conceitos.db: o cache pode ser apagado a qualquer momento sem perda de dados
+cache_path = os.path.join(os.getcwd(), 'cache_propostas.db')
+
+# Limites de despejo (eviction): quantidade máxima de entradas e idade máxima em dias
+MAX_ITENS = int(os.getenv("CACHE_PROPOSTAS_MAX_ITENS", "5000"))
+MAX_DIAS = float(os.getenv("CACHE_PROPOSTAS_MAX_DIAS", "30"))
+
+def normalizar_conteudo(conteudo: str) -> str:
+    """Normaliza o texto para que variações de espaços e de codificação Unicode gerem a mesma chave."""
+    return " ".join(unicodedata.normalize("NFC", conteudo).split())
+
+def chave_cache(conteudo: str, prompt: str, modelo: str) -> str:
+    """Gera a chave do cache a partir do conteúdo normalizado, do prompt e do nome do modelo."""
+    h = hashlib.sha256()
+    for parte in (normalizar_conteudo(conteudo), prompt, modelo):
+        h.update(parte.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class CachePropostas:
+    """Cache persistente, endereçado por conteúdo, das propostas geradas pelo LLM."""
+
+    def __init__(self, caminho: str = cache_path, max_itens: int = MAX_ITENS, max_dias: float = MAX_DIAS):
+        self.caminho = caminho
+        self.max_itens = max_itens
+        self.max_idade = max_dias * 86400
+        self.hits = 0
+        self.misses = 0
+        # A tabela é criada no primeiro uso, não na construção (o módulo graph cria o cache ao ser importado)
+        self._esquema_criado = False
+
+    def _conectar(self) -> sqlite3.Connection:
+        # Uma conexão por operação: o cache é usado tanto pela thread do banco quanto pelo event loop
+        conexao = sqlite3.connect(self.caminho, timeout=5)
+        if not self._esquema_criado:
+            with conexao:
+                conexao.execute(
+                    "CREATE TABLE IF NOT EXISTS propostas ("
+                    " chave TEXT PRIMARY KEY,"
+                    " proposta TEXT NOT NULL,"
+                    " criado_em REAL NOT NULL,"
+                    " ultimo_acesso REAL NOT NULL)"
+                )
+                conexao.execute("CREATE INDEX IF NOT EXISTS ix_propostas_ultimo_acesso ON propostas (ultimo_acesso)")
+            self._esquema_criado = True
+        return conexao
+
+    def obter(self, chave: str) -> Optional[str]:
+        """Retorna o JSON da proposta em cache, ou None se ausente ou expirada."""
+        agora = time.time()
+        conexao = self._conectar()
+        try:
+            with conexao:
+                linha = conexao.execute(
+                    "SELECT proposta FROM propostas WHERE chave = ? AND criado_em >= ?",
+                    (chave, agora - self.max_idade),
+                ).fetchone()
+                if linha is not None:
+                    conexao.execute("UPDATE propostas SET ultimo_acesso = ? WHERE chave = ?", (agora, chave))
+        finally:
+            conexao.close()
+        if linha is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return linha[0]
+
+    def guardar(self, chave: str, proposta_json: str) -> None:
+        """Guarda a proposta e aplica o despejo por idade e por quantidade (menos recentemente usadas primeiro)."""
+        agora = time.time()
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO propostas (chave, proposta, criado_em, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                    (chave, proposta_json, agora, agora),
+                )
+                conexao.execute("DELETE FROM propostas WHERE criado_em < ?", (agora - self.max_idade,))
+                conexao.execute(
+                    "DELETE FROM propostas WHERE chave IN ("
+                    " SELECT chave FROM propostas ORDER BY ultimo_acesso DESC LIMIT -1 OFFSET ?)",
+                    (self.max_itens,),
+                )
+        finally:
+            conexao.close()
+
+    def descartar(self, chave: str) -> None:
+        """Remove a proposta da chave, se houver (ex.: proposta rejeitada na revisão)."""
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute("DELETE FROM propostas WHERE chave = ?", (chave,))
+        finally:
+            conexao.close()
+
+    def estatisticas(self) -> dict:
+        """Retorna contadores de acertos/erros desta execução e o tamanho atual do cache."""
+        conexao = self._conectar()
+        try:
+            total = conexao.execute("SELECT COUNT(*) FROM propostas").fetchone()[0]
+        finally:
+            conexao.close()
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": self.hits / consultas if consultas else 0.0,
+            "itens": total,
+        }
@@ -1,14 +1,18 @@
-from modelo import CaixaEntrada, Informacao, Ideia, Tarefa, Plano, session
+from sqlalchemy import func, select
+from modelo import (CaixaEntrada, Informacao, Ideia, Tarefa, Plano, nova_sessao,
+                    ideia_informacao_association_table, tarefa_informacao_association_table)
+from busca import buscar, formatar_resultados
+from importacao_exportacao import FORMATOS, exportar, importar
 import sys
 
 
 # --- Limpeza de dados (opcional, para testes recorrentes) ---
 # Você pode descomentar as linhas abaixo para limpar as tabelas antes de cada teste
-# session.query(Informacao).delete()
-# session.query(Ideia).delete()
-# session.query(Tarefa).delete()
-# session.query(Plano).delete()
-# session.commit()
+# with nova_sessao() as sessao:
+#     sessao.query(Informacao).delete()
+#     sessao.query(Ideia).delete()
+#     sessao.query(Tarefa).delete()
+#     sessao.query(Plano).delete()
 # print("Tabelas limpas para o teste.")
 
 def adicionar_item():
@@ -21,12 +25,10 @@ def adicionar_item():
             print("O conteúdo não pode estar vazio.")
             return
 
-        novo_item = CaixaEntrada(conteudo_bruto=conteudo)
-        session.add(novo_item)
-        session.commit()
+        with nova_sessao() as sessao:
+            sessao.add(CaixaEntrada(conteudo_bruto=conteudo))
         print(f"Item '{conteudo}' adicionado com sucesso à Caixa de Entrada.")
     except Exception as e:
-        session.rollback()
         print(f"Erro ao adicionar item: {e}")
 
 def deletar_item_generico(tabela_classe, nome_tabela):
@@ -40,54 +42,176 @@ def deletar_item_generico(tabela_classe, nome_tabela):
             return
 
         item_id = int(item_id_str)
-        item_a_deletar = session.query(tabela_classe).filter_by(id=item_id).first()
+        with nova_sessao() as sessao:
+            item_a_deletar = sessao.query(tabela_classe).filter_by(id=item_id).first()
+            if item_a_deletar:
+                sessao.delete(item_a_deletar)
 
         if item_a_deletar:
-            session.delete(item_a_deletar)
-            session.commit()
             print(f"Item com ID {item_id} da tabela '{nome_tabela}' deletado com sucesso.")
         else:
             print(f"Nenhum item encontrado com o ID {item_id} na tabela '{nome_tabela}'.")
     except Exception as e:
-        session.rollback()
         print(f"Erro ao deletar item: {e}")
 
+# Itens exibidos por página nas consultas
+TAMANHO_PAGINA = 20
+
+def _contagem(tabela_assoc, coluna_fk, coluna_id):
+    """Subconsulta agregada com a contagem de linhas relacionadas, em vez de carregar a coleção."""
+    return (select(func.count())
+            .select_from(tabela_assoc)
+            .where(coluna_fk == coluna_id)
+            .correlate_except(tabela_assoc)
+            .scalar_subquery())
+
+def _consulta_listagem(tabela_classe):
+    """Monta a consulta de listagem com as colunas exibidas: (id, conteudo, detalhes...)."""
+    if tabela_classe == CaixaEntrada:
+        return select(CaixaEntrada.id, CaixaEntrada.conteudo_bruto)
+    if tabela_classe == Informacao:
+        return select(Informacao.id, Informacao.conteudo)
+    if tabela_classe == Ideia:
+        return select(Ideia.id, Ideia.conteudo,
+                      _contagem(ideia_informacao_association_table, ideia_informacao_association_table.c.ideia_id, Ideia.id))
+    if tabela_classe == Tarefa:
+        return select(Tarefa.id, Tarefa.conteudo, Tarefa.plano_id,
+                      _contagem(tarefa_informacao_association_table, tarefa_informacao_association_table.c.tarefa_id, Tarefa.id))
+    if tabela_classe == Plano:
+        # A Ideia vem no mesmo SELECT (join), sem uma consulta extra por plano
+        return (select(Plano.id, Ideia.conteudo, _contagem(Tarefa.__table__, Tarefa.plano_id, Plano.id))
+                .outerjoin(Ideia, Plano.ideia_id == Ideia.id))
+    raise ValueError(f"Tabela não suportada: {tabela_classe}")
+
+def _formatar_linha(tabela_classe, linha):
+    if tabela_classe == Ideia:
+        item_id, conteudo, n_infos = linha
+        detalhes = f" | Informações vinculadas: {n_infos}"
+    elif tabela_classe == Tarefa:
+        item_id, conteudo, plano_id, n_infos = linha
+        detalhes = f" | Plano ID: {plano_id if plano_id is not None else 'N/A'} | Informações vinculadas: {n_infos}"
+    elif tabela_classe == Plano:
+        item_id, ideia_conteudo, n_tarefas = linha
+        conteudo = f"Plano para a Ideia: {ideia_conteudo if ideia_conteudo is not None else 'N/A'}"
+        detalhes = f" | Tarefas: {n_tarefas}"
+    else:
+        item_id, conteudo = linha
+        detalhes = ""
+    return f"ID: {item_id} | Conteúdo: {conteudo}{detalhes}"
+
+def listar_pagina(tabela_classe, apos_id=0, limite=TAMANHO_PAGINA):
+    """
+    Retorna a página de linhas com id > apos_id (paginação por chave, sem OFFSET).
+    """
+    consulta = (_consulta_listagem(tabela_classe)
+                .where(tabela_classe.id > apos_id)
+                .order_by(tabela_classe.id)
+                .limit(limite))
+    with nova_sessao() as sessao:
+        # yield_per: as linhas são lidas do cursor em lotes, sem materializar o resultado inteiro
+        return list(sessao.execute(consulta.execution_options(yield_per=limite)))
+
+def iterar_tabela(tabela_classe, tamanho_lote=500):
+    """
+    Percorre a tabela inteira em lotes por chave, com memória limitada, gerando as linhas da listagem.
+    """
+    apos_id = 0
+    while True:
+        linhas = listar_pagina(tabela_classe, apos_id, tamanho_lote)
+        yield from linhas
+        if len(linhas) < tamanho_lote:
+            return
+        apos_id = linhas[-1][0]
+
 def consultar_tabela(tabela_classe, nome_tabela):
     """
-    Função genérica para consultar e exibir todos os itens de uma tabela.
+    Função genérica para consultar e exibir os itens de uma tabela, página por página.
     """
     try:
-        itens = session.query(tabela_classe).all()
-        if not itens:
-            print(f"Nenhum item encontrado na tabela '{nome_tabela}'.")
-            return
+        apos_id = 0
+        pagina = 1
+        while True:
+            linhas = listar_pagina(tabela_classe, apos_id, TAMANHO_PAGINA + 1)
+            if not linhas:
+                if pagina == 1:
+                    print(f"Nenhum item encontrado na tabela '{nome_tabela}'.")
+                return
 
-        print(f"\n--- Itens em {nome_tabela} ---")
-        for item in itens:
-            conteudo = ""
-            detalhes = ""
-            
-            if tabela_classe == CaixaEntrada:
-                conteudo = item.conteudo_bruto
-            elif tabela_classe == Informacao:
-                conteudo = item.conteudo
-            elif tabela_classe == Ideia:
-                conteudo = item.conteudo
-                detalhes = f" | Informações vinculadas: {len(item.informacoes)}"
-            elif tabela_classe == Tarefa:
-                conteudo = item.conteudo
-                plano_id = item.plano.id if item.plano else "N/A"
-                detalhes = f" | Plano ID: {plano_id} | Informações vinculadas: {len(item.informacoes)}"
-            elif tabela_classe == Plano:
-                ideia_conteudo = item.ideia.conteudo if item.ideia else "N/A"
-                conteudo = f"Plano para a Ideia: {ideia_conteudo}"
-                detalhes = f" | Tarefas: {len(item.tarefas)}"
-
-            print(f"ID: {item.id} | Conteúdo: {conteudo}{detalhes}")
-        print("-------------------------------")
+            print(f"\n--- Itens em {nome_tabela} (página {pagina}) ---")
+            for linha in linhas[:TAMANHO_PAGINA]:
+                print(_formatar_linha(tabela_classe, linha))
+            print("-------------------------------")
+
+            if len(linhas) <= TAMANHO_PAGINA:
+                return
+            if input("Enter para a próxima página, 'q' para parar: ").strip().lower() == 'q':
+                return
+            apos_id = linhas[TAMANHO_PAGINA - 1][0]
+            pagina += 1
     except Exception as e:
         print(f"Erro ao consultar tabela '{nome_tabela}': {e}")
 
+def buscar_itens():
+    """
+    Busca textual em todas as tabelas, com resultados ranqueados e paginados.
+    """
+    try:
+        termo = input("Digite os termos da busca: ")
+        pagina = 1
+        while True:
+            resultados, ha_mais = buscar(termo, pagina=pagina)
+            if not resultados:
+                print("Nenhum resultado encontrado." if pagina == 1 else "Não há mais resultados.")
+                return
+
+            print(f"\n--- Resultados para '{termo}' (página {pagina}) ---")
+            print(formatar_resultados(resultados))
+            print("-------------------------------")
+            if not ha_mais or input("Enter para a próxima página, 'q' para sair: ").strip().lower() == 'q':
+                return
+            pagina += 1
+    except Exception as e:
+        print(f"Erro ao buscar: {e}")
+
+def sugerir_vinculos_item(tabela, tabela_classe, nome_tabela):
+    """
+    Sugere vínculos semânticos para um item e grava os escolhidos nas tabelas de associação.
+    """
+    # Import local: o índice carrega o numpy, que as demais opções do menu não usam
+    from indice_semantico import CLASSES_INDEXADAS, obter_indice, vincular
+    try:
+        item_id_str = input(f"Digite o ID do item de '{nome_tabela}': ")
+        if not item_id_str.isdigit():
+            print("Por favor, digite um ID válido (número inteiro).")
+            return
+
+        with nova_sessao() as sessao:
+            item = sessao.get(tabela_classe, int(item_id_str))
+            if not item:
+                print(f"Nenhum item encontrado com o ID {item_id_str} na tabela '{nome_tabela}'.")
+                return
+
+            destinos = ['ideias', 'tarefas'] if tabela == 'informacoes' else ['informacoes']
+            similares = obter_indice().buscar_lote([item.conteudo], k=5, tabelas=destinos)[0]
+            sugestoes = []
+            for destino, destino_id, score in similares:
+                destino_item = sessao.get(CLASSES_INDEXADAS[destino], destino_id)
+                if destino_item is not None:
+                    sugestoes.append((destino, destino_id))
+                    print(f"{len(sugestoes)}. [{destino}] ID: {destino_id} | {destino_item.conteudo} (similaridade {score:.2f})")
+            if not sugestoes:
+                print("Nenhum vínculo sugerido.")
+                return
+
+            escolha = input("Números dos vínculos a gravar, separados por vírgula (enter para nenhum): ")
+            numeros = [int(n) for n in escolha.replace(' ', '').split(',') if n.isdigit() and 0 < int(n) <= len(sugestoes)]
+            for numero in numeros:
+                destino, destino_id = sugestoes[numero - 1]
+                vincular(sessao, tabela, item.id, destino, destino_id)
+        print(f"{len(numeros)} vínculo(s) gravado(s).")
+    except Exception as e:
+        print(f"Erro ao sugerir vínculos: {e}")
+
 def compor_plano():
     """
     Cria um Plano a partir de uma Ideia e pelo menos duas Tarefas, com validação.
@@ -99,43 +223,68 @@ def compor_plano():
             print("ID de Ideia inválido.")
             return
         
-        ideia = session.query(Ideia).filter_by(id=int(ideia_id_str)).first()
-        if not ideia:
-            print("Ideia não encontrada.")
-            return
+        with nova_sessao() as sessao:
+            ideia = sessao.query(Ideia).filter_by(id=int(ideia_id_str)).first()
+            if not ideia:
+                print("Ideia não encontrada.")
+                return
 
-        tarefas_para_plano = []
-        while True:
-            consultar_tabela(Tarefa, "Tarefas")
-            tarefa_id_str = input("Digite o ID da Tarefa a ser adicionada ao plano (ou 'f' para finalizar): ")
-            if tarefa_id_str.lower() == 'f':
-                break
+            tarefas_para_plano = []
+            while True:
+                consultar_tabela(Tarefa, "Tarefas")
+                tarefa_id_str = input("Digite o ID da Tarefa a ser adicionada ao plano (ou 'f' para finalizar): ")
+                if tarefa_id_str.lower() == 'f':
+                    break
+                
+                if not tarefa_id_str.isdigit():
+                    print("ID de Tarefa inválido.")
+                    continue
+
+                tarefa = sessao.query(Tarefa).filter_by(id=int(tarefa_id_str)).first()
+                if tarefa and tarefa not in tarefas_para_plano:
+                    tarefas_para_plano.append(tarefa)
+                    print(f"Tarefa '{tarefa.conteudo}' adicionada. Total de tarefas: {len(tarefas_para_plano)}")
+                elif tarefa:
+                    print("Tarefa já foi adicionada.")
+                else:
+                    print("Tarefa não encontrada.")
             
-            if not tarefa_id_str.isdigit():
-                print("ID de Tarefa inválido.")
-                continue
-
-            tarefa = session.query(Tarefa).filter_by(id=int(tarefa_id_str)).first()
-            if tarefa and tarefa not in tarefas_para_plano:
-                tarefas_para_plano.append(tarefa)
-                print(f"Tarefa '{tarefa.conteudo}' adicionada. Total de tarefas: {len(tarefas_para_plano)}")
-            elif tarefa:
-                print("Tarefa já foi adicionada.")
-            else:
-                print("Tarefa não encontrada.")
-        
-        novo_plano = Plano(ideia=ideia, tarefas=tarefas_para_plano)
-        session.add(novo_plano)
-        session.commit()
+            novo_plano = Plano(ideia=ideia, tarefas=tarefas_para_plano)
+            sessao.add(novo_plano)
         print(f"\nPlano criado com sucesso para a Ideia '{ideia.conteudo}' com {len(tarefas_para_plano)} tarefas.")
 
     except ValueError as ve:
-        session.rollback()
         print(f"Erro: {ve}")
     except Exception as e:
-        session.rollback()
         print(f"Erro ao compor plano: {e}")
 
+def importar_arquivo():
+    """
+    Importa os itens de um arquivo (JSONL, CSV, Markdown ou texto) para a Caixa de Entrada.
+    """
+    try:
+        caminho = input("Digite o caminho do arquivo a importar: ").strip()
+        if not caminho:
+            print("O caminho não pode estar vazio.")
+            return
+        formato = input(f"Formato ({', '.join(FORMATOS)}; Enter para deduzir da extensão): ").strip().lower() or None
+        importar(caminho, formato)
+    except Exception as e:
+        print(f"Erro ao importar: {e}")
+
+def exportar_arquivo():
+    """
+    Exporta Informações, Ideias, Tarefas e Planos, com os vínculos, para um arquivo JSONL.
+    """
+    try:
+        caminho = input("Digite o caminho do arquivo de destino (.jsonl): ").strip()
+        if not caminho:
+            print("O caminho não pode estar vazio.")
+            return
+        exportar(caminho)
+    except Exception as e:
+        print(f"Erro ao exportar: {e}")
+
 def menu():
     """
     Função principal que exibe o menu e gerencia as opções.
@@ -150,7 +299,11 @@ def menu():
     print("7. Consultar Planos")
     print("8. Deletar item de uma tabela")
     print("9. Compor um Plano")
-    print("10. Sair")
+    print("10. Buscar nas tabelas")
+    print("11. Sugerir vínculos para um item")
+    print("12. Importar itens de um arquivo para a Caixa de Entrada")
+    print("13. Exportar Informações, Ideias, Tarefas e Planos")
+    print("14. Sair")
     return input("Escolha uma opção: ")
 
 if __name__ == "__main__":
@@ -194,6 +347,26 @@ if __name__ == "__main__":
             elif opcao == '9':
                 compor_plano()
             elif opcao == '10':
+                buscar_itens()
+            elif opcao == '11':
+                print("\n--- Escolha a tabela do item ---")
+                print("1. Informações")
+                print("2. Ideias")
+                print("3. Tarefas")
+                escolha_tabela = input("Digite o número da tabela: ")
+                if escolha_tabela == '1':
+                    sugerir_vinculos_item('informacoes', Informacao, "Informações")
+                elif escolha_tabela == '2':
+                    sugerir_vinculos_item('ideias', Ideia, "Ideias")
+                elif escolha_tabela == '3':
+                    sugerir_vinculos_item('tarefas', Tarefa, "Tarefas")
+                else:
+                    print("Opção de tabela inválida.")
+            elif opcao == '12':
+                importar_arquivo()
+            elif opcao == '13':
+                exportar_arquivo()
+            elif opcao == '14':
                 print("Saindo...")
                 break
             else:
@@ -201,5 +374,4 @@ if __name__ == "__main__":
     except (KeyboardInterrupt, EOFError):
         print("\nPrograma interrompido. Saindo...")
     finally:
-        session.close()
         sys.exit(0)
\ No newline at end of file
@@ -0,0 +1,57 @@
+import json
+import time
+from typing import List, NamedTuple, Optional
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from modelo import nova_sessao, RevisaoTelegram
+from graph import SuggestionClasses
+
+# Estado de revisão do bot do Telegram gravado no conceitos.db, um registro por chat.
+# A proposta paga ao LLM fica salva enquanto aguarda o 's', 'n' ou feedback do usuário;
+# se o bot reiniciar nesse meio tempo, a revisão é retomada sem chamar o LLM de novo.
+
+class Revisao(NamedTuple):
+    chat_id: int
+    item_id: int
+    conteudo_bruto: str
+    lease_dono: str
+    proposta: SuggestionClasses
+    historico: List
+
+def salvar_revisao(chat_id: int, item_id: int, conteudo_bruto: str, lease_dono: str,
+                   proposta: SuggestionClasses, historico: List) -> None:
+    """Grava (ou substitui) a revisão pendente do chat."""
+    with nova_sessao() as sessao:
+        sessao.merge(RevisaoTelegram(
+            chat_id=chat_id,
+            item_id=item_id,
+            conteudo_bruto=conteudo_bruto,
+            lease_dono=lease_dono,
+            proposta=proposta.model_dump_json(),
+            historico=json.dumps(messages_to_dict(historico)),
+            atualizada_em=time.time(),
+        ))
+
+def remover_revisao(chat_id: int) -> None:
+    """Apaga a revisão do chat (proposta aprovada, rejeitada ou abandonada)."""
+    with nova_sessao() as sessao:
+        sessao.query(RevisaoTelegram).filter(RevisaoTelegram.chat_id == chat_id).delete()
+
+def chats_com_revisao() -> List[int]:
+    """chat_id de todas as revisões gravadas, para retomá-las após um reinício."""
+    with nova_sessao() as sessao:
+        return [chat_id for (chat_id,) in sessao.query(RevisaoTelegram.chat_id).order_by(RevisaoTelegram.chat_id)]
+
+def carregar_revisao(chat_id: int) -> Optional[Revisao]:
+    """Revisão gravada do chat, ou None se não houver."""
+    with nova_sessao() as sessao:
+        registro = sessao.get(RevisaoTelegram, chat_id)
+    if registro is None:
+        return None
+    return Revisao(
+        chat_id=registro.chat_id,
+        item_id=registro.item_id,
+        conteudo_bruto=registro.conteudo_bruto,
+        lease_dono=registro.lease_dono,
+        proposta=SuggestionClasses.model_validate_json(registro.proposta),
+        historico=messages_from_dict(json.loads(registro.historico)),
+    )
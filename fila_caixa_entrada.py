@@ -0,0 +1,118 @@
+import os
+import socket
+import time
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from modelo import nova_sessao
+
+# A CaixaEntrada como fila de trabalho: cada processador (bot, CLI, lote) reivindica um item
+# por vez com um lease. Enquanto o lease vale, nenhum outro processador pega o mesmo item;
+# se o processador morrer, o lease vence e o item volta a ficar disponível.
+
+# Duração do lease durante o processamento pelo LLM (segundos)
+DURACAO_LEASE = float(os.getenv("FILA_DURACAO_LEASE", "600"))
+# Lease enquanto a proposta aguarda a revisão humana (bot ou CLI), que pode levar horas (segundos)
+DURACAO_LEASE_REVISAO = float(os.getenv("FILA_DURACAO_LEASE_REVISAO", str(6 * 3600)))
+# Itens rejeitados sem feedback voltam à fila depois deste intervalo (segundos)
+ADIAMENTO_PADRAO = float(os.getenv("FILA_ADIAMENTO", str(24 * 3600)))
+
+# Condição SQL de item disponível para reivindicação no instante :agora
+_DISPONIVEL = (
+    "(status = 'pendente'"
+    " OR (status = 'em_processamento' AND lease_expira_em < :agora)"
+    " OR (status = 'adiada' AND adiada_ate <= :agora))"
+)
+
+def identificador_processo(prefixo: str) -> str:
+    """Identificador do dono dos leases deste processo (ex.: 'telegram:host:1234')."""
+    return f"{prefixo}:{socket.gethostname()}:{os.getpid()}"
+
+def reivindicar_proximo(dono: str, duracao: float = DURACAO_LEASE) -> Optional[Tuple[int, str]]:
+    """Reivindica atomicamente o próximo item disponível e retorna (id, conteudo_bruto), ou None se não houver."""
+    agora = time.time()
+    with nova_sessao() as sessao:
+        # Um único UPDATE ... RETURNING: escolher e marcar o item acontece sob o mesmo lock de escrita
+        linha = sessao.execute(text(
+            "UPDATE caixa_de_entrada SET status = 'em_processamento', lease_dono = :dono, "
+            "lease_expira_em = :expira, tentativas = tentativas + 1, adiada_ate = NULL "
+            "WHERE id = (SELECT id FROM caixa_de_entrada WHERE " + _DISPONIVEL + " ORDER BY id LIMIT 1) "
+            "RETURNING id, conteudo_bruto"
+        ), {"dono": dono, "agora": agora, "expira": agora + duracao}).first()
+    return (linha[0], linha[1]) if linha else None
+
+def reivindicar_varios(dono: str, quantidade: int, duracao: float = DURACAO_LEASE) -> List[Tuple[int, str]]:
+    """Reivindica atomicamente até `quantidade` itens disponíveis (extração em lote); lista em ordem de id."""
+    if quantidade <= 0:
+        return []
+    agora = time.time()
+    with nova_sessao() as sessao:
+        linhas = sessao.execute(text(
+            "UPDATE caixa_de_entrada SET status = 'em_processamento', lease_dono = :dono, "
+            "lease_expira_em = :expira, tentativas = tentativas + 1, adiada_ate = NULL "
+            "WHERE id IN (SELECT id FROM caixa_de_entrada WHERE " + _DISPONIVEL + " ORDER BY id LIMIT :quantidade) "
+            "RETURNING id, conteudo_bruto"
+        ), {"dono": dono, "agora": agora, "expira": agora + duracao, "quantidade": quantidade}).all()
+    # A ordem das linhas do RETURNING não é garantida
+    return sorted((item_id, conteudo) for item_id, conteudo in linhas)
+
+def renovar_lease(item_id: int, dono: str, duracao: float = DURACAO_LEASE) -> bool:
+    """Estende o lease de um item que ainda pertence ao dono; False se o lease foi perdido."""
+    with nova_sessao() as sessao:
+        resultado = sessao.execute(text(
+            "UPDATE caixa_de_entrada SET lease_expira_em = :expira "
+            "WHERE id = :id AND status = 'em_processamento' AND lease_dono = :dono"
+        ), {"id": item_id, "dono": dono, "expira": time.time() + duracao})
+    return resultado.rowcount == 1
+
+def assumir_lease(item_id: int, dono_anterior: str, dono: str, duracao: float = DURACAO_LEASE) -> bool:
+    """Transfere o lease de um processo anterior (ex.: bot reiniciado) para `dono`.
+
+    Falha (False) se o item já foi reivindicado por outro processador ou não está mais na fila.
+    """
+    with nova_sessao() as sessao:
+        resultado = sessao.execute(text(
+            "UPDATE caixa_de_entrada SET lease_dono = :dono, lease_expira_em = :expira "
+            "WHERE id = :id AND status = 'em_processamento' AND lease_dono = :anterior"
+        ), {"id": item_id, "anterior": dono_anterior, "dono": dono, "expira": time.time() + duracao})
+    return resultado.rowcount == 1
+
+def liberar(item_id: int, dono: str) -> None:
+    """Devolve o item à fila (ex.: falha no LLM), para outro processador tentar."""
+    with nova_sessao() as sessao:
+        sessao.execute(text(
+            "UPDATE caixa_de_entrada SET status = 'pendente', lease_dono = NULL, lease_expira_em = NULL "
+            "WHERE id = :id AND lease_dono = :dono"
+        ), {"id": item_id, "dono": dono})
+
+def adiar(item_id: int, dono: str, segundos: float = ADIAMENTO_PADRAO) -> None:
+    """Tira o item da fila por um tempo (rejeitado sem feedback), em vez de oferecê-lo de novo em seguida."""
+    with nova_sessao() as sessao:
+        sessao.execute(text(
+            "UPDATE caixa_de_entrada SET status = 'adiada', adiada_ate = :ate, "
+            "lease_dono = NULL, lease_expira_em = NULL "
+            "WHERE id = :id AND lease_dono = :dono"
+        ), {"id": item_id, "dono": dono, "ate": time.time() + segundos})
+
+def espiar_proximos(limite: int) -> List[Tuple[int, str]]:
+    """Retorna (id, conteudo_bruto) dos próximos itens disponíveis, sem reivindicá-los."""
+    if limite <= 0:
+        return []
+    with nova_sessao() as sessao:
+        linhas = sessao.execute(text(
+            "SELECT id, conteudo_bruto FROM caixa_de_entrada WHERE " + _DISPONIVEL + " ORDER BY id LIMIT :limite"
+        ), {"agora": time.time(), "limite": limite}).all()
+    return [(item_id, conteudo) for item_id, conteudo in linhas]
+
+def contar_por_status() -> dict:
+    """Quantidade de itens por situação: 'disponiveis', 'em_processamento', 'adiados' e 'aguardando_revisao'."""
+    with nova_sessao() as sessao:
+        linha = sessao.execute(text(
+            "SELECT "
+            " SUM(CASE WHEN " + _DISPONIVEL + " THEN 1 ELSE 0 END),"
+            " SUM(CASE WHEN status = 'em_processamento' AND lease_expira_em >= :agora THEN 1 ELSE 0 END),"
+            " SUM(CASE WHEN status = 'adiada' AND adiada_ate > :agora THEN 1 ELSE 0 END),"
+            " SUM(CASE WHEN status = 'aguardando_revisao' THEN 1 ELSE 0 END) "
+            "FROM caixa_de_entrada"
+        ), {"agora": time.time()}).one()
+    return {"disponiveis": linha[0] or 0, "em_processamento": linha[1] or 0, "adiados": linha[2] or 0,
+            "aguardando_revisao": linha[3] or 0}
@@ -0,0 +1,275 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+from metricas import metricas
+
+# Ponto único de passagem das chamadas ao Gemini (extração, chat do bot, lote e prefetch):
+# - um balde de fichas (token bucket) limita as requisições por minuto à cota da conta;
+# - erros transitórios e de cota (429) são repetidos com espera exponencial e jitter;
+# - a concorrência se adapta (AIMD): cai pela metade quando a API limita e sobe devagar a cada sucesso.
+# Os limites valem por processo: bot e lote rodando juntos dividem a mesma cota, ajuste os valores.
+
+# Requisições por minuto permitidas (30 é a cota gratuita do gemini-2.0-flash-lite; aumente conforme a sua; 0 desativa)
+REQUISICOES_POR_MINUTO = float(os.getenv("LLM_REQUISICOES_POR_MINUTO", "30"))
+# Rajada máxima acima do ritmo médio
+RAJADA = int(os.getenv("LLM_RAJADA", "5"))
+# Teto de chamadas simultâneas; o limite efetivo se ajusta entre 1 e este valor
+CONCORRENCIA_MAXIMA = int(os.getenv("LLM_CONCORRENCIA_MAXIMA", "8"))
+# Tentativas por chamada, contando a primeira
+TENTATIVAS = int(os.getenv("LLM_TENTATIVAS", "5"))
+# Espera base e máxima entre tentativas (segundos)
+ESPERA_BASE = 1.0
+ESPERA_MAXIMA = 60.0
+# Intervalo mínimo entre duas reduções da concorrência: um único pico de 429 derruba várias chamadas de uma vez
+INTERVALO_REDUCAO = 2.0
+
+CODIGOS_LIMITE = {429}
+CODIGOS_TRANSITORIOS = {408, 500, 502, 503, 504}
+# Status gRPC/Gemini (atributo `status` do google-genai ou palavra inteira, em maiúsculas, na mensagem)
+STATUS_LIMITE = {"RESOURCE_EXHAUSTED"}
+STATUS_TRANSITORIOS = {"UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL"}
+# Nomes de classes de exceção (google-api-core, httpx, requests...) que indicam o tipo do erro
+_TIPOS_LIMITE = re.compile(r"ResourceExhausted|TooManyRequests|RateLimit")
+_TIPOS_TRANSITORIOS = re.compile(r"Timeout|ConnectError|ConnectionError|ServiceUnavailable|DeadlineExceeded|"
+                                 r"InternalServerError|BadGateway")
+# Código HTTP na mensagem, só em posição de status: "429 RESOURCE_EXHAUSTED. {...}" (google-genai),
+# "...: 503 Service Unavailable" ou "status code: 500"; nunca um número qualquer ("id 5003", "500 tokens")
+_CODIGO_NA_MENSAGEM = re.compile(
+    r"(?:^|:\s)(\d{3})\s+[A-Z][A-Za-z_]*\b|\b(?i:status|code)(?:[ _](?i:code))?\W{0,3}(\d{3})\b")
+_STATUS_NA_MENSAGEM = re.compile(r"\b[A-Z]+(?:_[A-Z]+)*\b")
+# Atraso sugerido pela API: "retry_delay { seconds: 17 }" (gRPC) ou "retry in 17.5s" (REST)
+_ATRASO_SUGERIDO = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)|retry in ([\d.]+)\s*s", re.IGNORECASE)
+
+T = TypeVar("T")
+
+def _cadeia(erro: BaseException) -> Iterator[BaseException]:
+    """O erro e as causas que ele embrulha (o langchain-google-genai às vezes embrulha o erro original)."""
+    vistos = set()
+    while erro is not None and id(erro) not in vistos:
+        vistos.add(id(erro))
+        yield erro
+        erro = erro.__cause__ or erro.__context__
+
+def _pelo_codigo(codigo: int) -> str:
+    if codigo in CODIGOS_LIMITE:
+        return "limite"
+    if codigo in CODIGOS_TRANSITORIOS:
+        return "transitorio"
+    return "definitivo"
+
+def _pelo_status(status: set) -> Optional[str]:
+    if status & STATUS_LIMITE:
+        return "limite"
+    if status & STATUS_TRANSITORIOS:
+        return "transitorio"
+    return None
+
+def classificar_erro(erro: Exception) -> str:
+    """'limite' (cota/429), 'transitorio' (vale repetir) ou 'definitivo'.
+
+    Decide primeiro pelo código HTTP, pelo status e pelo tipo da exceção (ou de uma causa embrulhada);
+    a mensagem só é usada na falta deles, e só com códigos em posição de status e nomes de status inteiros.
+    """
+    cadeia = list(_cadeia(erro))
+    for atual in cadeia:
+        codigo = (getattr(atual, "code", None) or getattr(atual, "status_code", None)
+                  or getattr(getattr(atual, "response", None), "status_code", None))
+        if isinstance(codigo, int):
+            return _pelo_codigo(codigo)
+        status = getattr(atual, "status", None)
+        if isinstance(status, str) and _pelo_status({status}):
+            return _pelo_status({status})
+        if isinstance(atual, (TimeoutError, ConnectionError)) or _TIPOS_TRANSITORIOS.search(type(atual).__name__):
+            return "transitorio"
+        if _TIPOS_LIMITE.search(type(atual).__name__):
+            return "limite"
+    for atual in cadeia:
+        texto = str(atual)
+        for encontrado in _CODIGO_NA_MENSAGEM.finditer(texto):
+            tipo = _pelo_codigo(int(encontrado.group(1) or encontrado.group(2)))
+            if tipo != "definitivo":
+                return tipo
+        tipo = _pelo_status(set(_STATUS_NA_MENSAGEM.findall(texto)))
+        if tipo:
+            return tipo
+    return "definitivo"
+
+def atraso_sugerido(erro: Exception) -> float:
+    """Espera pedida pela própria API na resposta de erro, ou 0."""
+    encontrado = _ATRASO_SUGERIDO.search(str(erro))
+    if encontrado is None:
+        return 0.0
+    return float(encontrado.group(1) or encontrado.group(2))
+
+def espera_com_jitter(tentativa: int) -> float:
+    """Espera exponencial com jitter completo: aleatória entre 0 e base * 2^(tentativa-1), até o teto."""
+    return random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** (tentativa - 1)))
+
+class LimitadorTaxa:
+    """Balde de fichas: cada chamada reserva uma ficha e recebe quanto tempo deve esperar por ela.
+
+    A reserva é imediata (o saldo pode ficar negativo), então chamadas síncronas e assíncronas,
+    de várias threads, formam uma única fila ordenada sem precisar de um lock durante a espera.
+    """
+
+    def __init__(self, por_minuto: float = REQUISICOES_POR_MINUTO, rajada: int = RAJADA,
+                 relogio: Callable[[], float] = time.monotonic):
+        self.taxa = por_minuto / 60
+        self.capacidade = max(1, rajada)
+        self._relogio = relogio
+        self._fichas = float(self.capacidade)
+        self._atualizado = relogio()
+        self._lock = threading.Lock()
+
+    def reservar(self) -> float:
+        """Consome uma ficha e retorna quantos segundos esperar antes de usá-la."""
+        if self.taxa <= 0:
+            return 0.0
+        with self._lock:
+            agora = self._relogio()
+            self._fichas = min(self.capacidade, self._fichas + (agora - self._atualizado) * self.taxa)
+            self._atualizado = agora
+            self._fichas -= 1
+            return 0.0 if self._fichas >= 0 else -self._fichas / self.taxa
+
+class ConcorrenciaAdaptativa:
+    """Semáforo com limite ajustável (aumento aditivo, redução multiplicativa), usável de threads e de event loops."""
+
+    def __init__(self, maximo: int = CONCORRENCIA_MAXIMA, relogio: Callable[[], float] = time.monotonic):
+        self.maximo = max(1, maximo)
+        self._relogio = relogio
+        self.limite = float(self.maximo)
+        self.em_uso = 0
+        self._ultima_reducao = float("-inf")
+        self._condicao = threading.Condition()
+        # Esperas assíncronas: (loop, future) acordados quando uma vaga pode ter aberto
+        self._esperando = deque()
+
+    def _tentar_ocupar(self) -> bool:
+        if self.em_uso < int(self.limite):
+            self.em_uso += 1
+            return True
+        return False
+
+    def adquirir(self) -> None:
+        with self._condicao:
+            while not self._tentar_ocupar():
+                self._condicao.wait()
+
+    async def aadquirir(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condicao:
+                if self._tentar_ocupar():
+                    return
+                vaga = loop.create_future()
+                self._esperando.append((loop, vaga))
+            await vaga
+
+    def liberar(self) -> None:
+        with self._condicao:
+            self.em_uso -= 1
+            self._acordar()
+
+    def registrar_sucesso(self) -> None:
+        """Aumento aditivo: +1 no limite a cada `limite` sucessos."""
+        with self._condicao:
+            anterior = int(self.limite)
+            self.limite = min(self.maximo, self.limite + 1 / self.limite)
+            if int(self.limite) > anterior:
+                self._acordar()
+
+    def registrar_limitacao(self) -> None:
+        """Redução multiplicativa: metade do limite, no máximo uma vez a cada INTERVALO_REDUCAO."""
+        with self._condicao:
+            agora = self._relogio()
+            if agora - self._ultima_reducao >= INTERVALO_REDUCAO:
+                self._ultima_reducao = agora
+                self.limite = max(1.0, self.limite / 2)
+
+    def _acordar(self) -> None:
+        # Chamado com a condição adquirida; quem acordar e não achar vaga volta a esperar
+        self._condicao.notify_all()
+        while self._esperando:
+            loop, vaga = self._esperando.popleft()
+            loop.call_soon_threadsafe(_sinalizar, vaga)
+
+def _sinalizar(vaga: asyncio.Future) -> None:
+    if not vaga.done():
+        vaga.set_result(None)
+
+class GatewayLLM:
+    """Executa chamadas ao LLM sob o limite de taxa, a concorrência adaptativa e a política de retentativas."""
+
+    def __init__(self, por_minuto: float = REQUISICOES_POR_MINUTO, rajada: int = RAJADA,
+                 concorrencia_maxima: int = CONCORRENCIA_MAXIMA, tentativas: int = TENTATIVAS):
+        self.limitador = LimitadorTaxa(por_minuto, rajada)
+        self.concorrencia = ConcorrenciaAdaptativa(concorrencia_maxima)
+        self.tentativas = max(1, tentativas)
+
+    def _espera_antes_de_repetir(self, nome: str, erro: Exception, tentativa: int) -> Optional[float]:
+        """Segundos até a próxima tentativa, ou None se o erro não deve ser repetido."""
+        tipo = classificar_erro(erro)
+        if tipo == "definitivo" or tentativa >= self.tentativas:
+            return None
+        if tipo == "limite":
+            self.concorrencia.registrar_limitacao()
+            metricas.incrementar(f"{nome}.limitadas")
+        metricas.incrementar(f"{nome}.retentativas")
+        espera = max(espera_com_jitter(tentativa), atraso_sugerido(erro))
+        print(f"⏳ {nome}: {type(erro).__name__}, tentativa {tentativa + 1}/{self.tentativas} em {espera:.1f}s")
+        return espera
+
+    def chamar(self, nome: str, funcao: Callable[[], T]) -> T:
+        """Executa `funcao()` (síncrona) pelo gateway; `nome` identifica a série nas métricas."""
+        tentativa = 1
+        while True:
+            inicio_espera = time.perf_counter()
+            time.sleep(self.limitador.reservar())
+            self.concorrencia.adquirir()
+            metricas.observar(f"{nome}.espera", time.perf_counter() - inicio_espera)
+            try:
+                with metricas.medir(nome):
+                    resultado = funcao()
+            except Exception as e:
+                espera = self._espera_antes_de_repetir(nome, e, tentativa)
+                if espera is None:
+                    raise
+            else:
+                self.concorrencia.registrar_sucesso()
+                return resultado
+            finally:
+                self.concorrencia.liberar()
+            time.sleep(espera)
+            tentativa += 1
+
+    async def achamar(self, nome: str, funcao: Callable[[], Awaitable[T]]) -> T:
+        """Versão assíncrona de chamar: `funcao()` retorna a corrotina da chamada."""
+        tentativa = 1
+        while True:
+            inicio_espera = time.perf_counter()
+            await asyncio.sleep(self.limitador.reservar())
+            await self.concorrencia.aadquirir()
+            metricas.observar(f"{nome}.espera", time.perf_counter() - inicio_espera)
+            try:
+                with metricas.medir(nome):
+                    resultado = await funcao()
+            except Exception as e:
+                espera = self._espera_antes_de_repetir(nome, e, tentativa)
+                if espera is None:
+                    raise
+            else:
+                self.concorrencia.registrar_sucesso()
+                return resultado
+            finally:
+                self.concorrencia.liberar()
+            await asyncio.sleep(espera)
+            tentativa += 1
+
+# Instância compartilhada por todo o processo
+gateway_llm = GatewayLLM()
@@ -4,14 +4,36 @@ load_dotenv(override=True)
 google_api_key = os.getenv('GOOGLE_API_KEY')
 tavily_api_key = os.getenv('TAVILY_API_KEY')
 
-from typing import List, Optional, Tuple
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+import asyncio
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 from pydantic import BaseModel, Field
-from prompts import PROMPT_ORGANIZADOR
-from modelo import session, Informacao, Ideia, Tarefa, CaixaEntrada
+from sqlalchemy import delete, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from prompts import PROMPT_ORGANIZADOR, PROMPT_ORGANIZADOR_LOTE
+from modelo import nova_sessao, Informacao, Ideia, Tarefa, CaixaEntrada, PropostaPendente
+from cache_propostas import CachePropostas, chave_cache
+from metricas import callbacks_llm, metricas
+from gateway_llm import gateway_llm
+from fila_caixa_entrada import (DURACAO_LEASE_REVISAO, adiar, identificador_processo, liberar, reivindicar_proximo,
+                                renovar_lease)
 
-llmodel = init_chat_model("google_genai:gemini-2.0-flash-lite")
+MODELO_LLM = "google_genai:gemini-2.0-flash-lite"
+# Criado na primeira chamada (ver obter_llm): importar o LangChain e o cliente do Gemini leva mais de um segundo
+llmodel = None
+cache_propostas = CachePropostas()
+
+# Extração em lote: quantos itens curtos vão numa mesma chamada, e o teto de tokens (estimados) do conteúdo deles
+ITENS_POR_CHAMADA = int(os.getenv("LLM_ITENS_POR_CHAMADA", "8"))
+TOKENS_POR_CHAMADA = int(os.getenv("LLM_TOKENS_POR_CHAMADA", "2000"))
+
+def obter_llm():
+    """Cliente do LLM, inicializado sob demanda."""
+    global llmodel
+    if llmodel is None:
+        from langchain.chat_models import init_chat_model
+        # Uma tentativa só no cliente: retentativas, limite de taxa e concorrência ficam com o gateway_llm
+        llmodel = init_chat_model(MODELO_LLM, max_retries=1)
+    return llmodel
 
 class SuggestionClasses(BaseModel):
     """Estrutura de saída do LLM com fatos (informações), ideias, tarefas e status de aprovação."""
@@ -32,20 +54,215 @@ class SuggestionClasses(BaseModel):
         description="False inicialmente ou se precisa de revisão, True se a sugestão foi aprovada pelo usuário."
     )
 
+class PropostaDeItem(SuggestionClasses):
+    """Proposta de um item dentro de uma extração em lote."""
+    item_id: int = Field(description="O id do item, igual ao do delimitador <item id=\"N\">.")
+
+class PropostasEmLote(BaseModel):
+    """Estrutura de saída do LLM na extração em lote: uma proposta por item."""
+    propostas: List[PropostaDeItem] = Field(
+        default_factory=list,
+        description="Uma proposta para cada item recebido."
+    )
+
+def montar_mensagens_iniciais(conteudo: str) -> List:
+    """Monta o histórico inicial (prompt do organizador + texto do item) para o LLM."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+    return [
+        SystemMessage(content=PROMPT_ORGANIZADOR),
+        HumanMessage(content=f"\nTexto para análise:\n{conteudo}")
+    ]
+
+# Revisão com feedback: só a proposta mais recente e as correções acumuladas vão ao LLM,
+# então o custo de cada rodada não cresce com o número de rodadas
+MAX_CORRECOES = 10
+MAX_CARACTERES_CORRECAO = 400
+
+def montar_mensagens_revisao(conteudo: str, proposta: SuggestionClasses, correcoes: List[str]) -> List:
+    """Histórico compacto para revisar uma proposta: texto do item, proposta atual e lista de correções.
+
+    As correções também ficam em additional_kwargs da última mensagem, para a próxima rodada acumulá-las
+    (inclusive depois de gravado e restaurado o estado de revisão do bot).
+    """
+    from langchain_core.messages import AIMessage, HumanMessage
+    correcoes = [c[:MAX_CARACTERES_CORRECAO] for c in correcoes][-MAX_CORRECOES:]
+    lista = "\n".join(f"{numero}. {correcao}" for numero, correcao in enumerate(correcoes, start=1))
+    return montar_mensagens_iniciais(conteudo) + [
+        AIMessage(content=f"Sugestão atual: {proposta.model_dump_json(exclude={'aprovado'})}"),
+        HumanMessage(
+            content=f"Feedback do usuário (correções acumuladas, todas continuam valendo):\n{lista}\n\n"
+                    f"Por favor, revise a sugestão atual aplicando todas as correções.",
+            additional_kwargs={"correcoes": correcoes},
+        ),
+    ]
+
+def correcoes_acumuladas(messages_history: Optional[List]) -> List[str]:
+    """Correções já pedidas para o item, lidas do histórico (compacto ou no formato antigo, com cada rodada)."""
+    if not messages_history or len(messages_history) <= 2:
+        return []
+    ultima = messages_history[-1]
+    if "correcoes" in ultima.additional_kwargs:
+        return list(ultima.additional_kwargs["correcoes"])
+    # Revisões gravadas antes do histórico compacto: uma mensagem "Feedback do usuário: ..." por rodada
+    return [m.content.split("Feedback do usuário:", 1)[1].split("\n\nPor favor", 1)[0].strip()
+            for m in messages_history[2:]
+            if m.type == "human" and isinstance(m.content, str) and m.content.startswith("Feedback do usuário:")]
+
+def incorporar_feedback(conteudo: str, proposta: SuggestionClasses, messages_history: Optional[List],
+                        feedback: str) -> List:
+    """Novo histórico compacto com a proposta mais recente e o feedback somado às correções anteriores."""
+    return montar_mensagens_revisao(conteudo, proposta, correcoes_acumuladas(messages_history) + [feedback.strip()])
+
+def _chave_se_cacheavel(conteudo: str, messages_history: Optional[List]) -> Optional[str]:
+    """Só a primeira proposta de um item (sem feedback no histórico) é cacheável."""
+    if messages_history is not None and len(messages_history) > 2:
+        return None
+    return chave_cache(conteudo, PROMPT_ORGANIZADOR, MODELO_LLM)
+
+def _chave_lote(conteudo: str) -> str:
+    """Chave das propostas extraídas em lote: outro prompt, outra entrada no cache."""
+    return chave_cache(conteudo, PROMPT_ORGANIZADOR_LOTE, MODELO_LLM)
+
+def descartar_propostas_em_cache(conteudo: str) -> None:
+    """Remove do cache as propostas do conteúdo, individual e em lote: uma proposta rejeitada não volta do cache."""
+    cache_propostas.descartar(_chave_se_cacheavel(conteudo, None))
+    cache_propostas.descartar(_chave_lote(conteudo))
+
 def processar_item_com_llm(conteudo: str, messages_history: Optional[List] = None) -> SuggestionClasses:
     """Processa um item da CaixaEntrada usando LLM e retorna a proposta estruturada."""
+    chave = _chave_se_cacheavel(conteudo, messages_history)
+    if chave is not None:
+        em_cache = cache_propostas.obter(chave)
+        if em_cache is not None:
+            metricas.incrementar("llm.extracao.cache_acertos")
+            return SuggestionClasses.model_validate_json(em_cache)
+
     if messages_history is None:
-        messages = [
-            SystemMessage(content=PROMPT_ORGANIZADOR),
-            HumanMessage(content=f"\nTexto para análise:\n{conteudo}")
-        ]
+        messages = montar_mensagens_iniciais(conteudo)
     else:
         messages = messages_history
     
-    structured_llm = llmodel.with_structured_output(SuggestionClasses)
-    suggestion = structured_llm.invoke(messages)
+    structured_llm = obter_llm().with_structured_output(SuggestionClasses)
+    suggestion = gateway_llm.chamar("llm.extracao", lambda: structured_llm.invoke(
+        messages, config={"callbacks": callbacks_llm("llm.extracao")}))
+    if chave is not None:
+        cache_propostas.guardar(chave, suggestion.model_dump_json())
+    return suggestion
+
+async def aprocessar_item_com_llm(conteudo: str, messages_history: Optional[List] = None) -> SuggestionClasses:
+    """Versão assíncrona de processar_item_com_llm, para uso dentro do event loop do bot."""
+    chave = _chave_se_cacheavel(conteudo, messages_history)
+    if chave is not None:
+        em_cache = await asyncio.to_thread(cache_propostas.obter, chave)
+        if em_cache is not None:
+            metricas.incrementar("llm.extracao.cache_acertos")
+            return SuggestionClasses.model_validate_json(em_cache)
+
+    if messages_history is None:
+        messages = montar_mensagens_iniciais(conteudo)
+    else:
+        messages = messages_history
+
+    structured_llm = obter_llm().with_structured_output(SuggestionClasses)
+    suggestion = await gateway_llm.achamar("llm.extracao", lambda: structured_llm.ainvoke(
+        messages, config={"callbacks": callbacks_llm("llm.extracao")}))
+    if chave is not None:
+        await asyncio.to_thread(cache_propostas.guardar, chave, suggestion.model_dump_json())
     return suggestion
 
+def estimar_tokens(texto: str) -> int:
+    """Estimativa grosseira (cerca de 4 caracteres por token), suficiente para empacotar lotes."""
+    return len(texto) // 4 + 1
+
+def empacotar_itens(itens: List[Tuple[int, str]], max_itens: int = ITENS_POR_CHAMADA,
+                    max_tokens: int = TOKENS_POR_CHAMADA) -> List[List[Tuple[int, str]]]:
+    """Agrupa (id, conteudo) em lotes, na ordem, sem passar de `max_itens` nem de `max_tokens` por lote.
+
+    Um item maior que o teto de tokens fica sozinho no seu lote.
+    """
+    lotes, atual, tokens = [], [], 0
+    for item in itens:
+        custo = estimar_tokens(item[1])
+        if atual and (len(atual) >= max_itens or tokens + custo > max_tokens):
+            lotes.append(atual)
+            atual, tokens = [], 0
+        atual.append(item)
+        tokens += custo
+    if atual:
+        lotes.append(atual)
+    return lotes
+
+def montar_mensagens_lote(itens: List[Tuple[int, str]]) -> List:
+    """Monta o prompt da extração em lote: o prompt do organizador uma única vez e os itens delimitados."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+    textos = "\n\n".join(f'<item id="{item_id}">\n{conteudo}\n</item>' for item_id, conteudo in itens)
+    return [
+        SystemMessage(content=PROMPT_ORGANIZADOR_LOTE),
+        HumanMessage(content=f"\nTextos para análise:\n{textos}")
+    ]
+
+async def _extrair_lote(itens: List[Tuple[int, str]]) -> Dict[int, SuggestionClasses]:
+    """Uma chamada para o lote inteiro; retorna só as propostas válidas (ids esperados, sem repetição)."""
+    structured_llm = obter_llm().with_structured_output(PropostasEmLote)
+    resposta = await gateway_llm.achamar("llm.extracao_lote", lambda: structured_llm.ainvoke(
+        montar_mensagens_lote(itens), config={"callbacks": callbacks_llm("llm.extracao_lote")}))
+    esperados = {item_id for item_id, _ in itens}
+    vistos, repetidos = {}, set()
+    for proposta in (resposta.propostas if resposta is not None else []):
+        if proposta.item_id in vistos:
+            repetidos.add(proposta.item_id)
+        vistos[proposta.item_id] = SuggestionClasses(**proposta.model_dump(exclude={"item_id"}))
+    return {item_id: proposta for item_id, proposta in vistos.items()
+            if item_id in esperados and item_id not in repetidos}
+
+async def aprocessar_itens_em_lote(itens: List[Tuple[int, str]]) -> Dict[int, Union[SuggestionClasses, Exception]]:
+    """Propostas de vários itens (id, conteudo) com poucas chamadas ao LLM.
+
+    Itens em cache não vão ao LLM; os demais são empacotados por tamanho (empacotar_itens) e cada lote
+    vira uma única chamada, sem repetir o prompt do organizador por item. Itens ausentes ou malformados
+    na resposta, ou o lote inteiro se a chamada falhar, são refeitos individualmente.
+    O resultado mapeia cada id à proposta, ou à exceção da chamada individual que falhou.
+    """
+    resultados: Dict[int, Union[SuggestionClasses, Exception]] = {}
+    faltantes = []
+    for item_id, conteudo in itens:
+        # O lote produz propostas dos dois prompts (em lote e, nos itens refeitos, o individual): aceita as duas.
+        # Já a extração individual (bot, CLI) só lê a chave do próprio prompt.
+        em_cache = (await asyncio.to_thread(cache_propostas.obter, _chave_lote(conteudo))
+                    or await asyncio.to_thread(cache_propostas.obter, _chave_se_cacheavel(conteudo, None)))
+        if em_cache is not None:
+            metricas.incrementar("llm.extracao.cache_acertos")
+            resultados[item_id] = SuggestionClasses.model_validate_json(em_cache)
+        else:
+            faltantes.append((item_id, conteudo))
+
+    async def processar_lote(lote: List[Tuple[int, str]]) -> None:
+        extraidas = {}
+        if len(lote) > 1:
+            try:
+                extraidas = await _extrair_lote(lote)
+            except Exception as e:
+                print(f"⚠️ Extração em lote de {len(lote)} itens falhou ({e}); processando item a item.")
+        individuais = []
+        for item_id, conteudo in lote:
+            if item_id in extraidas:
+                resultados[item_id] = extraidas[item_id]
+                await asyncio.to_thread(cache_propostas.guardar, _chave_lote(conteudo),
+                                        extraidas[item_id].model_dump_json())
+            else:
+                individuais.append((item_id, conteudo))
+        if len(lote) > 1 and individuais:
+            metricas.incrementar("llm.extracao_lote.itens_refeitos", len(individuais))
+        respostas = await asyncio.gather(*(aprocessar_item_com_llm(conteudo) for _, conteudo in individuais),
+                                         return_exceptions=True)
+        for (item_id, _), resposta in zip(individuais, respostas):
+            if isinstance(resposta, asyncio.CancelledError):
+                raise resposta
+            resultados[item_id] = resposta
+
+    await asyncio.gather(*(processar_lote(lote) for lote in empacotar_itens(faltantes)))
+    return resultados
+
 def exibir_proposta_para_revisao(proposal: SuggestionClasses) -> Tuple[bool, Optional[str]]:
     """Exibe a proposta para revisão humana e retorna (aprovado, feedback)."""
     print(f"\n=== PROPOSTA PARA REVISÃO ===")
@@ -69,87 +286,135 @@ def exibir_proposta_para_revisao(proposal: SuggestionClasses) -> Tuple[bool, Opt
         else:
             print("Por favor, responda com 's' para aprovar, 'n' para rejeitar, ou forneça feedback.")
 
-def salvar_proposta(proposal: SuggestionClasses) -> bool:
-    """Salva a proposta aprovada no banco de dados."""
+class ResultadoAplicacao(NamedTuple):
+    """Resultado de aplicar_proposta.
+
+    situacao: 'aplicada'; 'indisponivel', se o item não está mais reservado para quem revisou
+    (outro processador o reivindicou, ou a proposta já foi aplicada); ou 'falhou', erro na gravação.
+    vinculos: vínculos sugeridos para os itens criados (texto, um por linha), só quando aplicada.
+    """
+    situacao: str
+    vinculos: List[str] = []
+
+def aplicar_proposta(proposal: SuggestionClasses, item_id: int, dono: Optional[str] = None) -> ResultadoAplicacao:
+    """Aplica a proposta aprovada numa única transação: grava os itens e remove o item da CaixaEntrada.
+
+    O item só é removido se ainda estiver reservado para quem revisou: com `dono`, sob o lease dele;
+    sem `dono`, aguardando a revisão em bloco (processamento_lote). Caso contrário nada é gravado e o
+    resultado é 'indisponivel': a decisão da revisão nunca é aplicada duas vezes nem por cima de outro processo.
+    Informações já existentes (conteudo UNIQUE) são ignoradas em vez de desfazer a proposta inteira.
+    """
+    reservado = (CaixaEntrada.lease_dono == dono) if dono is not None else (CaixaEntrada.status == 'aguardando_revisao')
     try:
-        for info_conteudo in proposal.informacoes:
-            session.add(Informacao(conteudo=info_conteudo))
-        for ideia_conteudo in proposal.ideias:
-            session.add(Ideia(conteudo=ideia_conteudo))
-        for tarefa_conteudo in proposal.tarefas:
-            session.add(Tarefa(conteudo=tarefa_conteudo))
-        session.commit()
-        print("✅ Objetos criados com sucesso no banco de dados.")
-        return True
+        with nova_sessao() as sessao:
+            # Remover primeiro garante o lock de escrita antes de qualquer inserção
+            removidos = sessao.execute(
+                delete(CaixaEntrada).where(CaixaEntrada.id == item_id, reservado)
+            ).rowcount
+            if removidos == 0:
+                sessao.rollback()
+                print(f"⚠️ Item {item_id} não está mais reservado para esta revisão "
+                      f"(outro processo o assumiu ou já o aplicou); proposta não aplicada.")
+                return ResultadoAplicacao("indisponivel")
+            # Proposta do processamento em lote, se houver, deixa de estar pendente
+            sessao.execute(delete(PropostaPendente).where(PropostaPendente.item_id == item_id))
+
+            novos = []
+            if proposal.informacoes:
+                linhas = sessao.execute(
+                    sqlite_insert(Informacao).on_conflict_do_nothing(index_elements=["conteudo"])
+                    .returning(Informacao.id, Informacao.conteudo),
+                    [{"conteudo": c} for c in dict.fromkeys(proposal.informacoes)],
+                ).all()
+                novos += [('informacoes', item, conteudo) for item, conteudo in linhas]
+            for tabela, classe, conteudos in (('ideias', Ideia, proposal.ideias), ('tarefas', Tarefa, proposal.tarefas)):
+                if conteudos:
+                    linhas = sessao.execute(
+                        insert(classe).returning(classe.id, classe.conteudo),
+                        [{"conteudo": c} for c in conteudos],
+                    ).all()
+                    novos += [(tabela, item, conteudo) for item, conteudo in linhas]
+        print(f"✅ Proposta do item {item_id} gravada e item removido da Caixa de Entrada.")
     except Exception as e:
-        session.rollback()
-        print(f"❌ Erro ao salvar no banco de dados: {e}")
-        return False
+        print(f"❌ Erro ao aplicar proposta do item {item_id}: {e}")
+        return ResultadoAplicacao("falhou")
+    return ResultadoAplicacao("aplicada", sugestoes_de_vinculos(novos))
 
-def remover_item_da_caixa_entrada(item_id: int) -> bool:
-    """Remove o item processado da CaixaEntrada."""
+def sugestoes_de_vinculos(novos_itens: List[Tuple[str, int, str]]) -> List[str]:
+    """Indexa os itens recém-criados no índice semântico e retorna (e exibe) os vínculos sugeridos."""
+    from indice_semantico import sugerir_vinculos
+    from busca import NOMES_TABELAS
     try:
-        item = session.get(CaixaEntrada, item_id)
-        if item is not None:
-            session.delete(item)
-            session.commit()
-            print(f"✅ Item {item_id} removido da Caixa de Entrada.")
-            return True
-        else:
-            print(f"⚠️ Item {item_id} não encontrado para remoção.")
-            return False
+        sugestoes = sugerir_vinculos(novos_itens)
     except Exception as e:
-        session.rollback()
-        print(f"❌ Erro ao remover item {item_id}: {e}")
-        return False
+        # O índice é auxiliar: uma falha aqui não desfaz o salvamento
+        print(f"⚠️ Não foi possível sugerir vínculos: {e}")
+        return []
+    linhas = [
+        f"🔗 {NOMES_TABELAS[tabela]} {item_id} ↔ {NOMES_TABELAS[destino]} {destino_id} (similaridade {score:.2f})"
+        for tabela, item_id, destino, destino_id, score in sugestoes
+    ]
+    for linha in linhas:
+        print(f"Vínculo sugerido: {linha}")
+    return linhas
+
+def formatar_vinculos_sugeridos(vinculos: List[str]) -> str:
+    """Trecho da mensagem de confirmação com os vínculos sugeridos, ou vazio se não houver."""
+    if not vinculos:
+        return ""
+    return "\n\nVínculos sugeridos:\n" + "\n".join(vinculos)
 
 def processar_caixa_entrada():
-    """Processa todos os itens da CaixaEntrada sequencialmente."""
+    """Processa todos os itens disponíveis da CaixaEntrada sequencialmente."""
     print("=== Iniciando processamento da Caixa de Entrada ===")
+    dono = identificador_processo("cli")
     
     while True:
-        # 1. Buscar próximo item
-        item = session.query(CaixaEntrada).order_by(CaixaEntrada.id.asc()).first()
-        if not item:
-            print("✅ Nenhum item na Caixa de Entrada. Processamento encerrado.")
+        # 1. Reivindicar próximo item (outros processadores não o pegam enquanto o lease valer)
+        proximo = reivindicar_proximo(dono)
+        if not proximo:
+            print("✅ Nenhum item disponível na Caixa de Entrada. Processamento encerrado.")
             break
+        item_id, conteudo_bruto = proximo
             
-        print(f"\n🔄 Processando Item {item.id}")
-        print(f"Conteúdo: {item.conteudo_bruto[:100]}...")
+        print(f"\n🔄 Processando Item {item_id}")
+        print(f"Conteúdo: {conteudo_bruto[:100]}...")
         
         # Inicializar histórico de mensagens
-        messages_history = [
-            SystemMessage(content=PROMPT_ORGANIZADOR),
-            HumanMessage(content=f"\nTexto para análise:\n{item.conteudo_bruto}")
-        ]
+        messages_history = montar_mensagens_iniciais(conteudo_bruto)
         
         # 2. Loop de processamento com feedback
         while True:
             try:
-                proposal = processar_item_com_llm(item.conteudo_bruto, messages_history)
+                proposal = processar_item_com_llm(conteudo_bruto, messages_history)
             except Exception as e:
                 print(f"❌ Erro ao processar item com LLM: {e}")
-                break
+                # Devolve o item à fila e encerra, em vez de tentar o mesmo item indefinidamente
+                liberar(item_id, dono)
+                return
             
             # 3. Review gate (sempre necessário)
             if not proposal.aprovado:
+                # A revisão humana pode levar mais que o lease de processamento: estendê-lo antes de esperar
+                if not renovar_lease(item_id, dono, DURACAO_LEASE_REVISAO):
+                    print(f"⚠️ Lease do item {item_id} perdido; outro processo o assumiu.")
+                    proposal = None
+                    break
                 aprovado, feedback = exibir_proposta_para_revisao(proposal)
                 
                 if aprovado:
                     # Aprovado pelo usuário
                     break
                 elif feedback:
-                    # Feedback fornecido - adicionar ao histórico e reprocessar
-                    # Adiciona a resposta anterior da IA
-                    ai_response = f"Sugestão anterior:\nInformações: {proposal.informacoes}\nIdeias: {proposal.ideias}\nTarefas: {proposal.tarefas}"
-                    messages_history.append(AIMessage(content=ai_response))
-                    # Adiciona o feedback do usuário
-                    messages_history.append(HumanMessage(content=f"Feedback do usuário: {feedback}\n\nPor favor, revise e melhore a análise considerando este feedback."))
+                    # Feedback fornecido - reprocessar a partir da proposta atual e das correções acumuladas
+                    messages_history = incorporar_feedback(conteudo_bruto, proposal, messages_history, feedback)
                     print("🔄 Reprocessando com feedback...")
                     continue
                 else:
-                    # Rejeitado sem feedback
-                    print("❌ Item rejeitado, mantido na Caixa de Entrada.")
+                    # Rejeitado sem feedback: adiado, para não ser oferecido de novo em seguida
+                    print("❌ Item rejeitado, mantido na Caixa de Entrada (adiado).")
+                    adiar(item_id, dono)
+                    descartar_propostas_em_cache(conteudo_bruto)
                     proposal = None
                     break
             else:
@@ -160,15 +425,13 @@ def processar_caixa_entrada():
         if proposal is None:
             continue
             
-        # 4. Salvar apenas se aprovado
-        if salvar_proposta(proposal):
-            # 5. Remover da CaixaEntrada APÓS confirmação de salvamento
-            if remover_item_da_caixa_entrada(item.id):
-                print(f"✅ Item {item.id} processado com sucesso!")
-            else:
-                print(f"⚠️ Item {item.id} salvo mas não removido da Caixa de Entrada.")
-        else:
-            print(f"❌ Falha ao salvar item {item.id}, mantido na Caixa de Entrada.")
+        # 4. Salvar e remover da CaixaEntrada numa única transação, se o item ainda for deste processo
+        situacao = aplicar_proposta(proposal, item_id, dono).situacao
+        if situacao == "aplicada":
+            print(f"✅ Item {item_id} processado com sucesso!")
+        elif situacao == "falhou":
+            print(f"❌ Falha ao salvar item {item_id}, mantido na Caixa de Entrada.")
+            liberar(item_id, dono)
 
 if __name__ == "__main__":
     processar_caixa_entrada()
\ No newline at end of file
@@ -5,19 +5,28 @@ load_dotenv(override=True)
 google_api_key = os.getenv('GOOGLE_API_KEY')
 tavily_api_key = os.getenv('TAVILY_API_KEY')
 
+import sqlite3
 from typing import List, Optional, TypedDict
-from langchain.chat_models import init_chat_model
 from langgraph.graph import MessagesState
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
 from pydantic import BaseModel, Field
 from prompts import PROMPT_ORGANIZADOR
-from modelo import session, Informacao, Ideia, Tarefa, CaixaEntrada
+from modelo import nova_sessao, Informacao, Ideia, Tarefa, CaixaEntrada
+from gateway_llm import gateway_llm
 
 #item_teste = "Copel afirma não haver créditos para realocar do apartamento antigo, e indeferiu meu pedido. Preciso entender o que a Copel está fazendo."
 
-llmodel = init_chat_model("google_genai:gemini-2.0-flash-lite") # Use temperature aqui se quiser
+llmodel = None  # criado no primeiro uso do nó llm (ver obter_llm)
+
+def obter_llm():
+    """Inicializa o cliente do LLM sob demanda."""
+    global llmodel
+    if llmodel is None:
+        from langchain.chat_models import init_chat_model
+        llmodel = init_chat_model("google_genai:gemini-2.0-flash-lite", max_retries=1) # Use temperature aqui se quiser
+    return llmodel
 
 class SuggestionClasses(BaseModel):
     """Estrutura de saída do LLM com fatos (informações), ideias, tarefas e status de aprovação."""
@@ -69,7 +78,8 @@ class ConsumeOutput(TypedDict):
 # Node
 def fetch_input(state: AppState) -> FetchOutput:
     """Busca o próximo item da CaixaEntrada. Se houver, injeta mensagens iniciais e armazena o id; caso contrário, informa que não há itens."""
-    next_item = session.query(CaixaEntrada).order_by(CaixaEntrada.id.asc()).first()
+    with nova_sessao() as sessao:
+        next_item = sessao.query(CaixaEntrada).order_by(CaixaEntrada.id.asc()).first()
     if next_item is None:
         return {
             "messages": [AIMessage(content="Nenhum item na Caixa de Entrada. Processamento encerrado.")],
@@ -86,8 +96,8 @@ def fetch_input(state: AppState) -> FetchOutput:
 
 def llm(state: AppState) -> LlmOutput:
     """Gera uma proposta estruturada via LLM e adiciona uma mensagem do assistente ao histórico."""
-    structured_llm = llmodel.with_structured_output(SuggestionClasses)
-    suggestion = structured_llm.invoke(state["messages"])
+    structured_llm = obter_llm().with_structured_output(SuggestionClasses)
+    suggestion = gateway_llm.chamar("llm.extracao", lambda: structured_llm.invoke(state["messages"]))
     return {
         "messages": [AIMessage(content=f"Proposta estruturada: {suggestion.model_dump_json()}")],
         "current_proposal": suggestion
@@ -116,16 +126,15 @@ def store(state: AppState) -> StoreOutput:
     if proposal is None:
         return {"messages": [AIMessage(content="Nenhuma proposta presente para armazenar.")]}
     try:
-        for info_conteudo in proposal.informacoes:
-            session.add(Informacao(conteudo=info_conteudo))
-        for ideia_conteudo in proposal.ideias:
-            session.add(Ideia(conteudo=ideia_conteudo))
-        for tarefa_conteudo in proposal.tarefas:
-            session.add(Tarefa(conteudo=tarefa_conteudo))
-        session.commit()
+        with nova_sessao() as sessao:
+            for info_conteudo in proposal.informacoes:
+                sessao.add(Informacao(conteudo=info_conteudo))
+            for ideia_conteudo in proposal.ideias:
+                sessao.add(Ideia(conteudo=ideia_conteudo))
+            for tarefa_conteudo in proposal.tarefas:
+                sessao.add(Tarefa(conteudo=tarefa_conteudo))
         return {"messages": [AIMessage(content="Objetos criados com sucesso no banco de dados.")]}
     except Exception as e:
-        session.rollback()
         return {"messages": [AIMessage(content=f"Erro ao salvar no banco de dados: {e}")]}
 
 
@@ -135,14 +144,14 @@ def consume_input(state: AppState) -> ConsumeOutput:
     if item_id is None:
         return {"messages": [AIMessage(content="Nenhum item para consumir.")], "current_input_id": None}
     try:
-        item = session.get(CaixaEntrada, item_id)
+        with nova_sessao() as sessao:
+            item = sessao.get(CaixaEntrada, item_id)
+            if item is not None:
+                sessao.delete(item)
         if item is not None:
-            session.delete(item)
-            session.commit()
             return {"messages": [AIMessage(content=f"Item {item_id} removido da Caixa de Entrada.")], "current_input_id": None}
         return {"messages": [AIMessage(content=f"Item {item_id} não encontrado para remoção.")], "current_input_id": None}
     except Exception as e:
-        session.rollback()
         return {"messages": [AIMessage(content=f"Erro ao remover item {item_id}: {e}")], "current_input_id": None}
 
 
@@ -179,7 +188,16 @@ builder.add_edge("store", "consume_input")
 
 builder.add_edge("consume_input", "fetch_input")
 
-memory = InMemorySaver()
+def criar_checkpointer() -> SqliteSaver:
+    """Checkpoints do grafo em SQLite (checkpoints_grafo.db, no diretório atual).
+
+    Uma execução interrompida (ex.: durante a revisão) é retomada do último nó concluído,
+    sem repetir a chamada ao LLM que gerou a proposta.
+    """
+    conexao = sqlite3.connect(os.path.join(os.getcwd(), 'checkpoints_grafo.db'), check_same_thread=False)
+    return SqliteSaver(conexao)
+
+memory = criar_checkpointer()
 graph = builder.compile(checkpointer=memory)
 
 def maybe_generate_grafo_png_with_fallback() -> None:
@@ -201,17 +219,25 @@ def maybe_generate_grafo_png_with_fallback() -> None:
 config = {"configurable": {"thread_id": "1"}}
 
 def stream_graph_updates(message_list: List[SystemMessage | HumanMessage]) -> Optional[str]:
-    """Executa o grafo em stream e retorna o último conteúdo de mensagem produzido pelo assistente."""
+    """Executa o grafo em stream e retorna o último conteúdo de mensagem produzido pelo assistente.
+
+    Se a execução anterior desta thread foi interrompida no meio, ela é retomada do último checkpoint.
+    """
     last_content = None
-    for chunk in graph.stream({"messages": message_list}, config, stream_mode="values"):
+    entrada = {"messages": message_list}
+    if graph.get_state(config).next:
+        print("🔄 Retomando execução interrompida a partir do último checkpoint.")
+        entrada = None
+    for chunk in graph.stream(entrada, config, stream_mode="values"):
         if isinstance(chunk, dict) and "messages" in chunk and chunk["messages"]:
             last_content = chunk["messages"][-1].content
     if last_content is not None:
         print("Assistant:", last_content)
     return last_content
 
-maybe_generate_grafo_png_with_fallback()
-print("=== Iniciando análise (loop CaixaEntrada) ===")
-# Inicia com histórico vazio; fetch_input irá abastecer
-stream_graph_updates([])
+if __name__ == "__main__":
+    maybe_generate_grafo_png_with_fallback()
+    print("=== Iniciando análise (loop CaixaEntrada) ===")
+    # Inicia com histórico vazio; fetch_input irá abastecer
+    stream_graph_updates([])
 
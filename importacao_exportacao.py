@@ -0,0 +1,379 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, TextIO
+from sqlalchemy import insert, select
+from modelo import (CaixaEntrada, Informacao, Ideia, Tarefa, Plano, nova_sessao,
+                    ideia_informacao_association_table, tarefa_informacao_association_table)
+
+# Importação e exportação em massa, em fluxo: o arquivo é lido (ou escrito) registro a registro e
+# o banco é acessado em lotes, então a memória não cresce com o tamanho do arquivo.
+# - importar: JSONL, JSON (uma lista), CSV, Markdown ou texto puro (ex.: exportação de um app de notas) para a
+#   Caixa de Entrada, um lote por transação; se o processo cair, os lotes já gravados ficam e --pular N retoma
+#   do ponto certo, com o N de registros lidos da última mensagem de progresso.
+# - exportar: Informações, Ideias, Tarefas e Planos, com os vínculos, em JSONL (uma linha por item).
+# Uso: python importacao_exportacao.py importar notas.md
+#      python importacao_exportacao.py exportar conhecimento.jsonl
+
+# Registros por transação na importação e linhas por consulta na exportação
+TAMANHO_LOTE = int(os.getenv("IMPORTACAO_TAMANHO_LOTE", "1000"))
+# Itens maiores que isto (em caracteres) são divididos em vários: um arquivo sem quebras não vira um item gigante
+MAX_CARACTERES_ITEM = int(os.getenv("IMPORTACAO_MAX_CARACTERES_ITEM", "10000"))
+# Intervalo mínimo entre mensagens de progresso (segundos)
+INTERVALO_PROGRESSO = 5.0
+
+FORMATOS = ("jsonl", "json", "csv", "md", "txt")
+_EXTENSOES = {".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "json", ".csv": "csv",
+              ".md": "md", ".markdown": "md", ".txt": "txt"}
+# Campos procurados, em ordem, para o conteúdo de um registro JSON/JSONL ou de uma linha CSV
+CAMPOS_CONTEUDO = ("conteudo_bruto", "conteudo", "texto", "text", "content", "body", "nota", "note")
+
+_TITULO_MD = re.compile(r"^\s{0,3}#{1,6}\s+")
+_ITEM_LISTA_MD = re.compile(r"^(?:[-*+]|\d+[.)])\s+")
+_CERCA_MD = re.compile(r"^\s{0,3}(```|~~~)")
+
+### LEITURA ###
+
+def detectar_formato(caminho: str) -> str:
+    """Formato pelo sufixo do arquivo; erro se não for reconhecido."""
+    formato = _EXTENSOES.get(os.path.splitext(caminho)[1].lower())
+    if formato is None:
+        raise ValueError(f"Não foi possível deduzir o formato de '{caminho}'. Use --formato ({', '.join(FORMATOS)}).")
+    return formato
+
+def _limitar(texto: str) -> Iterator[str]:
+    """O texto limpo, em pedaços de até MAX_CARACTERES_ITEM; nada se estiver vazio."""
+    texto = texto.replace("\r\n", "\n").strip()
+    while len(texto) > MAX_CARACTERES_ITEM:
+        corte = texto.rfind("\n", 0, MAX_CARACTERES_ITEM)
+        if corte <= 0:
+            corte = MAX_CARACTERES_ITEM
+        yield texto[:corte].strip()
+        texto = texto[corte:].strip()
+    if texto:
+        yield texto
+
+def _registro(texto: str) -> Iterator[str]:
+    """O texto limpo de um registro; nada se estiver vazio. A divisão em itens fica para a gravação."""
+    texto = texto.replace("\r\n", "\n").strip()
+    if texto:
+        yield texto
+
+def _campo_conteudo(registro: dict, coluna: Optional[str]) -> Optional[str]:
+    if coluna is not None:
+        return registro.get(coluna)
+    for campo in CAMPOS_CONTEUDO:
+        if registro.get(campo):
+            return registro[campo]
+    return None
+
+def _conteudo_json(registro, coluna: Optional[str]) -> Optional[str]:
+    """Uma string JSON é o próprio conteúdo; de um objeto, o campo de conteúdo."""
+    conteudo = registro if isinstance(registro, str) else (
+        _campo_conteudo(registro, coluna) if isinstance(registro, dict) else None)
+    return conteudo if isinstance(conteudo, str) else None
+
+def ler_jsonl(arquivo: TextIO, coluna: Optional[str] = None) -> Iterator[str]:
+    """Um registro por linha: uma string JSON ou um objeto com o conteúdo num dos CAMPOS_CONTEUDO (ou em `coluna`)."""
+    for numero, linha in enumerate(arquivo, start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except json.JSONDecodeError as e:
+            print(f"⚠️ Linha {numero} ignorada: JSON inválido ({e.msg}).")
+            continue
+        conteudo = _conteudo_json(registro, coluna)
+        if conteudo is None:
+            print(f"⚠️ Linha {numero} ignorada: sem campo de conteúdo.")
+            continue
+        yield from _registro(conteudo)
+
+def ler_json(arquivo: TextIO, coluna: Optional[str] = None) -> Iterator[str]:
+    """Um registro por elemento de uma lista JSON (strings ou objetos, como no JSONL).
+
+    O arquivo é carregado inteiro: para arquivos grandes, prefira JSONL, lido linha a linha.
+    """
+    try:
+        registros = json.load(arquivo)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON inválido na linha {e.lineno}: {e.msg}. Para um objeto por linha, use --formato jsonl.")
+    if not isinstance(registros, list):
+        raise ValueError("O arquivo JSON precisa conter uma lista de registros. Para um objeto por linha, use --formato jsonl.")
+    for numero, registro in enumerate(registros, start=1):
+        conteudo = _conteudo_json(registro, coluna)
+        if conteudo is None:
+            print(f"⚠️ Registro {numero} ignorado: sem campo de conteúdo.")
+            continue
+        yield from _registro(conteudo)
+
+def ler_csv(arquivo: TextIO, coluna: Optional[str] = None) -> Iterator[str]:
+    """Um registro por linha; a coluna é `coluna`, a primeira entre os CAMPOS_CONTEUDO ou, na falta delas, a primeira."""
+    # Células com notas longas passam do limite padrão do módulo csv (128 KB)
+    csv.field_size_limit(2**31 - 1)
+    leitor = csv.DictReader(arquivo)
+    campos = leitor.fieldnames or []
+    if coluna is None:
+        coluna = next((campo for campo in CAMPOS_CONTEUDO if campo in campos), campos[0] if campos else None)
+    if coluna not in campos:
+        raise ValueError(f"Coluna '{coluna}' não encontrada no CSV (colunas: {', '.join(campos) or 'nenhuma'}).")
+    for linha in leitor:
+        yield from _registro(linha[coluna] or "")
+
+def ler_markdown(arquivo: TextIO) -> Iterator[str]:
+    """Cada seção (título e o texto até o próximo título) é um registro; fora de seções, cada parágrafo
+    ou item de lista de primeiro nível. Blocos de código cercados (```) não são divididos."""
+    bloco: List[str] = []
+    tamanho = 0
+    em_secao = False
+    em_cerca = False
+    for linha in arquivo:
+        linha = linha.rstrip("\r\n")
+        if _CERCA_MD.match(linha):
+            em_cerca = not em_cerca
+        elif not em_cerca:
+            titulo = _TITULO_MD.match(linha)
+            marcador = titulo or (None if em_secao else _ITEM_LISTA_MD.match(linha))
+            # Um novo título, um item de lista fora de seção ou uma linha em branco fora de seção fecham o bloco
+            if marcador or (not em_secao and not linha.strip()):
+                yield from _registro("\n".join(bloco))
+                bloco, tamanho = [], 0
+                if marcador:
+                    # O item guarda só o texto, sem o marcador de título ou de lista
+                    em_secao = em_secao or titulo is not None
+                    linha = linha[marcador.end():]
+                if not linha.strip():
+                    continue
+        bloco.append(linha)
+        tamanho += len(linha) + 1
+        if tamanho > MAX_CARACTERES_ITEM:
+            # Seção enorme: sai em pedaços, sem acumular o arquivo inteiro
+            yield from _registro("\n".join(bloco))
+            bloco, tamanho = [], 0
+    yield from _registro("\n".join(bloco))
+
+def ler_texto(arquivo: TextIO, por_linha: bool = False) -> Iterator[str]:
+    """Cada parágrafo (separado por linha em branco) é um registro; com `por_linha`, cada linha."""
+    bloco: List[str] = []
+    tamanho = 0
+    for linha in arquivo:
+        linha = linha.rstrip("\r\n")
+        if por_linha or not linha.strip() or tamanho > MAX_CARACTERES_ITEM:
+            yield from _registro("\n".join(bloco))
+            bloco, tamanho = [], 0
+        if linha.strip():
+            bloco.append(linha)
+            tamanho += len(linha) + 1
+    yield from _registro("\n".join(bloco))
+
+def ler_registros(arquivo: TextIO, formato: str, coluna: Optional[str] = None, por_linha: bool = False) -> Iterator[str]:
+    """Os registros do arquivo (linhas, elementos, seções ou parágrafos, conforme o formato), lidos sob demanda."""
+    if formato == "jsonl":
+        return ler_jsonl(arquivo, coluna)
+    if formato == "json":
+        return ler_json(arquivo, coluna)
+    if formato == "csv":
+        return ler_csv(arquivo, coluna)
+    if formato == "md":
+        return ler_markdown(arquivo)
+    if formato == "txt":
+        return ler_texto(arquivo, por_linha)
+    raise ValueError(f"Formato não suportado: {formato}")
+
+@contextmanager
+def _abrir(caminho: str, modo: str):
+    """Abre o arquivo em UTF-8; '-' é a entrada ou a saída padrão."""
+    if caminho == "-":
+        yield sys.stdin if "r" in modo else sys.stdout
+        return
+    # newline="": o módulo csv cuida das quebras de linha dentro de células; utf-8-sig descarta o BOM do Excel
+    with open(caminho, modo, encoding="utf-8-sig" if "r" in modo else "utf-8", newline="") as arquivo:
+        yield arquivo
+
+### IMPORTAÇÃO ###
+
+def gravar_em_lotes(registros: Iterable[str], tamanho_lote: int = TAMANHO_LOTE, pular: int = 0) -> int:
+    """Insere os registros na Caixa de Entrada, uma transação por lote; retorna quantos itens foram gravados.
+
+    Registros maiores que MAX_CARACTERES_ITEM viram vários itens. `pular` conta registros do arquivo,
+    não itens, e os lotes só fecham entre registros: os registros lidos informados no progresso ou
+    na interrupção são o --pular que retoma a importação sem duplicar nem perder itens.
+    """
+    gravados = 0
+    lidos = confirmados = pular
+    lote: List[dict] = []
+    inicio = ultimo_relatorio = time.perf_counter()
+
+    def gravar():
+        nonlocal gravados, confirmados, ultimo_relatorio
+        with nova_sessao() as sessao:
+            # executemany: um único INSERT preparado para o lote inteiro
+            sessao.execute(insert(CaixaEntrada), lote)
+        gravados += len(lote)
+        confirmados = lidos
+        lote.clear()
+        agora = time.perf_counter()
+        if agora - ultimo_relatorio >= INTERVALO_PROGRESSO:
+            ultimo_relatorio = agora
+            print(f"  {lidos} registros lidos, {gravados} itens gravados "
+                  f"({gravados / (agora - inicio):.0f} itens/s)")
+
+    try:
+        for indice, registro in enumerate(registros):
+            if indice < pular:
+                continue
+            lote.extend({"conteudo_bruto": conteudo} for conteudo in _limitar(registro))
+            lidos += 1
+            if len(lote) >= tamanho_lote:
+                gravar()
+        if lote:
+            gravar()
+    except BaseException:
+        if confirmados > pular:
+            print(f"⚠️ Importação interrompida com {confirmados} registros lidos e gravados; "
+                  f"para retomar, use --pular {confirmados}.")
+        raise
+    return gravados
+
+def importar(caminho: str, formato: Optional[str] = None, coluna: Optional[str] = None,
+             por_linha: bool = False, tamanho_lote: int = TAMANHO_LOTE, pular: int = 0) -> int:
+    """Importa o arquivo para a Caixa de Entrada; retorna o número de itens gravados."""
+    if formato is None:
+        if caminho == "-":
+            raise ValueError("Para ler da entrada padrão, informe --formato.")
+        formato = detectar_formato(caminho)
+    with _abrir(caminho, "r") as arquivo:
+        gravados = gravar_em_lotes(ler_registros(arquivo, formato, coluna, por_linha), tamanho_lote, pular)
+    print(f"✅ {gravados} itens importados para a Caixa de Entrada.")
+    return gravados
+
+### EXPORTAÇÃO ###
+
+# Ordem do arquivo: os itens referenciados pelos vínculos vêm antes de quem os referencia
+TABELAS_EXPORTACAO = {
+    'informacoes': Informacao,
+    'ideias': Ideia,
+    'tarefas': Tarefa,
+    'planos': Plano,
+}
+
+def _agrupar(linhas) -> dict:
+    """{chave: [valores]} a partir de pares (chave, valor) já ordenados."""
+    grupos = {}
+    for chave, valor in linhas:
+        grupos.setdefault(chave, []).append(valor)
+    return grupos
+
+def _vinculos_da_pagina(sessao, tabela: str, primeiro_id: int, ultimo_id: int) -> dict:
+    """Ids vinculados aos itens da página (intervalo de ids), numa consulta por tabela de vínculo."""
+    if tabela == 'ideias':
+        assoc = ideia_informacao_association_table
+        origem = assoc.c.ideia_id
+    elif tabela == 'tarefas':
+        assoc = tarefa_informacao_association_table
+        origem = assoc.c.tarefa_id
+    elif tabela == 'planos':
+        return _agrupar(sessao.execute(
+            select(Tarefa.plano_id, Tarefa.id)
+            .where(Tarefa.plano_id.between(primeiro_id, ultimo_id))
+            .order_by(Tarefa.plano_id, Tarefa.id)))
+    else:
+        return {}
+    return _agrupar(sessao.execute(
+        select(origem, assoc.c.informacao_id)
+        .where(origem.between(primeiro_id, ultimo_id))
+        .order_by(origem, assoc.c.informacao_id)))
+
+def _pagina(tabela: str, apos_id: int, tamanho_lote: int) -> List[dict]:
+    """Próxima página de registros da tabela (id > apos_id), já com os vínculos."""
+    classe = TABELAS_EXPORTACAO[tabela]
+    if tabela == 'planos':
+        consulta = select(Plano.id, Plano.ideia_id)
+    elif tabela == 'tarefas':
+        consulta = select(Tarefa.id, Tarefa.conteudo, Tarefa.plano_id)
+    else:
+        consulta = select(classe.id, classe.conteudo)
+    with nova_sessao() as sessao:
+        linhas = sessao.execute(consulta.where(classe.id > apos_id).order_by(classe.id).limit(tamanho_lote)).all()
+        if not linhas:
+            return []
+        vinculos = _vinculos_da_pagina(sessao, tabela, linhas[0][0], linhas[-1][0])
+    registros = []
+    for linha in linhas:
+        registro = {"tabela": tabela, "id": linha[0]}
+        if tabela == 'planos':
+            registro["ideia_id"] = linha[1]
+            registro["tarefas"] = vinculos.get(linha[0], [])
+        else:
+            registro["conteudo"] = linha[1]
+            if tabela == 'tarefas':
+                registro["plano_id"] = linha[2]
+            if tabela in ('ideias', 'tarefas'):
+                registro["informacoes"] = vinculos.get(linha[0], [])
+        registros.append(registro)
+    return registros
+
+def iterar_exportacao(tabelas: Iterable[str] = TABELAS_EXPORTACAO, tamanho_lote: int = TAMANHO_LOTE) -> Iterator[dict]:
+    """Registros de exportação das tabelas, em ordem de id, lidos página a página (paginação por chave).
+
+    Cada página é lida numa transação curta, sem travar o bot durante uma exportação longa;
+    itens criados durante a exportação podem ou não aparecer.
+    """
+    for tabela in tabelas:
+        apos_id = 0
+        while True:
+            registros = _pagina(tabela, apos_id, tamanho_lote)
+            yield from registros
+            if len(registros) < tamanho_lote:
+                break
+            apos_id = registros[-1]["id"]
+
+def exportar(caminho: str, tabelas: Iterable[str] = TABELAS_EXPORTACAO, tamanho_lote: int = TAMANHO_LOTE) -> int:
+    """Grava as tabelas em JSONL, uma linha por item com os ids vinculados; retorna o número de linhas."""
+    tabelas = list(tabelas)
+    desconhecidas = [tabela for tabela in tabelas if tabela not in TABELAS_EXPORTACAO]
+    if desconhecidas:
+        raise ValueError(f"Tabelas desconhecidas: {', '.join(desconhecidas)} (use {', '.join(TABELAS_EXPORTACAO)}).")
+    linhas = 0
+    ultimo_relatorio = time.perf_counter()
+    # Com a saída padrão como destino, o progresso vai para stderr para não misturar com os dados
+    progresso = sys.stderr if caminho == "-" else sys.stdout
+    with _abrir(caminho, "w") as arquivo:
+        for registro in iterar_exportacao(tabelas, tamanho_lote):
+            arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            linhas += 1
+            if linhas % tamanho_lote == 0 and time.perf_counter() - ultimo_relatorio >= INTERVALO_PROGRESSO:
+                ultimo_relatorio = time.perf_counter()
+                print(f"  {linhas} linhas exportadas", file=progresso)
+    print(f"✅ {linhas} itens exportados.", file=progresso)
+    return linhas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importação e exportação em massa.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    importacao = subcomandos.add_parser("importar", help="grava os itens de um arquivo na Caixa de Entrada")
+    importacao.add_argument("arquivo", help="caminho do arquivo, ou - para a entrada padrão")
+    importacao.add_argument("--formato", choices=FORMATOS, help="padrão: deduzido da extensão")
+    importacao.add_argument("--coluna", help="campo do JSON/JSONL ou coluna do CSV com o conteúdo")
+    importacao.add_argument("--por-linha", action="store_true", help="texto puro: um item por linha, não por parágrafo")
+    importacao.add_argument("--pular", type=int, default=0, help="ignora os primeiros N registros do arquivo, não itens (retomar uma importação)")
+    importacao.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE)
+    exportacao = subcomandos.add_parser("exportar", help="grava Informações, Ideias, Tarefas e Planos em JSONL")
+    exportacao.add_argument("arquivo", help="caminho do arquivo, ou - para a saída padrão")
+    exportacao.add_argument("--tabelas", nargs="+", default=list(TABELAS_EXPORTACAO), choices=list(TABELAS_EXPORTACAO))
+    exportacao.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE)
+    argumentos = parser.parse_args()
+    try:
+        if argumentos.comando == "importar":
+            importar(argumentos.arquivo, argumentos.formato, argumentos.coluna, argumentos.por_linha,
+                     argumentos.tamanho_lote, argumentos.pular)
+        else:
+            exportar(argumentos.arquivo, argumentos.tabelas, argumentos.tamanho_lote)
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,321 @@
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from modelo import nova_sessao, Informacao, Ideia, Tarefa, TABELAS_BUSCA
+from busca import normalizar_tokens
+
+# Índice vetorial local (sem rede) para sugerir vínculos entre Informações, Ideias e Tarefas.
+# Os vetores são gerados por hashing de palavras e trigramas de caracteres, e ficam num
+# arquivo float32 só de acréscimo; as chaves usam a mesma codificação do índice de busca
+# (id * 4 + código da tabela).
+# A busca é exaustiva (força bruta): custo linear no número de vetores indexados.
+diretorio_indice = os.path.join(os.getcwd(), 'indice_semantico')
+
+DIMENSAO = 256
+CLASSES_INDEXADAS = {'informacoes': Informacao, 'ideias': Ideia, 'tarefas': Tarefa}
+# Vínculos possíveis no modelo: Informacao <-> Ideia e Informacao <-> Tarefa
+VINCULOS_POSSIVEIS = {
+    'informacoes': ['ideias', 'tarefas'],
+    'ideias': ['informacoes'],
+    'tarefas': ['informacoes'],
+}
+
+def _chave(tabela: str, item_id: int) -> int:
+    return item_id * 4 + TABELAS_BUSCA[tabela][0]
+
+_TABELA_POR_CODIGO = {codigo: tabela for tabela, (codigo, _) in TABELAS_BUSCA.items()}
+
+def _atributos(texto: str) -> List[str]:
+    """Palavras normalizadas mais trigramas de caracteres (aproxima plurais e variações)."""
+    atributos = []
+    for palavra in normalizar_tokens(texto):
+        atributos.append(palavra)
+        marcada = f"<{palavra}>"
+        atributos.extend(marcada[i:i + 3] for i in range(len(marcada) - 2))
+    return atributos
+
+def vetorizar(textos: Iterable[str]) -> np.ndarray:
+    """Gera a matriz (n, DIMENSAO) de vetores normalizados (norma L2 = 1) para os textos."""
+    textos = list(textos)
+    matriz = np.zeros((len(textos), DIMENSAO), dtype=np.float32)
+    for linha, texto in enumerate(textos):
+        for atributo in _atributos(texto):
+            h = zlib.crc32(atributo.encode("utf-8"))
+            # Hashing com sinal: colisões tendem a se cancelar em vez de se somar
+            matriz[linha, h % DIMENSAO] += 1.0 if (h >> 31) & 1 else -1.0
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    np.divide(matriz, normas, out=matriz, where=normas > 0)
+    return matriz
+
+class IndiceSemantico:
+    """Matriz de vetores em disco com busca top-k por similaridade de cosseno em lote.
+
+    Bot, CLI e processamento em lote usam os mesmos arquivos ao mesmo tempo. Toda leitura ou escrita
+    acontece sob uma trava de arquivo (entre processos) e um lock (entre threads), depois de trazer
+    para a memória as linhas que outros processos acrescentaram. Os arquivos são só de acréscimo,
+    inclusive as remoções: uma linha com a chave -(chave + 1) apaga a chave, sem depender da posição
+    das linhas em cada processo. Linhas de uma mesma chave valem pela última.
+    """
+
+    def __init__(self, diretorio: str = diretorio_indice):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        self._arquivo_vetores = os.path.join(diretorio, 'vetores.f32')
+        self._arquivo_chaves = os.path.join(diretorio, 'chaves.i64')
+        self._arquivo_trava = os.path.join(diretorio, 'trava')
+        # Incrementada a cada compactação: os outros processos recarregam os arquivos do zero
+        self._arquivo_geracao = os.path.join(diretorio, 'geracao')
+        self._lock = threading.RLock()
+        self._trava = None
+        self._profundidade = 0
+        self._geracao = None
+        self._zerar_memoria()
+        with self._exclusivo():
+            pass
+
+    def _zerar_memoria(self) -> None:
+        self._n = 0
+        self._vetores = np.zeros((1024, DIMENSAO), dtype=np.float32)
+        self._chaves = np.full(1024, -1, dtype=np.int64)
+        self._linha_por_chave: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        with self._exclusivo():
+            return len(self._linha_por_chave)
+
+    @contextmanager
+    def _exclusivo(self):
+        """Trava o índice para esta thread e este processo, com a memória em dia com os arquivos."""
+        with self._lock:
+            if self._profundidade == 0:
+                self._trava = open(self._arquivo_trava, 'a+b')
+                _travar(self._trava)
+            self._profundidade += 1
+            try:
+                if self._profundidade == 1:
+                    self._atualizar()
+                yield
+            finally:
+                self._profundidade -= 1
+                if self._profundidade == 0:
+                    _destravar(self._trava)
+                    self._trava.close()
+                    self._trava = None
+
+    def _linhas_em_disco(self) -> int:
+        # Um acréscimo interrompido pode deixar os arquivos desalinhados: vale o prefixo consistente
+        if not os.path.exists(self._arquivo_vetores) or not os.path.exists(self._arquivo_chaves):
+            return 0
+        return min(os.path.getsize(self._arquivo_chaves) // 8, os.path.getsize(self._arquivo_vetores) // (DIMENSAO * 4))
+
+    def _atualizar(self) -> None:
+        """Aplica à memória as linhas acrescentadas por outros processos (ou recarrega tudo após uma compactação)."""
+        geracao = _ler_inteiro(self._arquivo_geracao)
+        linhas = self._linhas_em_disco()
+        if geracao != self._geracao or linhas < self._n:
+            self._geracao = geracao
+            self._zerar_memoria()
+        if linhas > self._n:
+            vetores = np.fromfile(self._arquivo_vetores, dtype=np.float32, count=(linhas - self._n) * DIMENSAO,
+                                  offset=self._n * DIMENSAO * 4).reshape(-1, DIMENSAO)
+            chaves = np.fromfile(self._arquivo_chaves, dtype=np.int64, count=linhas - self._n, offset=self._n * 8)
+            self._aplicar(vetores, chaves)
+
+    def _aplicar(self, vetores: np.ndarray, chaves: np.ndarray) -> None:
+        """Acrescenta as linhas à memória; uma chave repetida invalida a linha anterior, uma remoção a apaga."""
+        self._garantir_capacidade(self._n + len(chaves))
+        self._vetores[self._n:self._n + len(chaves)] = vetores
+        for deslocamento, chave in enumerate(chaves.tolist()):
+            linha = self._n + deslocamento
+            anterior = self._linha_por_chave.pop(chave if chave >= 0 else -chave - 1, None)
+            if anterior is not None:
+                self._chaves[anterior] = -1
+            if chave >= 0:
+                self._linha_por_chave[chave] = linha
+                self._chaves[linha] = chave
+            else:
+                self._chaves[linha] = -1
+                self._vetores[linha] = 0
+        self._n += len(chaves)
+
+    def _acrescentar(self, vetores: np.ndarray, chaves: np.ndarray) -> None:
+        """Grava as linhas no fim dos arquivos e na memória; chamado com o índice travado."""
+        tamanhos = ((self._arquivo_vetores, DIMENSAO * 4, vetores), (self._arquivo_chaves, 8, chaves))
+        for arquivo, bytes_por_linha, dados in tamanhos:
+            with open(arquivo, 'ab') as f:
+                # Descarta o resto de um acréscimo interrompido, que desalinharia vetores e chaves
+                f.truncate(self._n * bytes_por_linha)
+                dados.tofile(f)
+        self._aplicar(vetores, chaves)
+
+    def adicionar(self, itens: List[Tuple[str, int, str]]) -> None:
+        """Indexa (tabela, id, texto); itens já indexados são substituídos."""
+        if not itens:
+            return
+        novos = vetorizar(texto for _, _, texto in itens)
+        chaves = np.array([_chave(tabela, item_id) for tabela, item_id, _ in itens], dtype=np.int64)
+        with self._exclusivo():
+            self._acrescentar(novos, chaves)
+
+    def remover(self, tabela: str, item_id: int) -> None:
+        """Remove o item do índice (uma linha de remoção é acrescentada aos arquivos)."""
+        self._remover_chaves([_chave(tabela, item_id)])
+
+    def _remover_chaves(self, chaves: List[int]) -> None:
+        with self._exclusivo():
+            chaves = [chave for chave in chaves if chave in self._linha_por_chave]
+            if chaves:
+                self._acrescentar(np.zeros((len(chaves), DIMENSAO), dtype=np.float32),
+                                  -np.array(chaves, dtype=np.int64) - 1)
+
+    def buscar_lote(self, textos: List[str], k: int = 5, tabelas: Optional[List[str]] = None,
+                    score_minimo: float = 0.2) -> List[List[Tuple[str, int, float]]]:
+        """Para cada texto, retorna até k itens (tabela, id, score) mais similares, do mais para o menos similar.
+
+        Busca exaustiva: cada consulta é comparada com todos os vetores num único produto de matrizes,
+        então o custo cresce linearmente com o tamanho do índice (~13 ms a cada 100 mil vetores por
+        consulta; ver o cenário buscar_vinculos do benchmark). O lote dilui o custo fixo entre as consultas.
+        """
+        if not textos:
+            return []
+        consultas = vetorizar(textos)
+        with self._exclusivo():
+            if self._n == 0:
+                return [[] for _ in textos]
+            scores = consultas @ self._vetores[:self._n].T
+            chaves = self._chaves[:self._n].copy()
+        validos = chaves >= 0
+        if tabelas:
+            validos &= np.isin(chaves % 4, [TABELAS_BUSCA[t][0] for t in tabelas])
+        scores[:, ~validos] = -1.0
+        k = min(k, len(chaves))
+        melhores = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        resultados = []
+        for linha, candidatos in enumerate(melhores):
+            candidatos = candidatos[np.argsort(-scores[linha, candidatos])]
+            resultados.append([
+                (_TABELA_POR_CODIGO[int(chaves[c] % 4)], int(chaves[c] // 4), float(scores[linha, c]))
+                for c in candidatos if scores[linha, c] >= score_minimo
+            ])
+        return resultados
+
+    def sincronizar(self) -> None:
+        """Acerta o índice com o banco: indexa itens ausentes e remove os que não existem mais."""
+        with self._exclusivo():
+            existentes = set()
+            with nova_sessao() as sessao:
+                for tabela, classe in CLASSES_INDEXADAS.items():
+                    faltantes = []
+                    for item_id, conteudo in sessao.query(classe.id, classe.conteudo).yield_per(1000):
+                        existentes.add(_chave(tabela, item_id))
+                        if _chave(tabela, item_id) not in self._linha_por_chave:
+                            faltantes.append((tabela, item_id, conteudo))
+                    self.adicionar(faltantes)
+            self._remover_chaves(sorted(set(self._linha_por_chave) - existentes))
+            # Compacta os arquivos quando as linhas vazias passam da metade
+            if self._n > 1024 and len(self._linha_por_chave) < self._n // 2:
+                self._compactar()
+
+    def _garantir_capacidade(self, necessaria: int) -> None:
+        if necessaria <= len(self._chaves):
+            return
+        capacidade = max(necessaria, 2 * len(self._chaves))
+        vetores = np.zeros((capacidade, DIMENSAO), dtype=np.float32)
+        vetores[:self._n] = self._vetores[:self._n]
+        chaves = np.full(capacidade, -1, dtype=np.int64)
+        chaves[:self._n] = self._chaves[:self._n]
+        self._vetores, self._chaves = vetores, chaves
+
+    def _compactar(self) -> None:
+        """Regrava os arquivos só com as linhas válidas; chamado com o índice travado."""
+        ocupadas = np.flatnonzero(self._chaves[:self._n] >= 0)
+        self._vetores[:len(ocupadas)] = self._vetores[ocupadas]
+        self._chaves[:len(ocupadas)] = self._chaves[ocupadas]
+        self._chaves[len(ocupadas):self._n] = -1
+        self._n = len(ocupadas)
+        self._linha_por_chave = {int(c): i for i, c in enumerate(self._chaves[:self._n])}
+        # Arquivos novos por substituição atômica; a geração nova avisa os outros processos
+        for arquivo, dados in ((self._arquivo_vetores, self._vetores[:self._n]), (self._arquivo_chaves, self._chaves[:self._n])):
+            dados.tofile(arquivo + '.tmp')
+            os.replace(arquivo + '.tmp', arquivo)
+        self._geracao = (self._geracao or 0) + 1
+        with open(self._arquivo_geracao + '.tmp', 'w') as f:
+            f.write(str(self._geracao))
+        os.replace(self._arquivo_geracao + '.tmp', self._arquivo_geracao)
+
+def _ler_inteiro(caminho: str) -> int:
+    try:
+        with open(caminho) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+def _travar(arquivo) -> None:
+    """Trava exclusiva do arquivo entre processos (espera até conseguir)."""
+    if fcntl is not None:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+        return
+    arquivo.seek(0)
+    while True:
+        try:
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK desiste depois de ~10 s de espera: tenta de novo
+            continue
+
+def _destravar(arquivo) -> None:
+    if fcntl is not None:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+        return
+    arquivo.seek(0)
+    msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+_indice: Optional[IndiceSemantico] = None
+_lock_indice = threading.Lock()
+
+def obter_indice() -> IndiceSemantico:
+    """Carrega o índice do disco e o sincroniza com o banco na primeira chamada do processo."""
+    global _indice
+    # As threads do banco (executar_no_banco) podem chegar aqui juntas: só uma carrega o índice
+    with _lock_indice:
+        if _indice is None:
+            indice = IndiceSemantico()
+            indice.sincronizar()
+            _indice = indice
+    return _indice
+
+def sugerir_vinculos(novos_itens: List[Tuple[str, int, str]], k: int = 3) -> List[Tuple[str, int, str, int, float]]:
+    """Indexa os itens novos e sugere, para cada um, os k vínculos mais similares.
+
+    Retorna (tabela_origem, id_origem, tabela_destino, id_destino, score), respeitando
+    os relacionamentos do modelo (Informacao <-> Ideia e Informacao <-> Tarefa).
+    """
+    indice = obter_indice()
+    indice.adicionar(novos_itens)
+    sugestoes = []
+    for tabela in VINCULOS_POSSIVEIS:
+        do_tipo = [item for item in novos_itens if item[0] == tabela]
+        resultados = indice.buscar_lote([texto for _, _, texto in do_tipo], k=k, tabelas=VINCULOS_POSSIVEIS[tabela])
+        for (_, item_id, _), similares in zip(do_tipo, resultados):
+            sugestoes.extend((tabela, item_id, destino, destino_id, score) for destino, destino_id, score in similares)
+    return sugestoes
+
+def vincular(sessao, tabela_origem: str, id_origem: int, tabela_destino: str, id_destino: int) -> None:
+    """Grava o vínculo na tabela de associação correspondente, dentro da sessão informada."""
+    if tabela_origem != 'informacoes':
+        tabela_origem, id_origem, tabela_destino, id_destino = tabela_destino, id_destino, tabela_origem, id_origem
+    informacao = sessao.get(Informacao, id_origem)
+    destino = sessao.get(CLASSES_INDEXADAS[tabela_destino], id_destino)
+    if informacao is None or destino is None:
+        return
+    if informacao not in destino.informacoes:
+        destino.informacoes.append(informacao)
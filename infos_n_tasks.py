@@ -16,28 +16,42 @@
 
 
 import os
+import asyncio
+import time
 from dotenv import load_dotenv
-from typing import Optional
-from modelo import session, CaixaEntrada
-from graph import processar_item_com_llm, salvar_proposta, remover_item_da_caixa_entrada
+from typing import Optional, Tuple
+from modelo import nova_sessao, CaixaEntrada, executar_no_banco
+from graph import (aprocessar_item_com_llm, incorporar_feedback, montar_mensagens_iniciais, aplicar_proposta,
+                   descartar_propostas_em_cache, formatar_vinculos_sugeridos)
+from fila_caixa_entrada import (DURACAO_LEASE_REVISAO, adiar, assumir_lease, contar_por_status, espiar_proximos,
+                                identificador_processo, liberar, reivindicar_proximo, renovar_lease)
+from estado_revisao import carregar_revisao, chats_com_revisao, remover_revisao, salvar_revisao
+from sessoes_chat import RegistroSessoes, SessaoChat
+from busca import buscar, formatar_resultados
+from metricas import callbacks_llm, handler_atual, metricas
+from gateway_llm import classificar_erro, gateway_llm
+import roteador_intencoes
+import resposta_progressiva
+from resposta_progressiva import RespostaProgressiva
 from pydantic import BaseModel, Field
 from functools import wraps
 
 # Telegram bot (python-telegram-bot v21+)
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
+from telegram.request import HTTPXRequest
 
 # LLM setup
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from langchain_core.tools import tool
 
 load_dotenv(override=True)
-allowed_user = int(os.getenv("TELEGRAM_ALLOWED_USER"))
+# IDs de usuário do Telegram autorizados, separados por vírgula (ex.: "123456,789012")
+allowed_users = {int(u) for u in os.getenv("TELEGRAM_ALLOWED_USER").split(",") if u.strip()}
 bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
 
-# Initialize LLM
-llm = init_chat_model("google_genai:gemini-2.0-flash-lite")
+# Dono dos leases da CaixaEntrada reivindicados por este bot
+DONO_FILA = identificador_processo("telegram")
 
 # System prompt for the Telegram bot
 SYSTEM_PROMPT = """Você é um assistente pessoal para gestão de informações, ideias e tarefas.
@@ -46,32 +60,31 @@ Você pode ajudar o usuário a:
 - Adicionar itens à Caixa de Entrada
 - Verificar o status da Caixa de Entrada
 - Processar itens da Caixa de Entrada
+- Buscar Informações, Ideias, Tarefas e itens da Caixa de Entrada já registrados
 
 Quando o usuário quiser adicionar algo à Caixa de Entrada, use a ferramenta disponível.
 Seja amigável e útil nas suas respostas."""
 
-class EstadoProcessamento:
-    def __init__(self):
-        self.processando = False
-        self.aguardando_revisao = False
-        self.proposta_atual = None
-        self.item_atual = None
-        self.messages_history = None
-
-# Instância global
-estado_processamento = EstadoProcessamento()
+# Histórico, estado de revisão e lock de cada chat (ver sessoes_chat.py)
+sessoes = RegistroSessoes(SYSTEM_PROMPT)
 
 def restricted(func):
     @wraps(func)
     async def wrapped(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
         user_id = update.effective_user.id
         
-        if user_id != allowed_user:
+        if user_id not in allowed_users:
             await update.message.reply_text(f"Desculpe, não tenho permissão para falar com você: {user_id}")
             print(f"Acesso negado para o User ID: {user_id}")
             return
         
-        return await func(update, context, *args, **kwargs)
+        # As consultas ao banco feitas durante o handler são atribuídas a ele nas métricas
+        token = handler_atual.set(func.__name__)
+        try:
+            with metricas.medir(f"telegram.handler[{func.__name__}]"):
+                return await func(update, context, *args, **kwargs)
+        finally:
+            handler_atual.reset(token)
     
     return wrapped
 
@@ -86,9 +99,10 @@ def adicionar_na_caixa_entrada(conteudo: str) -> str:
     Returns:
         Confirmação da adição com o ID do item
     """
-    item = CaixaEntrada(conteudo_bruto=conteudo.strip())
-    session.add(item)
-    session.commit()
+    with nova_sessao() as sessao:
+        item = CaixaEntrada(conteudo_bruto=conteudo.strip())
+        sessao.add(item)
+        sessao.flush()
     return f"Item adicionado à Caixa de Entrada com ID {item.id}"
 
 @tool
@@ -98,8 +112,13 @@ def verificar_status_caixa_entrada() -> str:
     Returns:
         Número de itens na Caixa de Entrada
     """
-    total = session.query(CaixaEntrada).count()
-    return f"Há {total} itens na Caixa de Entrada"
+    contagem = contar_por_status()
+    total = sum(contagem.values())
+    resposta = f"Há {total} itens na Caixa de Entrada"
+    if contagem["em_processamento"] or contagem["adiados"] or contagem["aguardando_revisao"]:
+        resposta += (f" ({contagem['disponiveis']} a processar, {contagem['em_processamento']} em processamento, "
+                     f"{contagem['adiados']} adiados, {contagem['aguardando_revisao']} com proposta aguardando revisão)")
+    return resposta
 
 @tool
 def processar_caixa_entrada() -> str:
@@ -110,18 +129,61 @@ def processar_caixa_entrada() -> str:
     """
     return "Iniciando processamento da Caixa de Entrada via Telegram..."
 
-# Bind tools to LLM
-llm_with_tools = llm.bind_tools([adicionar_na_caixa_entrada, verificar_status_caixa_entrada, processar_caixa_entrada])
-# Global conversation history (single user)
-conversation_history = [SystemMessage(content=SYSTEM_PROMPT)]
+@tool
+def buscar_itens(termo: str, pagina: int = 1) -> str:
+    """Busca Informações, Ideias, Tarefas e itens da Caixa de Entrada pelo texto.
+    
+    Args:
+        termo: Palavras a procurar
+        pagina: Página de resultados (10 por página), começando em 1
+        
+    Returns:
+        Resultados mais relevantes primeiro, com tabela, ID e trecho
+    """
+    resultados, ha_mais = buscar(termo, pagina=pagina)
+    if not resultados:
+        return f"Nenhum resultado para '{termo}'."
+    resposta = formatar_resultados(resultados)
+    if ha_mais:
+        resposta += f"\nHá mais resultados na página {pagina + 1}."
+    return resposta
+
+FERRAMENTAS = [adicionar_na_caixa_entrada, verificar_status_caixa_entrada, processar_caixa_entrada, buscar_itens]
+# Ferramentas cujo resultado já é uma resposta pronta para o usuário (sem segunda chamada ao LLM)
+FERRAMENTAS_RESPOSTA_DIRETA = {"adicionar_na_caixa_entrada", "verificar_status_caixa_entrada", "processar_caixa_entrada",
+                               "buscar_itens"}
+# Ferramentas que alteram a Caixa de Entrada: executadas antes das outras chamadas da mesma resposta
+FERRAMENTAS_DE_ESCRITA = {"adicionar_na_caixa_entrada"}
+# LLM com as ferramentas, criado sob demanda (ver obter_llm_com_ferramentas)
+llm_with_tools = None
+
+def obter_llm_com_ferramentas():
+    """Inicializa o LLM do chat na primeira chamada; importar o cliente do Gemini leva mais de um segundo."""
+    global llm_with_tools
+    if llm_with_tools is None:
+        from langchain.chat_models import init_chat_model
+        # Retentativas ficam com o gateway_llm (ver graph.obter_llm)
+        llm_with_tools = init_chat_model("google_genai:gemini-2.0-flash-lite", max_retries=1).bind_tools(FERRAMENTAS)
+    return llm_with_tools
 
 @restricted
 async def process_message_with_llm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Process user message with LLM and handle tool calls."""
-    
+    sessao_chat, nova = sessoes.obter(update.effective_chat.id)
+    # O lock do chat mantém as mensagens de cada usuário em ordem (e o histórico consistente:
+    # tool calls seguidas de seus ToolMessages); chats diferentes seguem em paralelo
+    async with sessao_chat.lock:
+        if nova:
+            await restaurar_revisao(sessao_chat)
+        await atender_mensagem(update, context, sessao_chat)
+
+async def atender_mensagem(update: Update, context: ContextTypes.DEFAULT_TYPE, sessao_chat: SessaoChat) -> None:
+    """Atende uma mensagem do chat, já sob o lock da sessão."""
+    conversation_history = sessao_chat.historico
+
     # Se está aguardando revisão, processar resposta
-    if estado_processamento.aguardando_revisao:
-        await processar_resposta_revisao(update, context)
+    if sessao_chat.estado.aguardando_revisao:
+        await processar_resposta_revisao(update, context, sessao_chat)
         return
     
     if update.message is None or update.message.text is None:
@@ -133,156 +195,360 @@ async def process_message_with_llm(update: Update, context: ContextTypes.DEFAULT
         return
     
     # Add user message to conversation
-    conversation_history.append(HumanMessage(content=user_message))
+    conversation_history.iniciar_turno(HumanMessage(content=user_message))
     
+    progressiva = None
     try:
+        # Comandos comuns são atendidos localmente, sem chamar o LLM (ver roteador_intencoes.py)
+        intencao = roteador_intencoes.rotear(user_message) if roteador_intencoes.ATIVADO else None
+        if intencao is not None:
+            metricas.incrementar("roteador.local")
+            metricas.incrementar(f"roteador.local[{intencao.ferramenta}]")
+            result = await executar_ferramenta(intencao.ferramenta, intencao.argumentos, update, context, sessao_chat)
+            conversation_history.adicionar(AIMessage(content=result))
+            await update.message.reply_text(result)
+            return
+        metricas.incrementar("roteador.llm")
+        
+        # "digitando..." e mensagem provisória enquanto o LLM responde (ver resposta_progressiva.py)
+        if resposta_progressiva.ATIVADA:
+            progressiva = RespostaProgressiva(update, context)
+            progressiva.iniciar()
+        
         # Get LLM response
-        response = llm_with_tools.invoke(conversation_history)
+        response = await gateway_llm.achamar("llm.chat", lambda: chamar_llm_chat(
+            conversation_history.mensagens(), progressiva))
         
         # Add AI response to conversation
-        conversation_history.append(response)
+        conversation_history.adicionar(response)
         
         # Check if LLM wants to call tools
         if response.tool_calls:
             # Execute tool calls
-            for tool_call in response.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-                
-                if tool_name == "adicionar_na_caixa_entrada":
-                    result = adicionar_na_caixa_entrada.invoke(tool_args)
-                elif tool_name == "verificar_status_caixa_entrada":
-                    result = verificar_status_caixa_entrada.invoke(tool_args)
-                elif tool_name == "processar_caixa_entrada":
-                    result = await processar_caixa_entrada_telegram(update, context)
-                else:
-                    result = f"Ferramenta {tool_name} não reconhecida"
-                
+            results = await executar_chamadas(response.tool_calls, update, context, sessao_chat)
+            for tool_call, result in zip(response.tool_calls, results):
                 # Add tool result to conversation
-                conversation_history.append(ToolMessage(content=result, tool_call_id=tool_call["id"]))
+                conversation_history.adicionar(ToolMessage(content=result, tool_call_id=tool_call["id"]))
             
-            # Get final response after tool execution
-            final_response = llm_with_tools.invoke(conversation_history)
-            conversation_history.append(final_response)
+            if all(tool_call["name"] in FERRAMENTAS_RESPOSTA_DIRETA for tool_call in response.tool_calls):
+                # O resultado já é a resposta: dispensa a segunda chamada ao LLM só para redigi-lo
+                metricas.incrementar("llm.chat.respostas_diretas")
+                final_response = AIMessage(content="\n\n".join(
+                    parte for parte in [str(response.content).strip(), *results] if parte))
+            else:
+                # Get final response after tool execution
+                final_response = await gateway_llm.achamar("llm.chat", lambda: chamar_llm_chat(
+                    conversation_history.mensagens(), progressiva))
+            conversation_history.adicionar(final_response)
             
-            await update.message.reply_text(final_response.content)
+            await enviar_resposta(update, progressiva, final_response.content)
         else:
             # No tool calls, just respond
-            await update.message.reply_text(response.content)
+            await enviar_resposta(update, progressiva, response.content)
             
     except Exception as e:
-        await update.message.reply_text(f"Erro ao processar mensagem: {str(e)}")
+        if classificar_erro(e) == "limite":
+            await enviar_resposta(update, progressiva, "⏳ Cota do LLM esgotada no momento. Tente de novo em alguns instantes.")
+        else:
+            await enviar_resposta(update, progressiva, f"Erro ao processar mensagem: {str(e)}")
 
-@restricted
-async def processar_resposta_revisao(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def chamar_llm_chat(mensagens: list, progressiva: Optional[RespostaProgressiva] = None):
+    """Uma chamada ao LLM do chat; com `progressiva`, em streaming, mostrando o texto parcial à medida que chega."""
+    config = {"callbacks": callbacks_llm("llm.chat")}
+    if progressiva is None:
+        return await obter_llm_com_ferramentas().ainvoke(mensagens, config=config)
+    from langchain_core.messages import message_chunk_to_message
+    inicio = time.perf_counter()
+    acumulado = None
+    async for pedaco in obter_llm_com_ferramentas().astream(mensagens, config=config):
+        if acumulado is None:
+            metricas.observar("llm.chat.primeiro_pedaco", time.perf_counter() - inicio)
+            acumulado = pedaco
+        else:
+            acumulado = acumulado + pedaco
+        # Chamadas de ferramenta não são texto para o usuário: a mensagem provisória segue até o resultado
+        if isinstance(acumulado.content, str) and not acumulado.tool_call_chunks:
+            await progressiva.atualizar(acumulado.content)
+    return message_chunk_to_message(acumulado) if acumulado is not None else AIMessage(content="")
+
+async def enviar_resposta(update: Update, progressiva: Optional[RespostaProgressiva], texto: str) -> None:
+    """Entrega a resposta final: na mensagem progressiva, se houver uma, ou como resposta comum."""
+    if progressiva is not None:
+        await progressiva.concluir(texto)
+    else:
+        await update.message.reply_text(texto)
+
+async def executar_chamadas(tool_calls: list, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                            sessao_chat: SessaoChat) -> list:
+    """Executa as chamadas de ferramenta de uma resposta do LLM e retorna os resultados na mesma ordem.
+
+    As leituras rodam em paralelo. As que alteram a Caixa de Entrada vêm antes, uma a uma e na ordem pedida
+    (o SQLite serializa as escritas de qualquer forma, e os IDs seguem a ordem das capturas),
+    para que um status ou processamento pedido na mesma resposta já as enxergue.
+    """
+    resultados = [None] * len(tool_calls)
+    for i, tool_call in enumerate(tool_calls):
+        if tool_call["name"] in FERRAMENTAS_DE_ESCRITA:
+            resultados[i] = await executar_ferramenta(tool_call["name"], tool_call["args"], update, context, sessao_chat)
+    demais = [i for i, tool_call in enumerate(tool_calls) if tool_call["name"] not in FERRAMENTAS_DE_ESCRITA]
+    respostas = await asyncio.gather(*(
+        executar_ferramenta(tool_calls[i]["name"], tool_calls[i]["args"], update, context, sessao_chat)
+        for i in demais
+    ))
+    for i, resposta in zip(demais, respostas):
+        resultados[i] = resposta
+    return resultados
+
+async def executar_ferramenta(tool_name: str, tool_args: dict, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                              sessao_chat: SessaoChat) -> str:
+    """Executa uma ferramenta pedida pelo LLM (ou pelo roteador local) e retorna o resultado em texto."""
+    if tool_name == "adicionar_na_caixa_entrada":
+        return await executar_no_banco(adicionar_na_caixa_entrada.invoke, tool_args)
+    elif tool_name == "verificar_status_caixa_entrada":
+        return await executar_no_banco(verificar_status_caixa_entrada.invoke, tool_args)
+    elif tool_name == "buscar_itens":
+        return await executar_no_banco(buscar_itens.invoke, tool_args)
+    elif tool_name == "processar_caixa_entrada":
+        return iniciar_processamento_em_segundo_plano(update, context, sessao_chat)
+    return f"Ferramenta {tool_name} não reconhecida"
+
+def iniciar_processamento_em_segundo_plano(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                           sessao_chat: SessaoChat) -> str:
+    """Dispara o processamento da Caixa de Entrada como tarefa de fundo, sem prender o turno de conversa."""
+    if sessao_chat.estado.processando:
+        return "O processamento da Caixa de Entrada já está em andamento."
+    sessao_chat.estado.processando = True
+    context.application.create_task(processar_caixa_entrada_telegram(update, context, sessao_chat))
+    return "Iniciando processamento da Caixa de Entrada via Telegram..."
+
+async def processar_resposta_revisao(update: Update, context: ContextTypes.DEFAULT_TYPE, sessao_chat: SessaoChat):
     """Processa resposta do usuário à revisão."""
+    estado = sessao_chat.estado
     resposta = update.message.text.strip().lower()
     
     if resposta in ['s', 'sim', 'y', 'yes', 'ok']:
         # Aprovado - salvar e continuar
-        from graph import salvar_proposta, remover_item_da_caixa_entrada
-        if salvar_proposta(estado_processamento.proposta_atual):
-            if remover_item_da_caixa_entrada(estado_processamento.item_atual.id):
-                await update.message.reply_text("✅ Item aprovado e salvo! Continuando processamento...")
-                # Continuar processamento
-                await processar_caixa_entrada_telegram(update, context)
+        estado.aguardando_revisao = False
+        resultado = await executar_no_banco(aplicar_proposta, estado.proposta_atual, estado.item_atual_id, DONO_FILA)
+        if resultado.situacao == "aplicada":
+            await executar_no_banco(remover_revisao, sessao_chat.chat_id)
+            await update.message.reply_text("✅ Item aprovado e salvo!" + formatar_vinculos_sugeridos(resultado.vinculos)
+                                            + "\n\nContinuando processamento...")
+            # Continuar processamento
+            iniciar_processamento_em_segundo_plano(update, context, sessao_chat)
+        elif resultado.situacao == "indisponivel":
+            # Outro processador reivindicou o item (ou já o aplicou): tentar de novo não adianta
+            await executar_no_banco(remover_revisao, sessao_chat.chat_id)
+            await update.message.reply_text("⚠️ O item não está mais reservado para esta revisão (outro processo o "
+                                            "assumiu); nada foi salvo.\n\nContinuando processamento...")
+            iniciar_processamento_em_segundo_plano(update, context, sessao_chat)
+        else:
+            await update.message.reply_text("❌ Falha ao salvar o item, mantido na Caixa de Entrada. Responda 's' para tentar de novo.")
+            estado.aguardando_revisao = True
     elif resposta in ['n', 'não', 'nao', 'no']:
-        # Rejeitado
-        await update.message.reply_text("❌ Item rejeitado, mantido na Caixa de Entrada.")
-        estado_processamento.aguardando_revisao = False
+        # Rejeitado: adiado na fila, para não ser oferecido de novo no próximo processamento
+        estado.aguardando_revisao = False
+        await executar_no_banco(adiar, estado.item_atual_id, DONO_FILA)
+        await executar_no_banco(remover_revisao, sessao_chat.chat_id)
+        # A proposta rejeitada não pode voltar do cache quando o item sair da fila de novo
+        await asyncio.to_thread(descartar_propostas_em_cache, estado.item_atual_conteudo)
+        await update.message.reply_text("❌ Item rejeitado, mantido na Caixa de Entrada (adiado).")
     else:
         # Feedback - reprocessar
         await update.message.reply_text("📝 Feedback recebido, reprocessando...")
-        # Adicionar feedback ao histórico e reprocessar
-        estado_processamento.messages_history.append(AIMessage(content=f"Sugestão anterior: {estado_processamento.proposta_atual.model_dump_json()}"))
-        estado_processamento.messages_history.append(HumanMessage(content=f"Feedback do usuário: {resposta}"))
-        await processar_caixa_entrada_telegram(update, context)
+        # Reprocessar o mesmo item só com a proposta atual e as correções acumuladas (histórico compacto)
+        estado.messages_history = incorporar_feedback(estado.item_atual_conteudo, estado.proposta_atual,
+                                                      estado.messages_history, update.message.text)
+        estado.aguardando_revisao = False
+        estado.processando = True
+        await executar_no_banco(renovar_lease, estado.item_atual_id, DONO_FILA)
+        context.application.create_task(processar_caixa_entrada_telegram(
+            update, context, sessao_chat,
+            item_atual=(estado.item_atual_id, estado.item_atual_conteudo),
+            messages_history=estado.messages_history,
+        ))
 
-@restricted
-async def processar_caixa_entrada_telegram(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Processa Caixa de Entrada via Telegram."""
-    from graph import processar_item_com_llm, salvar_proposta, remover_item_da_caixa_entrada
-    from modelo import session, CaixaEntrada
-    from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-    from prompts import PROMPT_ORGANIZADOR
-    
-    print("=== Iniciando processamento da Caixa de Entrada ===")
+async def processar_caixa_entrada_telegram(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                           sessao_chat: SessaoChat,
+                                           item_atual: Optional[Tuple[int, str]] = None,
+                                           messages_history: Optional[list] = None):
+    """Processa Caixa de Entrada via Telegram.
+
+    Todas as chamadas ao LLM e ao banco são aguardadas fora do event loop, de modo que
+    outros comandos e capturas continuam sendo atendidos durante uma extração longa.
+    Quando `item_atual` é informado, retoma esse item com o `messages_history` existente (feedback).
+    As propostas dos próximos itens são antecipadas em segundo plano (ver PrefetchPropostas).
+    """
+    print(f"=== Iniciando processamento da Caixa de Entrada (chat {sessao_chat.chat_id}) ===")
+    estado = sessao_chat.estado
+    # Tarefa de fundo: suas consultas ao banco contam como processamento, não como o handler que a criou
+    handler_atual.set("processamento")
     
-    while True:
-        # 1. Buscar próximo item
-        item = session.query(CaixaEntrada).order_by(CaixaEntrada.id.asc()).first()
-        if not item:
-            print("✅ Nenhum item na Caixa de Entrada. Processamento encerrado.")
-            await update.message.reply_text("✅ Processamento concluído! Nenhum item restante na Caixa de Entrada.")
-            return "Processamento concluído!"
-            
-        print(f"\n�� Processando Item {item.id}")
-        print(f"Conteúdo: {item.conteudo_bruto[:100]}...")
-        
-        # 2. Processar com LLM
-        messages_history = [
-            SystemMessage(content=PROMPT_ORGANIZADOR),
-            HumanMessage(content=f"\nTexto para análise:\n{item.conteudo_bruto}")
-        ]
-        
-        # 3. Loop de processamento com feedback
+    try:
         while True:
+            # 1. Reivindicar próximo item da fila (ou retomar o item em revisão)
+            if item_atual is None:
+                item_atual = await executar_no_banco(reivindicar_proximo, DONO_FILA)
+                messages_history = None
+                # Antecipar as propostas dos itens seguintes enquanto o atual é revisado; a proposta
+                # já antecipada do item reivindicado fica guardada para o obter() logo abaixo
+                proximos = await executar_no_banco(espiar_proximos, estado.prefetch.profundidade)
+                estado.prefetch.agendar(proximos, atual=item_atual[0] if item_atual else None)
+            if item_atual is None:
+                estado.prefetch.cancelar()
+                print("✅ Nenhum item disponível na Caixa de Entrada. Processamento encerrado.")
+                await update.message.reply_text("✅ Processamento concluído! Nenhum item disponível na Caixa de Entrada.")
+                return "Processamento concluído!"
+
+            item_id, conteudo_bruto = item_atual
+            print(f"\n🔄 Processando Item {item_id}")
+            print(f"Conteúdo: {conteudo_bruto[:100]}...")
+            
+            # 2. Processar com LLM (proposta antecipada na primeira rodada, histórico com feedback nas demais)
+            progressiva = None
+            if resposta_progressiva.ATIVADA:
+                progressiva = RespostaProgressiva(update, context, texto_espera=f"🔄 Analisando o item {item_id}...")
+                progressiva.iniciar()
             try:
-                proposal = processar_item_com_llm(item.conteudo_bruto, messages_history)
+                if messages_history is None:
+                    messages_history = montar_mensagens_iniciais(conteudo_bruto)
+                    proposal = await estado.prefetch.obter(item_id, conteudo_bruto)
+                else:
+                    proposal = await aprocessar_item_com_llm(conteudo_bruto, messages_history)
             except Exception as e:
                 print(f"❌ Erro ao processar item com LLM: {e}")
-                break
+                await executar_no_banco(liberar, item_id, DONO_FILA)
+                await enviar_resposta(update, progressiva, f"❌ Erro ao processar item {item_id} com LLM: {e}")
+                return "Processamento interrompido."
             
-            # 4. Review gate - AGORA VIA TELEGRAM
+            # 3. Review gate - AGORA VIA TELEGRAM
             if not proposal.aprovado:
                 # Configurar estado para aguardar revisão
-                estado_processamento.aguardando_revisao = True
-                estado_processamento.proposta_atual = proposal
-                estado_processamento.item_atual = item
-                estado_processamento.messages_history = messages_history
+                estado.aguardando_revisao = True
+                estado.proposta_atual = proposal
+                estado.item_atual_id = item_id
+                estado.item_atual_conteudo = conteudo_bruto
+                estado.messages_history = messages_history
+                # A revisão humana pode demorar mais que o lease de processamento
+                await executar_no_banco(renovar_lease, item_id, DONO_FILA, DURACAO_LEASE_REVISAO)
+                # Gravar a revisão: um reinício do bot a retoma sem chamar o LLM de novo
+                await executar_no_banco(salvar_revisao, sessao_chat.chat_id, item_id, conteudo_bruto,
+                                        DONO_FILA, proposal, messages_history)
                 
                 # Enviar proposta via Telegram
-                await update.message.reply_text(
-                    f"📋 **PROPOSTA PARA REVISÃO**\n\n"
-                    f"**Informações:** {proposal.informacoes}\n"
-                    f"**Ideias:** {proposal.ideias}\n"
-                    f"**Tarefas:** {proposal.tarefas}\n\n"
-                    f"Sua aprovação: ('s', 'n' ou feedback)"
-                )
+                await enviar_resposta(update, progressiva, formatar_proposta(proposal))
                 
                 # SAIR do loop e aguardar resposta do usuário
                 return "Aguardando revisão e resposta do usuário."
             
+            # 4. Já aprovado pelo LLM - salvar e remover item
+            vinculos = await executar_no_banco(aplicar_proposta, proposal, item_id)
+            if vinculos is not None:
+                print(f"✅ Item {item_id} processado com sucesso!")
+                await enviar_resposta(update, progressiva,
+                                      f"✅ Item {item_id} processado e salvo!" + formatar_vinculos_sugeridos(vinculos))
             else:
-                # Já aprovado pelo LLM
-                break
-        
-        # 5. Salvar e remover item
-        if salvar_proposta(proposal):
-            if remover_item_da_caixa_entrada(item.id):
-                print(f"✅ Item {item.id} processado com sucesso!")
-                await update.message.reply_text(f"✅ Item {item.id} processado e salvo!")
-    
-    return "Processamento concluído!"
+                await executar_no_banco(liberar, item_id, DONO_FILA)
+                await enviar_resposta(update, progressiva,
+                                      f"❌ Falha ao salvar o item {item_id}, mantido na Caixa de Entrada.")
+                return "Processamento interrompido."
+            item_atual = None
+    finally:
+        estado.processando = False
+
+def formatar_proposta(proposal) -> str:
+    """Mensagem de revisão de uma proposta."""
+    return (
+        f"📋 **PROPOSTA PARA REVISÃO**\n\n"
+        f"**Informações:** {proposal.informacoes}\n"
+        f"**Ideias:** {proposal.ideias}\n"
+        f"**Tarefas:** {proposal.tarefas}\n\n"
+        f"Sua aprovação: ('s', 'n' ou feedback)"
+    )
+
+async def restaurar_revisao(sessao_chat: SessaoChat) -> bool:
+    """Carrega no chat a revisão gravada no banco (após reinício do bot ou descarte da sessão ociosa)."""
+    revisao = await executar_no_banco(carregar_revisao, sessao_chat.chat_id)
+    if revisao is None:
+        return False
+    # O lease pode ser de um processo anterior: assumi-lo, a menos que o item já tenha outro destino
+    assumido = await executar_no_banco(assumir_lease, revisao.item_id, revisao.lease_dono, DONO_FILA,
+                                       DURACAO_LEASE_REVISAO)
+    if not assumido:
+        print(f"⚠️ Revisão do item {revisao.item_id} descartada: o item não está mais reservado para este bot.")
+        await executar_no_banco(remover_revisao, sessao_chat.chat_id)
+        return False
+    estado = sessao_chat.estado
+    estado.aguardando_revisao = True
+    estado.proposta_atual = revisao.proposta
+    estado.item_atual_id = revisao.item_id
+    estado.item_atual_conteudo = revisao.conteudo_bruto
+    estado.messages_history = revisao.historico
+    if revisao.lease_dono != DONO_FILA:
+        await executar_no_banco(salvar_revisao, sessao_chat.chat_id, revisao.item_id, revisao.conteudo_bruto,
+                                DONO_FILA, revisao.proposta, revisao.historico)
+    print(f"🔄 Revisão do item {revisao.item_id} retomada (chat {sessao_chat.chat_id}).")
+    return True
+
+async def inicializar(app: Application) -> None:
+    """Após a conexão com o Telegram: aquece o LLM em segundo plano e retoma revisões pendentes."""
+    app.create_task(asyncio.to_thread(obter_llm_com_ferramentas))
+    await retomar_revisoes(app)
+
+async def retomar_revisoes(app: Application) -> None:
+    """Na inicialização, retoma as revisões gravadas antes de um reinício, sem nova chamada ao LLM."""
+    for chat_id in await executar_no_banco(chats_com_revisao):
+        sessao_chat, _ = sessoes.obter(chat_id)
+        async with sessao_chat.lock:
+            if await restaurar_revisao(sessao_chat):
+                await app.bot.send_message(
+                    chat_id, "🔄 Retomando a revisão pendente.\n\n" + formatar_proposta(sessao_chat.estado.proposta_atual)
+                )
 
 @restricted
 async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(
         "Comandos disponíveis:\n"
-        "/help - Ver esta ajuda\n\n"
+        "/help - Ver esta ajuda\n"
+        "/stats - Tempos de LLM, banco e Telegram desde o início do bot\n\n"
         "Ou simplesmente converse comigo em linguagem natural!\n"
         "Exemplos:\n"
         "• 'Adicione à caixa de entrada: preciso comprar leite'\n"
         "• 'Quantos itens tenho pendentes?'\n"
         "• 'Processe minha caixa de entrada'\n"
-        "• 'Coloque na minha lista que vou viajar em dezembro'"
+        "• 'O que eu anotei sobre passaporte?'\n"
+        "• 'Coloque na minha lista que vou viajar em dezembro'\n\n"
+        "Respostas imediatas (sem passar pelo LLM): 'anota: ...', 'busca ...', 'quantos itens?', 'processa'"
     )
 
+@restricted
+async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    texto = metricas.formatar()
+    contadores = metricas.resumo()["contadores"]
+    roteadas = contadores.get("roteador.local", 0) + contadores.get("roteador.llm", 0)
+    if roteadas:
+        texto += f"\nMensagens atendidas sem o LLM: {contadores.get('roteador.local', 0) / roteadas:.0%} de {roteadas:g}"
+    # Limite de tamanho de mensagem do Telegram
+    await update.message.reply_text(texto[:4000])
+
+class RequisicaoMedida(HTTPXRequest):
+    """Requisições à API do Telegram (sendMessage etc.) com a duração registrada nas métricas."""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        with metricas.medir(f"telegram.{url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, *args, **kwargs)
+
 def main(token: Optional[str] = None) -> None:
     
-    app = Application.builder().token(bot_token).build()
+    # concurrent_updates: /help, status e capturas não esperam uma extração longa terminar
+    builder = Application.builder().token(bot_token).concurrent_updates(True).post_init(inicializar)
+    if metricas.ativado:
+        # Só as chamadas de envio; o long polling (getUpdates) usa a requisição padrão
+        builder = builder.request(RequisicaoMedida())
+    app = builder.build()
 
     app.add_handler(CommandHandler("help", cmd_help))
+    app.add_handler(CommandHandler("stats", cmd_stats))
     
     # Process all text messages with LLM
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, process_message_with_llm))
@@ -0,0 +1,89 @@
+import os
+from typing import List
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Orçamento de tokens da janela enviada ao LLM (prompt de sistema + resumo + turnos recentes)
+MAX_TOKENS_PADRAO = int(os.getenv("MEMORIA_MAX_TOKENS", "3000"))
+# Parte do orçamento reservada ao resumo acumulado dos turnos antigos
+MAX_TOKENS_RESUMO_PADRAO = int(os.getenv("MEMORIA_MAX_TOKENS_RESUMO", "600"))
+# Tamanho máximo de cada fala ao ser dobrada no resumo
+MAX_CARACTERES_POR_FALA = 160
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token), sem depender do tokenizador do modelo."""
+    return len(texto) // 4 + 1
+
+def _texto(mensagem: BaseMessage) -> str:
+    return mensagem.content if isinstance(mensagem.content, str) else str(mensagem.content)
+
+def _resumir_fala(texto: str) -> str:
+    texto = " ".join(texto.split())
+    if len(texto) > MAX_CARACTERES_POR_FALA:
+        texto = texto[:MAX_CARACTERES_POR_FALA - 1] + "…"
+    return texto
+
+class MemoriaConversa:
+    """Histórico da conversa do bot: prompt de sistema + resumo acumulado + janela de turnos recentes.
+
+    Um turno começa numa HumanMessage e inclui as respostas e ToolMessages geradas por ela.
+    Ao iniciar um turno novo, os anteriores perdem as chamadas de ferramenta e seus resultados
+    (só ficam a pergunta e a resposta final) e, enquanto o orçamento de tokens for excedido,
+    os turnos mais antigos são dobrados no resumo.
+    """
+
+    def __init__(self, system_prompt: str, max_tokens: int = MAX_TOKENS_PADRAO,
+                 max_tokens_resumo: int = MAX_TOKENS_RESUMO_PADRAO):
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.max_tokens_resumo = max_tokens_resumo
+        self.resumo: List[str] = []
+        self.turnos: List[List[BaseMessage]] = []
+
+    def iniciar_turno(self, mensagem: HumanMessage) -> None:
+        """Compacta os turnos anteriores e abre um turno novo com a mensagem do usuário."""
+        self.turnos = [self._compactar_turno(turno) for turno in self.turnos]
+        self.turnos = [turno for turno in self.turnos if turno]
+        self.turnos.append([mensagem])
+        self._respeitar_orcamento()
+
+    def adicionar(self, mensagem: BaseMessage) -> None:
+        """Adiciona uma mensagem (resposta do LLM ou ToolMessage) ao turno atual."""
+        if not self.turnos:
+            self.turnos.append([])
+        self.turnos[-1].append(mensagem)
+
+    def mensagens(self) -> List[BaseMessage]:
+        """Retorna a lista de mensagens a enviar ao LLM."""
+        sistema = self.system_prompt
+        if self.resumo:
+            sistema += "\n\nResumo da conversa anterior:\n" + "\n".join(self.resumo)
+        return [SystemMessage(content=sistema)] + [m for turno in self.turnos for m in turno]
+
+    def total_tokens(self) -> int:
+        """Estimativa de tokens da janela atual."""
+        return sum(estimar_tokens(_texto(m)) for m in self.mensagens())
+
+    @staticmethod
+    def _compactar_turno(turno: List[BaseMessage]) -> List[BaseMessage]:
+        # Chamadas de ferramenta e seus resultados só interessam ao turno em que foram feitas
+        return [m for m in turno
+                if not isinstance(m, ToolMessage) and not (isinstance(m, AIMessage) and m.tool_calls)]
+
+    def _respeitar_orcamento(self) -> None:
+        # O turno atual nunca é dobrado, mesmo que sozinho ultrapasse o orçamento
+        while len(self.turnos) > 1 and self.total_tokens() > self.max_tokens:
+            self._dobrar_no_resumo(self.turnos.pop(0))
+        # O resumo também cabe no orçamento da janela: perde as linhas mais antigas primeiro
+        while self.resumo and (sum(estimar_tokens(linha) for linha in self.resumo) > self.max_tokens_resumo
+                               or self.total_tokens() > self.max_tokens):
+            self.resumo.pop(0)
+
+    def _dobrar_no_resumo(self, turno: List[BaseMessage]) -> None:
+        falas = []
+        for mensagem in turno:
+            if isinstance(mensagem, HumanMessage):
+                falas.append(f"Usuário: {_resumir_fala(_texto(mensagem))}")
+            elif isinstance(mensagem, AIMessage) and _texto(mensagem):
+                falas.append(f"Assistente: {_resumir_fala(_texto(mensagem))}")
+        if falas:
+            self.resumo.append("- " + " | ".join(falas))
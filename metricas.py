@@ -0,0 +1,200 @@
+import atexit
+import contextvars
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+# Métricas em processo dos caminhos quentes: chamadas ao LLM, consultas ao banco e envios ao Telegram.
+# Cada série guarda contagem, soma, máximo e as últimas amostras (para p50/p95); contadores somam
+# tokens, erros e retentativas. Com METRICAS=0 nada é registrado: as funções retornam de imediato,
+# e os eventos do SQLAlchemy e os callbacks do LangChain nem são instalados.
+
+ATIVADAS = os.getenv("METRICAS", "1") != "0"
+# Se definido, cada observação também é acrescentada a este arquivo como uma linha JSON
+ARQUIVO_JSONL = os.getenv("METRICAS_ARQUIVO")
+# Amostras recentes mantidas por série para os percentis
+AMOSTRAS_POR_SERIE = 512
+
+# Handler do bot em atendimento, para atribuir a ele as consultas ao banco feitas no caminho
+handler_atual = contextvars.ContextVar("handler_atual", default="-")
+
+class Serie:
+    __slots__ = ("contagem", "soma", "maximo", "amostras")
+
+    def __init__(self):
+        self.contagem = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+        self.amostras = deque(maxlen=AMOSTRAS_POR_SERIE)
+
+    def registrar(self, valor: float) -> None:
+        self.contagem += 1
+        self.soma += valor
+        if valor > self.maximo:
+            self.maximo = valor
+        self.amostras.append(valor)
+
+class _Medicao:
+    __slots__ = ("registro", "nome", "inicio")
+
+    def __init__(self, registro, nome):
+        self.registro = registro
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, *_):
+        self.registro.observar(self.nome, time.perf_counter() - self.inicio)
+        if tipo is not None:
+            self.registro.incrementar(f"{self.nome}.erros")
+        return False
+
+class _MedicaoDesativada:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+_MEDICAO_DESATIVADA = _MedicaoDesativada()
+
+class RegistroMetricas:
+    """Séries de durações (segundos) e contadores, seguros para uso a partir de várias threads."""
+
+    def __init__(self, ativado: bool = ATIVADAS, arquivo: str = ARQUIVO_JSONL):
+        self.ativado = ativado
+        self.inicio = time.time()
+        self._series: Dict[str, Serie] = {}
+        self._contadores: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._arquivo = None
+        if ativado and arquivo:
+            self._arquivo = open(arquivo, "a", encoding="utf-8")
+            atexit.register(self._arquivo.close)
+
+    def observar(self, nome: str, segundos: float) -> None:
+        """Registra uma duração na série `nome`."""
+        if not self.ativado:
+            return
+        with self._lock:
+            serie = self._series.get(nome)
+            if serie is None:
+                serie = self._series[nome] = Serie()
+            serie.registrar(segundos)
+            if self._arquivo is not None:
+                self._arquivo.write(json.dumps({"t": time.time(), "serie": nome, "segundos": segundos}) + "\n")
+
+    def incrementar(self, nome: str, quantidade: float = 1) -> None:
+        """Soma `quantidade` ao contador `nome`."""
+        if not self.ativado:
+            return
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + quantidade
+            if self._arquivo is not None:
+                self._arquivo.write(json.dumps({"t": time.time(), "contador": nome, "quantidade": quantidade}) + "\n")
+
+    def medir(self, nome: str):
+        """Context manager que registra a duração do bloco (e conta erros em `nome.erros`)."""
+        if not self.ativado:
+            return _MEDICAO_DESATIVADA
+        return _Medicao(self, nome)
+
+    def resumo(self) -> dict:
+        """Fotografia das séries (em ms) e dos contadores."""
+        with self._lock:
+            series = {nome: (s.contagem, s.soma, s.maximo, sorted(s.amostras)) for nome, s in self._series.items()}
+            contadores = dict(self._contadores)
+        resultado = {"desde": self.inicio, "series": {}, "contadores": contadores}
+        for nome, (contagem, soma, maximo, amostras) in sorted(series.items()):
+            resultado["series"][nome] = {
+                "contagem": contagem,
+                "media_ms": soma / contagem * 1000,
+                "p50_ms": statistics.median(amostras) * 1000,
+                "p95_ms": amostras[min(len(amostras) - 1, int(len(amostras) * 0.95))] * 1000,
+                "max_ms": maximo * 1000,
+            }
+        return resultado
+
+    def formatar(self) -> str:
+        """Resumo em texto, para o comando /stats."""
+        if not self.ativado:
+            return "Métricas desativadas (METRICAS=0)."
+        resumo = self.resumo()
+        minutos = (time.time() - resumo["desde"]) / 60
+        linhas = [f"📊 Métricas dos últimos {minutos:.0f} min"]
+        for nome, s in resumo["series"].items():
+            linhas.append(f"{nome}: {s['contagem']}x, média {s['media_ms']:.1f} ms, "
+                          f"p50 {s['p50_ms']:.1f} ms, p95 {s['p95_ms']:.1f} ms, máx {s['max_ms']:.1f} ms")
+        for nome, total in sorted(resumo["contadores"].items()):
+            linhas.append(f"{nome}: {total:g}")
+        if len(linhas) == 1:
+            linhas.append("Nenhuma medição ainda.")
+        return "\n".join(linhas)
+
+    def zerar(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._contadores.clear()
+            self.inicio = time.time()
+
+metricas = RegistroMetricas()
+
+def instrumentar_engine(engine) -> None:
+    """Mede a duração de cada consulta ao banco, agrupada pelo handler em atendimento."""
+    if not metricas.ativado:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conexao, cursor, instrucao, parametros, contexto, executemany):
+        conexao.info["metricas_inicio"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conexao, cursor, instrucao, parametros, contexto, executemany):
+        metricas.observar(f"db.consulta[{handler_atual.get()}]",
+                          time.perf_counter() - conexao.info.pop("metricas_inicio"))
+
+    @event.listens_for(engine, "handle_error")
+    def _erro(contexto_excecao):
+        if contexto_excecao.connection is not None:
+            contexto_excecao.connection.info.pop("metricas_inicio", None)
+        metricas.incrementar(f"db.consulta[{handler_atual.get()}].erros")
+
+_HandlerMetricasLLM = None
+
+def callbacks_llm(nome: str) -> List:
+    """Callbacks do LangChain que contam tokens, erros e retentativas da chamada `nome`; vazio se desativado."""
+    global _HandlerMetricasLLM
+    if not metricas.ativado:
+        return []
+    if _HandlerMetricasLLM is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class HandlerMetricasLLM(BaseCallbackHandler):
+            # Roda no próprio event loop, sem passar por uma thread: só soma contadores
+            run_inline = True
+
+            def __init__(self, nome: str):
+                self.nome = nome
+
+            def on_llm_end(self, response, **kwargs):
+                for geracoes in response.generations:
+                    for geracao in geracoes:
+                        uso = getattr(getattr(geracao, "message", None), "usage_metadata", None)
+                        if uso:
+                            metricas.incrementar(f"{self.nome}.tokens_entrada", uso.get("input_tokens", 0))
+                            metricas.incrementar(f"{self.nome}.tokens_saida", uso.get("output_tokens", 0))
+
+            def on_retry(self, retry_state, **kwargs):
+                metricas.incrementar(f"{self.nome}.retentativas")
+
+        _HandlerMetricasLLM = HandlerMetricasLLM
+    return [_HandlerMetricasLLM(nome)]
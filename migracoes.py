@@ -0,0 +1,115 @@
+from sqlalchemy import inspect
+from modelo import (Base, CaixaEntrada, PropostaPendente, RevisaoTelegram, TABELAS_BUSCA, criar_indice_busca,
+                    ideia_informacao_association_table, tarefa_informacao_association_table)
+
+# Migrações versionadas do conceitos.db. A versão aplicada fica em PRAGMA user_version.
+# Cada migração roda numa transação própria (BEGIN IMMEDIATE), junto com o aumento do user_version:
+# se o processo cair no meio, nada dela fica gravado e ela é reaplicada inteira na próxima abertura.
+# O lock de escrita vale desde a leitura da versão, então dois processos nunca aplicam a mesma migração.
+# Para mudar o esquema, acrescente uma função ao final de MIGRACOES (nunca altere as já publicadas).
+# Índices novos são criados por DDL na própria migração, sem declará-los no modelo: a migração 3
+# cria todos os índices do metadata, e num banco antigo as colunas de um índice novo ainda não existem.
+
+def _esquema_inicial(conexao):
+    """Cria as tabelas que ainda não existem (bancos novos nascem já no esquema atual)."""
+    Base.metadata.create_all(conexao)
+
+def _indice_busca(conexao):
+    """Índice FTS5 de busca textual e seus triggers."""
+    criar_indice_busca(conexao)
+
+def _chaves_e_indices_de_relacionamento(conexao):
+    """Chave composta nas tabelas de associação (sem vínculos duplicados) e índices nas FKs."""
+    for tabela in (ideia_informacao_association_table, tarefa_informacao_association_table):
+        colunas_pk = [c["name"] for c in inspect(conexao).get_columns(tabela.name) if c["primary_key"]]
+        if len(colunas_pk) < 2:
+            # O SQLite não altera a chave primária de uma tabela existente: recriar e copiar sem duplicatas
+            antiga = f"{tabela.name}_antiga"
+            colunas = ", ".join(c.name for c in tabela.columns)
+            nao_nulas = " AND ".join(f"{c.name} IS NOT NULL" for c in tabela.columns)
+            conexao.exec_driver_sql(f"ALTER TABLE {tabela.name} RENAME TO {antiga}")
+            tabela.create(conexao)
+            conexao.exec_driver_sql(
+                f"INSERT OR IGNORE INTO {tabela.name} ({colunas}) SELECT {colunas} FROM {antiga} WHERE {nao_nulas}"
+            )
+            conexao.exec_driver_sql(f"DROP TABLE {antiga}")
+    for tabela in Base.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            indice.create(conexao, checkfirst=True)
+
+def _fila_caixa_entrada(conexao):
+    """Colunas de fila na CaixaEntrada: status, lease, tentativas e adiamento."""
+    existentes = {c["name"] for c in inspect(conexao).get_columns(CaixaEntrada.__tablename__)}
+    for coluna in ("status", "lease_dono", "lease_expira_em", "tentativas", "adiada_ate"):
+        if coluna not in existentes:
+            _adicionar_coluna(conexao, CaixaEntrada.__table__.c[coluna])
+    for indice in CaixaEntrada.__table__.indexes:
+        indice.create(conexao, checkfirst=True)
+    # Os triggers de atualização do índice de busca passam a disparar só quando o conteúdo muda,
+    # e não a cada mudança de status/lease
+    for tabela in TABELAS_BUSCA:
+        conexao.exec_driver_sql(f"DROP TRIGGER IF EXISTS {tabela}_busca_au")
+    criar_indice_busca(conexao)
+
+def _propostas_pendentes(conexao):
+    """Tabela de propostas do processamento em lote aguardando revisão."""
+    PropostaPendente.__table__.create(conexao, checkfirst=True)
+
+def _revisoes_telegram(conexao):
+    """Tabela com o estado de revisão do bot do Telegram, por chat."""
+    RevisaoTelegram.__table__.create(conexao, checkfirst=True)
+
+def _indice_fila_caixa_entrada(conexao):
+    """Índice (status, id) da fila da CaixaEntrada, fora do modelo para não quebrar a migração 3 em bancos antigos."""
+    conexao.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_caixa_de_entrada_status_id ON caixa_de_entrada (status, id)"
+    )
+
+def _completar_indice_busca(conexao):
+    """Indexa as linhas que faltam no índice de busca (bancos em que a migração 2 caiu antes do preenchimento)."""
+    criar_indice_busca(conexao)
+
+def _adicionar_coluna(conexao, coluna):
+    """ALTER TABLE ADD COLUMN a partir da definição da coluna no modelo."""
+    tipo = coluna.type.compile(dialect=conexao.dialect)
+    ddl = f"ALTER TABLE {coluna.table.name} ADD COLUMN {coluna.name} {tipo}"
+    if coluna.server_default is not None:
+        ddl += f" NOT NULL DEFAULT '{coluna.server_default.arg}'"
+    conexao.exec_driver_sql(ddl)
+
+MIGRACOES = [
+    _esquema_inicial,
+    _indice_busca,
+    _chaves_e_indices_de_relacionamento,
+    _fila_caixa_entrada,
+    _propostas_pendentes,
+    _revisoes_telegram,
+    _indice_fila_caixa_entrada,
+    _completar_indice_busca,
+]
+
+def versao_atual(conexao) -> int:
+    return conexao.exec_driver_sql("PRAGMA user_version").scalar()
+
+def aplicar_migracoes(engine) -> None:
+    """Aplica, em ordem, as migrações ainda não aplicadas ao banco, uma transação por migração."""
+    # AUTOCOMMIT: o pysqlite não abre nem fecha transações por conta própria; as transações são
+    # as explícitas abaixo, e o DDL fica dentro delas
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conexao:
+        while True:
+            conexao.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                # Relida sob o lock: outro processo pode ter migrado enquanto esperávamos
+                versao = versao_atual(conexao)
+                if versao >= len(MIGRACOES):
+                    conexao.exec_driver_sql("COMMIT")
+                    return
+                migracao = MIGRACOES[versao]
+                print(f"Aplicando migração {versao + 1}: {migracao.__doc__.splitlines()[0]}")
+                migracao(conexao)
+                conexao.exec_driver_sql(f"PRAGMA user_version = {versao + 1}")
+                conexao.exec_driver_sql("COMMIT")
+            except BaseException:
+                if conexao.connection.dbapi_connection.in_transaction:
+                    conexao.exec_driver_sql("ROLLBACK")
+                raise
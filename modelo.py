@@ -1,6 +1,14 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Table
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Optional
+from sqlalchemy import create_engine, event, Column, Float, Integer, String, ForeignKey, Table
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
+from metricas import instrumentar_engine
 
 # Definir o caminho do arquivo do banco de dados
 database_path = os.path.join(os.getcwd(), 'conceitos.db')
@@ -9,6 +17,24 @@ database_url = f'sqlite:///{database_path}'
 # Criar o motor do banco de dados (SQLite)
 engine = create_engine(database_url)
 
+@event.listens_for(engine, "connect")
+def _configurar_conexao_sqlite(conexao_dbapi, _registro):
+    """Ajusta cada conexão nova para leitores concorrentes com um escritor (bot, grafo e CLI ao mesmo tempo)."""
+    cursor = conexao_dbapi.cursor()
+    # WAL: leitores não bloqueiam o escritor nem são bloqueados por ele
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # Espera o lock de escrita em vez de falhar de imediato com "database is locked"
+    cursor.execute("PRAGMA busy_timeout=5000")
+    # Em WAL, NORMAL só abre mão de durabilidade da última transação numa queda de energia
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-16000")  # ~16 MB de cache de páginas
+    cursor.execute("PRAGMA mmap_size=134217728")  # 128 MB mapeados em memória
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+# Duração de cada consulta no registro de métricas (nada é instalado com METRICAS=0)
+instrumentar_engine(engine)
+
 # Declarar a base para as classes
 Base = declarative_base()
 
@@ -16,16 +42,18 @@ Base = declarative_base()
 ideia_informacao_association_table = Table(
     'ideia_informacao_association',
     Base.metadata,
-    Column('ideia_id', Integer, ForeignKey('ideias.id')),
-    Column('informacao_id', Integer, ForeignKey('informacoes.id'))
+    # Chave composta: impede vínculos duplicados e serve de índice para ideia.informacoes
+    Column('ideia_id', Integer, ForeignKey('ideias.id'), primary_key=True),
+    # Índice próprio para o lado inverso (informacao.ideias)
+    Column('informacao_id', Integer, ForeignKey('informacoes.id'), primary_key=True, index=True)
 )
 
 # Tabela de associação para o relacionamento N:N entre Informacao e Tarefa
 tarefa_informacao_association_table = Table(
     'tarefa_informacao_association',
     Base.metadata,
-    Column('tarefa_id', Integer, ForeignKey('tarefas.id')),
-    Column('informacao_id', Integer, ForeignKey('informacoes.id'))
+    Column('tarefa_id', Integer, ForeignKey('tarefas.id'), primary_key=True),
+    Column('informacao_id', Integer, ForeignKey('informacoes.id'), primary_key=True, index=True)
 )
 
 class Informacao(Base):
@@ -63,7 +91,7 @@ class Tarefa(Base):
                                backref="tarefas")
     
     # Relacionamento N:1 com Plano (várias Tarefas podem pertencer a um Plano)
-    plano_id = Column(Integer, ForeignKey('planos.id'))
+    plano_id = Column(Integer, ForeignKey('planos.id'), index=True)
 
     def __repr__(self):
         return f"<Tarefa(conteudo='{self.conteudo}')>"
@@ -72,7 +100,7 @@ class Plano(Base):
     __tablename__ = 'planos'
     id = Column(Integer, primary_key=True)
     # Relacionamento N:1 com Ideia (um Plano tem uma Ideia)
-    ideia_id = Column(Integer, ForeignKey('ideias.id'))
+    ideia_id = Column(Integer, ForeignKey('ideias.id'), index=True)
 
     # Relacionamento 1:N com Tarefa (um Plano tem várias Tarefas)
     tarefas = relationship("Tarefa", backref="plano", cascade="all, delete-orphan")
@@ -92,42 +120,164 @@ class CaixaEntrada(Base):
     id = Column(Integer, primary_key=True)
     conteudo_bruto = Column(String, nullable=False)
 
+    # Estado na fila de processamento (ver fila_caixa_entrada.py): 'pendente', 'em_processamento', 'adiada'
+    # ou 'aguardando_revisao' (proposta pronta em PropostaPendente). Itens processados com sucesso são removidos da tabela.
+    status = Column(String, nullable=False, default='pendente', server_default='pendente')
+    # Quem reivindicou o item e até quando (epoch em segundos); lease vencido volta a ficar disponível
+    lease_dono = Column(String)
+    lease_expira_em = Column(Float)
+    tentativas = Column(Integer, nullable=False, default=0, server_default='0')
+    # Item rejeitado sem feedback só volta à fila depois deste instante (epoch em segundos)
+    adiada_ate = Column(Float)
+
+    # O índice (status, id) da fila é criado pela migração 7 (ver migracoes.py), não declarado aqui
+
     def __repr__(self):
         return f"<CaixaEntrada(conteudo_bruto='{self.conteudo_bruto}')>"
 
-# Criar o banco de dados e as tabelas
-Base.metadata.create_all(engine)
+class PropostaPendente(Base):
+    """Proposta gerada pelo processamento em lote, guardada até a revisão humana (ver processamento_lote.py)."""
+    __tablename__ = 'propostas_pendentes'
+    id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey('caixa_de_entrada.id'), nullable=False, unique=True)
+    # SuggestionClasses serializada em JSON
+    proposta = Column(String, nullable=False)
+    criada_em = Column(Float, nullable=False)
 
-# Iniciar uma sessão para interagir com o banco de dados
-Session = sessionmaker(bind=engine)
-session = Session()
+    def __repr__(self):
+        return f"<PropostaPendente(item_id='{self.item_id}')>"
+
+class RevisaoTelegram(Base):
+    """Proposta aguardando revisão no bot do Telegram, por chat; sobrevive a reinícios (ver estado_revisao.py)."""
+    __tablename__ = 'revisoes_telegram'
+    chat_id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, nullable=False)
+    conteudo_bruto = Column(String, nullable=False)
+    # Dono do lease do item quando a revisão foi gravada; o bot reiniciado assume o lease a partir dele
+    lease_dono = Column(String, nullable=False)
+    # SuggestionClasses e histórico de mensagens do LLM, em JSON
+    proposta = Column(String, nullable=False)
+    historico = Column(String, nullable=False)
+    atualizada_em = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<RevisaoTelegram(chat_id='{self.chat_id}', item_id='{self.item_id}')>"
+
+# Índice de busca textual (FTS5) sobre as tabelas de conteúdo.
+# O rowid codifica a origem: rowid = id * 4 + código da tabela, o que permite
+# manter o índice sincronizado por triggers e filtrar por tabela sem join.
+TABELAS_BUSCA = {
+    'caixa_de_entrada': (0, 'conteudo_bruto'),
+    'informacoes': (1, 'conteudo'),
+    'ideias': (2, 'conteudo'),
+    'tarefas': (3, 'conteudo'),
+}
+
+def criar_indice_busca(conexao):
+    """Cria a tabela FTS5 e os triggers de sincronização; indexa as linhas que ainda faltam no índice.
+
+    O preenchimento não depende de a tabela ser nova: um índice criado e nunca populado
+    (ou populado pela metade) é completado a partir das tabelas de origem.
+    """
+    existe = conexao.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'busca_fts'"
+    ).first()
+    if not existe:
+        conexao.exec_driver_sql(
+            "CREATE VIRTUAL TABLE busca_fts USING fts5(conteudo, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    for tabela, (codigo, coluna) in TABELAS_BUSCA.items():
+        conexao.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {tabela}_busca_ai AFTER INSERT ON {tabela} BEGIN "
+            f"INSERT INTO busca_fts (rowid, conteudo) VALUES (new.id * 4 + {codigo}, new.{coluna}); END"
+        )
+        conexao.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {tabela}_busca_ad AFTER DELETE ON {tabela} BEGIN "
+            f"DELETE FROM busca_fts WHERE rowid = old.id * 4 + {codigo}; END"
+        )
+        conexao.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {tabela}_busca_au AFTER UPDATE OF {coluna} ON {tabela} BEGIN "
+            f"DELETE FROM busca_fts WHERE rowid = old.id * 4 + {codigo}; "
+            f"INSERT INTO busca_fts (rowid, conteudo) VALUES (new.id * 4 + {codigo}, new.{coluna}); END"
+        )
+        conexao.exec_driver_sql(
+            f"INSERT INTO busca_fts (rowid, conteudo) SELECT id * 4 + {codigo}, {coluna} FROM {tabela} "
+            f"WHERE id * 4 + {codigo} NOT IN (SELECT rowid FROM busca_fts)"
+        )
+
+_banco_preparado = False
+_lock_preparo = threading.Lock()
+
+def preparar_banco() -> None:
+    """Cria o banco e aplica as migrações pendentes (ver migracoes.py), uma vez por processo.
+
+    Chamado na primeira unidade de trabalho, e não na importação: ferramentas que só
+    importam o módulo não pagam a abertura do banco nem a checagem de versão.
+    """
+    global _banco_preparado
+    if _banco_preparado:
+        return
+    with _lock_preparo:
+        if not _banco_preparado:
+            from migracoes import aplicar_migracoes
+            aplicar_migracoes(engine)
+            _banco_preparado = True
+
+# Fábrica de sessões: cada unidade de trabalho abre a sua (ver nova_sessao)
+Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+@contextmanager
+def nova_sessao():
+    """Abre uma sessão para uma unidade de trabalho: commit ao final, rollback em caso de erro."""
+    preparar_banco()
+    sessao = Session()
+    try:
+        yield sessao
+        sessao.commit()
+    except Exception:
+        sessao.rollback()
+        raise
+    finally:
+        sessao.close()
+
+# Threads para o trabalho de banco vindo de código assíncrono, fora do event loop.
+# Poucas threads bastam: com WAL os leitores andam em paralelo e o SQLite tem um só escritor.
+_executor_banco = ThreadPoolExecutor(max_workers=4, thread_name_prefix="banco")
+
+async def executar_no_banco(funcao, *args, **kwargs):
+    """Executa uma função síncrona de banco de dados sem bloquear o event loop."""
+    loop = asyncio.get_running_loop()
+    # Leva o contexto (ex.: handler em atendimento, usado nas métricas) para a thread do banco
+    contexto = contextvars.copy_context()
+    return await loop.run_in_executor(_executor_banco, contexto.run, partial(funcao, *args, **kwargs))
 
 ### LÓGICA DO AGENTE DE TRANSFORMAÇÃO ###
 
-def processar_informacao(nova_informacao: Informacao):
+def processar_informacao(nova_informacao: Informacao, limite: Optional[int] = None):
     """
     Processa uma nova Informação e a relaciona com Ideias existentes
-    para sugerir novas Tarefas.
+    para sugerir novas Tarefas (de todas as Ideias relacionadas, ou só das `limite` mais relevantes).
     """
+    # Import local: busca depende deste módulo
+    from busca import ideias_relacionadas, normalizar_tokens
+
     print(f"\n--- Agente processando a nova informação: '{nova_informacao.conteudo}' ---")
     
-    # 1. Obter todas as ideias existentes
-    ideias_existentes = session.query(Ideia).all()
+    # 1. Obter só as ideias candidatas, via índice invertido, das mais relevantes para as menos
+    ideias_candidatas = ideias_relacionadas(nova_informacao.conteudo, limite=limite)
+    palavras_info = set(normalizar_tokens(nova_informacao.conteudo))
     
     sugestoes_geradas = []
 
-    # 2. Iterar sobre as ideias para encontrar correspondências
-    for ideia in ideias_existentes:
-        # Lógica de correspondência simples: verificar se uma palavra da informação está na ideia.
+    # 2. Iterar sobre as candidatas para montar as sugestões
+    for _, conteudo_ideia, _ in ideias_candidatas:
+        # Palavras normalizadas (sem acentos, pontuação e stopwords) em comum.
         # Em um sistema real, isso seria mais sofisticado (NLP, embeddings, etc.).
-        palavras_info = set(nova_informacao.conteudo.lower().split())
-        palavras_ideia = set(ideia.conteudo.lower().split())
-
-        palavras_comuns = palavras_info.intersection(palavras_ideia)
+        palavras_comuns = sorted(palavras_info.intersection(normalizar_tokens(conteudo_ideia)))
         
         if palavras_comuns:
             # 3. Gerar uma sugestão de Tarefa
-            sugestao_tarefa_conteudo = f"Pesquisar sobre a conexão de '{', '.join(palavras_comuns)}' com a ideia '{ideia.conteudo}'"
+            sugestao_tarefa_conteudo = f"Pesquisar sobre a conexão de '{', '.join(palavras_comuns)}' com a ideia '{conteudo_ideia}'"
             sugestoes_geradas.append(sugestao_tarefa_conteudo)
             
             print(f"  -> Sugestão gerada: '{sugestao_tarefa_conteudo}'")
@@ -138,11 +288,10 @@ def criar_tarefa_sugerida(conteudo_tarefa: str, informacao_fonte: Informacao):
     """
     Cria e persiste uma Tarefa sugerida pelo agente, vinculando-a à Informacao original.
     """
-    nova_tarefa = Tarefa(conteudo=conteudo_tarefa)
-    nova_tarefa.informacoes.append(informacao_fonte)
-    
-    session.add(nova_tarefa)
-    session.commit()
+    with nova_sessao() as sessao:
+        nova_tarefa = Tarefa(conteudo=conteudo_tarefa)
+        nova_tarefa.informacoes.append(sessao.merge(informacao_fonte))
+        sessao.add(nova_tarefa)
     print(f"  -> Tarefa '{nova_tarefa.conteudo}' criada e vinculada a uma informação.")
     return nova_tarefa
 
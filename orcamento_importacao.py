@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+# Verifica o tempo de importação dos pontos de entrada contra um orçamento, e que importar
+# não cria arquivos (banco, cache, índice): a inicialização pesada deve ficar para o primeiro uso.
+# Uso: python orcamento_importacao.py  (código de saída 1 se algum módulo estourar o orçamento)
+
+# Orçamento por módulo, em segundos de importação cumulativa (python -X importtime)
+ORCAMENTOS = {
+    'db_interface': 0.8,
+    'graph': 1.0,
+    'processamento_lote': 1.0,
+    'infos_n_tasks': 2.5,
+}
+
+diretorio_repositorio = os.path.dirname(os.path.abspath(__file__))
+
+# Linhas do traceback mostradas quando a importação falha
+LINHAS_TRACEBACK = 8
+
+def resumo_erro(stderr: str) -> str:
+    """Final do traceback da importação que falhou, sem as linhas do -X importtime e sem avisos anteriores."""
+    linhas = [linha for linha in stderr.splitlines() if not linha.startswith("import time:")]
+    inicios = [i for i, linha in enumerate(linhas) if linha.startswith("Traceback (most recent call last)")]
+    if inicios:
+        linhas = linhas[inicios[-1]:]
+    return "\n".join(linhas[-LINHAS_TRACEBACK:]).strip() or "a importação falhou sem mensagem de erro"
+
+def medir_importacao(modulo: str) -> float:
+    """Importa o módulo num interpretador novo, num diretório vazio, e retorna o tempo em segundos."""
+    with tempfile.TemporaryDirectory() as diretorio:
+        ambiente = dict(os.environ, PYTHONPATH=diretorio_repositorio)
+        # O bot exige estas variáveis na importação (os mesmos valores de exemplo do benchmark.py)
+        ambiente.setdefault("TELEGRAM_ALLOWED_USER", "1")
+        ambiente.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+        ambiente.setdefault("GOOGLE_API_KEY", "benchmark")
+        resultado = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+            cwd=diretorio, env=ambiente, capture_output=True, text=True,
+        )
+        if resultado.returncode != 0:
+            raise RuntimeError(resumo_erro(resultado.stderr))
+        criados = os.listdir(diretorio)
+        if criados:
+            raise RuntimeError(f"a importação criou arquivos: {', '.join(sorted(criados))}")
+    # Linhas no formato "import time: <próprio> | <cumulativo> | <módulo>", em microssegundos
+    for linha in resultado.stderr.splitlines():
+        partes = linha.split("|")
+        if len(partes) == 3 and partes[2].strip() == modulo:
+            return int(partes[1]) / 1e6
+    raise RuntimeError("tempo de importação não encontrado na saída do -X importtime")
+
+def verificar_orcamentos() -> bool:
+    """Mede cada módulo de ORCAMENTOS e imprime o resultado; False se algum falhar."""
+    ok = True
+    for modulo, orcamento in ORCAMENTOS.items():
+        try:
+            segundos = medir_importacao(modulo)
+        except RuntimeError as e:
+            print(f"❌ {modulo}: {e}")
+            ok = False
+            continue
+        dentro = segundos <= orcamento
+        ok = ok and dentro
+        print(f"{'✅' if dentro else '❌'} {modulo}: {segundos:.2f}s (orçamento {orcamento:.2f}s)")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if verificar_orcamentos() else 1)
@@ -0,0 +1,87 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+from graph import SuggestionClasses, aprocessar_item_com_llm
+
+# Quantos itens à frente do item em revisão têm a proposta calculada em segundo plano (0 desativa)
+PROFUNDIDADE_PADRAO = int(os.getenv("PREFETCH_PROFUNDIDADE", "3"))
+
+# Propostas em andamento no processo, compartilhadas entre os chats: (item_id, conteudo_bruto) ->
+# [tarefa, quantos prefetchers ou obter() ainda aguardam]. Dois chats revisando a mesma CaixaEntrada
+# espiam os mesmos próximos itens; cada item gera uma única extração no LLM, cancelada só quando
+# nenhum chat a quer mais.
+_em_andamento: Dict[Tuple[int, str], list] = {}
+
+def _reservar(chave: Tuple[int, str]) -> asyncio.Task:
+    entrada = _em_andamento.get(chave)
+    if entrada is None:
+        entrada = _em_andamento[chave] = [asyncio.create_task(aprocessar_item_com_llm(chave[1])), 0]
+    entrada[1] += 1
+    return entrada[0]
+
+def _liberar(chave: Tuple[int, str]) -> None:
+    entrada = _em_andamento.get(chave)
+    if entrada is None:
+        return
+    entrada[1] -= 1
+    if entrada[1] <= 0:
+        entrada[0].cancel()
+        del _em_andamento[chave]
+
+class PrefetchPropostas:
+    """Calcula em segundo plano as propostas dos próximos itens da CaixaEntrada
+    enquanto o usuário revisa o item atual.
+
+    Há uma instância por chat, mas as tarefas ficam no registro do processo (`_em_andamento`):
+    um item já em cálculo para outro chat não é enviado de novo ao LLM.
+    """
+
+    def __init__(self, profundidade: int = PROFUNDIDADE_PADRAO):
+        self.profundidade = max(0, profundidade)
+        # item_id -> conteudo_bruto das propostas que este chat reservou no registro compartilhado
+        self._reservas: Dict[int, str] = {}
+
+    def agendar(self, proximos_itens: List[Tuple[int, str]], atual: Optional[int] = None) -> None:
+        """Garante uma tarefa para cada item da janela e libera as que saíram dela ou cujo conteúdo mudou.
+
+        A reserva de `atual` (o item recém-reivindicado, que já saiu da janela) é mantida para o obter() seguinte.
+        """
+        janela = dict(proximos_itens[:self.profundidade])
+        for item_id, conteudo in list(self._reservas.items()):
+            if item_id != atual and janela.get(item_id) != conteudo:
+                # Item removido, alterado ou fora da janela: este chat não precisa mais da proposta
+                _liberar((item_id, conteudo))
+                del self._reservas[item_id]
+        for item_id, conteudo in janela.items():
+            if item_id not in self._reservas:
+                _reservar((item_id, conteudo))
+                self._reservas[item_id] = conteudo
+
+    async def obter(self, item_id: int, conteudo: str) -> SuggestionClasses:
+        """Retorna a proposta antecipada do item (deste ou de outro chat) se ela foi calculada sobre o
+        mesmo conteúdo; senão calcula agora."""
+        chave = (item_id, conteudo)
+        reservado = self._reservas.pop(item_id, None)
+        if reservado is not None and reservado != conteudo:
+            _liberar((item_id, reservado))
+            reservado = None
+        if reservado is not None or chave in _em_andamento:
+            # A reserva passa a ser deste obter(): a tarefa não é cancelada enquanto ele aguarda
+            tarefa = _em_andamento[chave][0] if reservado is not None else _reservar(chave)
+            try:
+                # shield: cancelar este chat não cancela a extração que outro chat ainda aguarda
+                return await asyncio.shield(tarefa)
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+            except Exception as e:
+                print(f"⚠️ Proposta antecipada do item {item_id} falhou ({e}), recalculando...")
+            finally:
+                _liberar(chave)
+        return await aprocessar_item_com_llm(conteudo)
+
+    def cancelar(self) -> None:
+        """Libera as propostas reservadas por este chat (as que nenhum outro chat quer são canceladas)."""
+        for item_id, conteudo in self._reservas.items():
+            _liberar((item_id, conteudo))
+        self._reservas.clear()
@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import os
+import time
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from modelo import nova_sessao, executar_no_banco
+from graph import SuggestionClasses, aprocessar_itens_em_lote, aplicar_proposta, descartar_propostas_em_cache
+from fila_caixa_entrada import (ADIAMENTO_PADRAO, adiar, contar_por_status, identificador_processo, liberar,
+                                reivindicar_varios)
+
+# Processamento da Caixa de Entrada em lote, sem ninguém esperando no terminal:
+# vários workers pedem propostas ao LLM em paralelo e as guardam em PropostaPendente.
+# A revisão humana acontece depois, em bloco (revisar_pendentes), aprovando ou rejeitando várias de uma vez.
+
+# Quantidade de chamadas simultâneas ao LLM
+WORKERS_PADRAO = int(os.getenv("LOTE_WORKERS", "8"))
+# Itens reivindicados por worker de cada vez; são empacotados em chamadas de extração em lote (1 desativa)
+ITENS_POR_WORKER = int(os.getenv("LOTE_ITENS_POR_WORKER", "8"))
+# Intervalo entre relatórios de progresso (segundos)
+INTERVALO_RELATORIO = float(os.getenv("LOTE_INTERVALO_RELATORIO", "30"))
+# Item que falhou no LLM só volta à fila depois deste intervalo (segundos), para não ser tentado em laço
+ESPERA_APOS_ERRO = float(os.getenv("LOTE_ESPERA_APOS_ERRO", "300"))
+TAMANHO_PAGINA_REVISAO = 10
+
+def guardar_para_revisao(item_id: int, dono: str, proposta: SuggestionClasses) -> bool:
+    """Grava a proposta e marca o item como 'aguardando_revisao' numa só transação; False se o lease foi perdido."""
+    with nova_sessao() as sessao:
+        marcado = sessao.execute(text(
+            "UPDATE caixa_de_entrada SET status = 'aguardando_revisao', lease_dono = NULL, lease_expira_em = NULL "
+            "WHERE id = :id AND status = 'em_processamento' AND lease_dono = :dono"
+        ), {"id": item_id, "dono": dono}).rowcount
+        if marcado == 0:
+            return False
+        sessao.execute(text(
+            "INSERT OR REPLACE INTO propostas_pendentes (item_id, proposta, criada_em) VALUES (:id, :proposta, :agora)"
+        ), {"id": item_id, "proposta": proposta.model_dump_json(), "agora": time.time()})
+    return True
+
+def listar_pendentes(apos_id: int = 0, limite: int = TAMANHO_PAGINA_REVISAO) -> List[Tuple[int, str, SuggestionClasses]]:
+    """Próximas propostas pendentes em ordem de item: (item_id, conteudo_bruto, proposta)."""
+    with nova_sessao() as sessao:
+        linhas = sessao.execute(text(
+            "SELECT p.item_id, c.conteudo_bruto, p.proposta FROM propostas_pendentes p "
+            "JOIN caixa_de_entrada c ON c.id = p.item_id "
+            "WHERE p.item_id > :apos ORDER BY p.item_id LIMIT :limite"
+        ), {"apos": apos_id, "limite": limite}).all()
+    return [(item_id, conteudo, SuggestionClasses.model_validate_json(proposta)) for item_id, conteudo, proposta in linhas]
+
+def rejeitar_pendente(item_id: int) -> None:
+    """Descarta a proposta e adia o item, que volta à fila mais tarde para uma nova proposta."""
+    with nova_sessao() as sessao:
+        sessao.execute(text("DELETE FROM propostas_pendentes WHERE item_id = :id"), {"id": item_id})
+        conteudo = sessao.execute(text(
+            "UPDATE caixa_de_entrada SET status = 'adiada', adiada_ate = :ate "
+            "WHERE id = :id AND status = 'aguardando_revisao' RETURNING conteudo_bruto"
+        ), {"id": item_id, "ate": time.time() + ADIAMENTO_PADRAO}).scalar()
+    # Sem isto, o item voltaria da fila com a mesma proposta rejeitada, servida pelo cache
+    if conteudo is not None:
+        descartar_propostas_em_cache(conteudo)
+
+class Progresso:
+    """Contadores do lote e taxa em itens por minuto."""
+
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.reivindicados = 0
+        self.concluidos = 0
+        self.erros = 0
+
+    def itens_por_minuto(self) -> float:
+        minutos = (time.monotonic() - self.inicio) / 60
+        return self.concluidos / minutos if minutos > 0 else 0.0
+
+    def resumo(self) -> str:
+        minutos = (time.monotonic() - self.inicio) / 60
+        return (f"📊 {self.concluidos} propostas em {minutos:.1f} min "
+                f"({self.itens_por_minuto():.1f} itens/min), {self.erros} erros")
+
+def _devolver(itens: List[Tuple[int, str]], dono: str, adiar_por: Optional[float] = None) -> None:
+    """Devolve à fila os itens reivindicados e não concluídos (ou os adia por `adiar_por` segundos)."""
+    for item_id, _ in itens:
+        if adiar_por is None:
+            liberar(item_id, dono)
+        else:
+            adiar(item_id, dono, adiar_por)
+
+async def _worker(dono: str, progresso: Progresso, limite: Optional[int]) -> None:
+    """Reivindica itens e guarda as propostas até a fila esvaziar (ou o limite ser atingido)."""
+    while limite is None or progresso.reivindicados < limite:
+        quantidade = ITENS_POR_WORKER if limite is None else min(ITENS_POR_WORKER, limite - progresso.reivindicados)
+        # Contar antes de esperar o banco, para os outros workers não passarem do limite enquanto isso
+        progresso.reivindicados += quantidade
+        itens = await executar_no_banco(reivindicar_varios, dono, quantidade)
+        progresso.reivindicados -= quantidade - len(itens)
+        if not itens:
+            return
+        try:
+            resultados = await aprocessar_itens_em_lote(itens)
+        except asyncio.CancelledError:
+            # Interrompido (Ctrl+C): devolve os itens em vez de esperar o lease vencer
+            await executar_no_banco(_devolver, itens, dono)
+            raise
+        except Exception as e:
+            # Falha do lote inteiro (não de um item): adiados como nos erros por item, para não
+            # ficarem presos em 'em_processamento' até o lease vencer nem voltarem em laço
+            print(f"❌ Erro ao processar os itens {[item_id for item_id, _ in itens]} com LLM: {e}")
+            progresso.erros += len(itens)
+            await executar_no_banco(_devolver, itens, dono, ESPERA_APOS_ERRO)
+            continue
+        for item_id, _ in itens:
+            resultado = resultados[item_id]
+            if isinstance(resultado, Exception):
+                print(f"❌ Erro ao processar item {item_id} com LLM: {resultado}")
+                progresso.erros += 1
+                await executar_no_banco(adiar, item_id, dono, ESPERA_APOS_ERRO)
+            elif await executar_no_banco(guardar_para_revisao, item_id, dono, resultado):
+                progresso.concluidos += 1
+            else:
+                print(f"⚠️ Lease do item {item_id} perdido; proposta descartada.")
+
+async def _relatar(progresso: Progresso) -> None:
+    while True:
+        await asyncio.sleep(INTERVALO_RELATORIO)
+        print(progresso.resumo())
+
+async def processar_lote(workers: int = WORKERS_PADRAO, limite: Optional[int] = None) -> Progresso:
+    """Processa a Caixa de Entrada com `workers` chamadas simultâneas ao LLM, sem revisão interativa."""
+    dono = identificador_processo("lote")
+    progresso = Progresso()
+    disponiveis = (await executar_no_banco(contar_por_status))['disponiveis']
+    print(f"=== Processamento em lote: {disponiveis} itens disponíveis, {workers} workers ===")
+    relatorio = asyncio.create_task(_relatar(progresso))
+    try:
+        await asyncio.gather(*(_worker(dono, progresso, limite) for _ in range(workers)))
+    finally:
+        relatorio.cancel()
+        print(progresso.resumo())
+    return progresso
+
+def _exibir_pagina(pagina: List[Tuple[int, str, SuggestionClasses]]) -> None:
+    for numero, (item_id, conteudo, proposta) in enumerate(pagina, start=1):
+        print(f"\n[{numero}] Item {item_id}: {conteudo[:100]}")
+        print(f"    Informações: {proposta.informacoes}")
+        print(f"    Ideias: {proposta.ideias}")
+        print(f"    Tarefas: {proposta.tarefas}")
+
+def _selecionar(pagina: List, argumentos: List[str]) -> Optional[List]:
+    """Itens da página indicados por número; todos se nenhum número for dado; None se algum for inválido."""
+    if not argumentos:
+        return list(pagina)
+    selecionados = []
+    for argumento in argumentos:
+        if not argumento.isdigit() or not 1 <= int(argumento) <= len(pagina):
+            return None
+        selecionados.append(pagina[int(argumento) - 1])
+    return selecionados
+
+def revisar_pendentes() -> None:
+    """Revisão em bloco das propostas pendentes, uma página por vez."""
+    apos_id = 0
+    while True:
+        pagina = listar_pendentes(apos_id)
+        if not pagina:
+            print("✅ Nenhuma proposta pendente de revisão.")
+            return
+        _exibir_pagina(pagina)
+        print("\nComandos: 's' aprova todas, 's 1 3' aprova as indicadas, 'n' / 'n 2' rejeita, "
+              "'p' próxima página, 'q' sair")
+        partes = input("Revisão: ").strip().lower().split()
+        if not partes:
+            continue
+        comando, argumentos = partes[0], partes[1:]
+        if comando == 'q':
+            return
+        if comando == 'p':
+            apos_id = pagina[-1][0]
+            continue
+        if comando not in ('s', 'n'):
+            print("Comando inválido.")
+            continue
+        selecionados = _selecionar(pagina, argumentos)
+        if selecionados is None:
+            print(f"Use números de 1 a {len(pagina)}.")
+            continue
+        for item_id, _, proposta in selecionados:
+            if comando == 's':
+                aplicar_proposta(proposta, item_id)
+            else:
+                rejeitar_pendente(item_id)
+                print(f"❌ Proposta do item {item_id} rejeitada; item adiado na Caixa de Entrada.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Processamento em lote da Caixa de Entrada.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    processar = subcomandos.add_parser("processar", help="gera propostas para os itens disponíveis")
+    processar.add_argument("--workers", type=int, default=WORKERS_PADRAO)
+    processar.add_argument("--limite", type=int, default=None, help="máximo de itens nesta execução")
+    subcomandos.add_parser("revisar", help="aprova ou rejeita em bloco as propostas pendentes")
+    argumentos = parser.parse_args()
+    if argumentos.comando == "processar":
+        asyncio.run(processar_lote(argumentos.workers, argumentos.limite))
+    else:
+        revisar_pendentes()
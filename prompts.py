@@ -36,4 +36,10 @@ Ao receber o feedback do usuário, verifique:
 - Se for uma expressão de reprovação ou solicitação de alteração, mantenha o campo 'aprovado' com 'False' e:
 -- Refaça a tarefa conforme as orientações ou motivos da reprovação do usuário, gerando portanto nova sugestão;
 -- Se não receber o motivo de reprovação ou orientações, refaça a tarefa gerando uma sugestão diferente das anteriores.
-"""
\ No newline at end of file
+"""
+
+PROMPT_ORGANIZADOR_LOTE = PROMPT_ORGANIZADOR + """
+Nesta solicitação você receberá vários textos independentes, cada um delimitado por <item id="N"> e </item>.
+Analise cada texto isoladamente, sem misturar conteúdo entre eles, e retorne exatamente uma proposta
+por item, com o mesmo 'item_id' do delimitador. Não omita nenhum item, nem mesmo os muito curtos.
+"""
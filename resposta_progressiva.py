@@ -0,0 +1,112 @@
+import asyncio
+import os
+import time
+from typing import Optional
+from telegram.constants import ChatAction, MessageLimit
+from telegram.error import RetryAfter, TelegramError
+
+# Resposta progressiva no Telegram: enquanto o LLM trabalha, o usuário vê "digitando..." e,
+# se a espera passar de ATRASO_ESPERA, uma mensagem provisória. Essa mesma mensagem é editada
+# com o texto parcial à medida que ele chega e, por fim, com a resposta completa.
+# Respostas rápidas continuam chegando numa única mensagem, sem edições nem chamadas extras.
+
+# TELEGRAM_RESPOSTA_PROGRESSIVA=0 volta ao envio único da resposta completa
+ATIVADA = os.getenv("TELEGRAM_RESPOSTA_PROGRESSIVA", "1") != "0"
+# Intervalo mínimo entre edições da mesma mensagem (segundos); o Telegram limita edições frequentes
+INTERVALO_EDICAO = float(os.getenv("TELEGRAM_INTERVALO_EDICAO", "1.0"))
+# Espera até a mensagem provisória aparecer (segundos): abaixo disso só o "digitando..." é mostrado
+ATRASO_ESPERA = float(os.getenv("TELEGRAM_ATRASO_ESPERA", "0.5"))
+
+def _segundos(retry_after) -> float:
+    # O python-telegram-bot entrega int ou timedelta, conforme a versão/configuração
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+def dividir_texto(texto: str, limite: int = MessageLimit.MAX_TEXT_LENGTH) -> list:
+    """Partes de até `limite` caracteres, quebrando de preferência em fim de linha."""
+    partes = []
+    while len(texto) > limite:
+        corte = texto.rfind("\n", 0, limite)
+        if corte <= 0:
+            corte = limite
+        partes.append(texto[:corte])
+        texto = texto[corte:].lstrip("\n")
+    return partes + [texto]
+
+class RespostaProgressiva:
+    """Uma resposta do bot que começa provisória e é editada até ficar completa.
+
+    Uso: iniciar() antes da chamada ao LLM, atualizar(texto_parcial) a cada pedaço recebido
+    (edições excedentes são descartadas) e concluir(texto_final) no fim, sempre.
+    """
+
+    def __init__(self, update, context, texto_espera: str = "⏳ Pensando...",
+                 intervalo: float = INTERVALO_EDICAO, atraso: float = ATRASO_ESPERA):
+        self.update = update
+        self.context = context
+        self.texto_espera = texto_espera
+        self.intervalo = intervalo
+        self.atraso = atraso
+        # Mensagem do bot que vai sendo editada, e o texto mostrado nela
+        self.mensagem = None
+        self.texto_exibido: Optional[str] = None
+        self.concluida = False
+        self._proxima_edicao = 0.0
+        self._lock = asyncio.Lock()
+        self._tarefa_espera: Optional[asyncio.Task] = None
+
+    def iniciar(self) -> None:
+        """Mostra "digitando..." e agenda a mensagem provisória, sem atrasar quem chamou."""
+        self._tarefa_espera = asyncio.create_task(self._mostrar_espera())
+
+    async def _mostrar_espera(self) -> None:
+        try:
+            await self.context.bot.send_chat_action(chat_id=self.update.effective_chat.id, action=ChatAction.TYPING)
+        except TelegramError as e:
+            print(f"⚠️ Falha ao enviar 'digitando...': {e}")
+        await asyncio.sleep(self.atraso)
+        async with self._lock:
+            if self.mensagem is None and not self.concluida:
+                await self._publicar(self.texto_espera)
+
+    async def atualizar(self, texto: str) -> None:
+        """Mostra o texto parcial, se já passou o intervalo desde a última edição."""
+        if not texto.strip() or time.monotonic() < self._proxima_edicao:
+            return
+        async with self._lock:
+            if not self.concluida:
+                # Parcial maior que uma mensagem: mostra o começo; a divisão fica para o texto final
+                await self._publicar(texto[:MessageLimit.MAX_TEXT_LENGTH - 1] + "…"
+                                     if len(texto) > MessageLimit.MAX_TEXT_LENGTH else texto)
+
+    async def concluir(self, texto: str) -> None:
+        """Mostra a resposta completa (em várias mensagens, se passar do limite do Telegram)."""
+        async with self._lock:
+            self.concluida = True
+            if self._tarefa_espera is not None:
+                self._tarefa_espera.cancel()
+            primeira, *demais = dividir_texto(texto)
+            await self._publicar(primeira, final=True)
+            for parte in demais:
+                await self.update.message.reply_text(parte)
+
+    async def _publicar(self, texto: str, final: bool = False) -> None:
+        # Chamado com o lock: envia a primeira mensagem ou edita a existente
+        if self.mensagem is None:
+            self.mensagem = await self.update.message.reply_text(texto)
+        elif texto != self.texto_exibido:
+            try:
+                await self.mensagem.edit_text(texto)
+            except RetryAfter as e:
+                if not final:
+                    self._proxima_edicao = time.monotonic() + _segundos(e.retry_after)
+                    return
+                await asyncio.sleep(_segundos(e.retry_after))
+                await self.mensagem.edit_text(texto)
+            except TelegramError as e:
+                if not final:
+                    print(f"⚠️ Falha ao editar a resposta parcial: {e}")
+                    return
+                # A resposta final não pode se perder: vai numa mensagem nova
+                self.mensagem = await self.update.message.reply_text(texto)
+        self.texto_exibido = texto
+        self._proxima_edicao = time.monotonic() + self.intervalo
@@ -0,0 +1,101 @@
+import os
+import re
+import unicodedata
+from typing import NamedTuple, Optional
+from busca import normalizar_tokens
+
+# Roteador local de intenções do bot: comandos comuns ("quantos itens?", "processa a caixa",
+# "anota: comprar leite", "busca copel") são atendidos sem chamar o Gemini.
+# Capturas e buscas são reconhecidas por expressões regulares (o argumento sai do próprio texto);
+# status e processamento, por um classificador de vocabulário: toda palavra da mensagem precisa
+# pertencer ao vocabulário de uma única intenção, com ao menos uma palavra-chave dela.
+# Qualquer dúvida (palavra desconhecida, duas intenções possíveis, uma negação) vai para o LLM.
+
+# ROTEADOR_LOCAL=0 manda todas as mensagens para o LLM
+ATIVADO = os.getenv("ROTEADOR_LOCAL", "1") != "0"
+# Mensagens mais longas que isto (em palavras úteis) nunca são classificadas localmente
+MAX_PALAVRAS_CLASSIFICADOR = 8
+# Buscas com mais palavras que isto provavelmente são perguntas em linguagem natural: melhor o LLM
+MAX_PALAVRAS_BUSCA = 6
+
+class Intencao(NamedTuple):
+    ferramenta: str
+    argumentos: dict
+
+_CAPTURA = re.compile(
+    r"^(?:adiciona|adicione|adicionar|add|anota|anote|anotar|captura|capture|inbox)(?:\s+a[ií])?"
+    r"(?:\s+(?:[àa]|na)\s+(?:minha\s+)?caixa(?:\s+de\s+entrada)?)?\s*:\s*(?P<conteudo>\S.*)$"
+    r"|^(?:anota|anote|anotar)(?:\s+a[ií])?(?:\s+que)?\s+(?P<conteudo_livre>\S.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+# Palavras que sozinhas não são conteúdo de captura livre ("anota aí", "anota isso pra mim")
+_PREENCHIMENTO = {"ai", "aqui", "isso", "isto", "mim", "favor", "agora", "pf", "pfv", "por"}
+# Negações invertem o sentido da mensagem ("não processa agora"): normalizar_tokens as descarta
+_NEGACOES = {"nao", "nunca", "jamais", "nem"}
+_BUSCA = re.compile(
+    r"^(?:busca|buscar|busque|procura|procurar|procure|pesquisa|pesquisar|pesquise)(?:\s+por)?\s*:?\s+(?P<termo>\S.*?)\s*\??$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+def _radical(palavra: str) -> str:
+    """Radical grosseiro (5 primeiras letras, sem plural): 'processar', 'processa' e 'processamento' coincidem."""
+    if len(palavra) > 4 and palavra.endswith("s"):
+        palavra = palavra[:-1]
+    return palavra[:5]
+
+def _radicais(texto: str) -> set:
+    return {_radical(palavra) for palavra in texto.split()}
+
+# Por intenção: palavras-chave (ao menos uma presente) e vocabulário permitido
+_VOCABULARIO_COMUM = _radicais("caixa entrada itens item ai agora favor hoje todos tudo ainda")
+_CLASSES = {
+    "verificar_status_caixa_entrada": (
+        _radicais("quantos quantas quantidade status situacao tamanho"),
+        _VOCABULARIO_COMUM | _radicais("pendentes restam faltam sobraram existem estao cheia anda"),
+    ),
+    "processar_caixa_entrada": (
+        _radicais("processa processar processe processamento esvaziar"),
+        _VOCABULARIO_COMUM | _radicais("comecar iniciar inicie comece bora vamos proximo"),
+    ),
+}
+
+def _tem_negacao(texto: str) -> bool:
+    sem_acentos = "".join(
+        c for c in unicodedata.normalize("NFKD", texto.lower()) if not unicodedata.combining(c)
+    )
+    return any(palavra in _NEGACOES for palavra in re.findall(r"\w+", sem_acentos))
+
+def classificar(texto: str) -> Optional[str]:
+    """Intenção sem argumentos (status ou processamento) reconhecida localmente, ou None se houver dúvida."""
+    if _tem_negacao(texto):
+        return None
+    palavras = [_radical(palavra) for palavra in normalizar_tokens(texto)]
+    if not palavras or len(palavras) > MAX_PALAVRAS_CLASSIFICADOR:
+        return None
+    candidatas = [
+        intencao for intencao, (chaves, vocabulario) in _CLASSES.items()
+        if any(palavra in chaves for palavra in palavras)
+        and all(palavra in chaves or palavra in vocabulario for palavra in palavras)
+    ]
+    return candidatas[0] if len(candidatas) == 1 else None
+
+def rotear(texto: str) -> Optional[Intencao]:
+    """Ferramenta e argumentos para atender a mensagem sem o LLM, ou None para mandá-la ao LLM."""
+    texto = texto.strip()
+    captura = _CAPTURA.match(texto)
+    if captura:
+        if captura.group("conteudo"):
+            return Intencao("adicionar_na_caixa_entrada", {"conteudo": captura.group("conteudo").strip()})
+        # Sem os dois-pontos, só captura se sobrar conteúdo de verdade além de "aí", "isso"...
+        conteudo = captura.group("conteudo_livre").strip()
+        if set(normalizar_tokens(conteudo)) - _PREENCHIMENTO:
+            return Intencao("adicionar_na_caixa_entrada", {"conteudo": conteudo})
+        return None
+    busca = _BUSCA.match(texto)
+    if busca:
+        termo = busca.group("termo")
+        if normalizar_tokens(termo) and len(termo.split()) <= MAX_PALAVRAS_BUSCA:
+            return Intencao("buscar_itens", {"termo": termo})
+        return None
+    ferramenta = classificar(texto)
+    return Intencao(ferramenta, {}) if ferramenta else None
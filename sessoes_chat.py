@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+from typing import Dict, Tuple
+from prefetch_propostas import PrefetchPropostas
+from memoria_conversa import MemoriaConversa
+
+# Sessões do bot do Telegram, uma por chat: cada usuário tem seu histórico de conversa,
+# seu estado de processamento/revisão e seu lock. Chats diferentes são atendidos em paralelo;
+# dentro de um chat, o lock (FIFO) mantém as mensagens estritamente em ordem.
+
+# Sessões sem atividade por mais que isto (segundos) são descartadas da memória.
+# Uma revisão pendente não se perde: ela está gravada no banco (ver estado_revisao.py).
+OCIOSIDADE_PADRAO = float(os.getenv("SESSAO_CHAT_OCIOSIDADE", "1800"))
+# Intervalo mínimo entre varreduras de sessões ociosas (segundos)
+INTERVALO_VARREDURA = 60.0
+
+class EstadoProcessamento:
+    def __init__(self):
+        self.processando = False
+        self.aguardando_revisao = False
+        self.proposta_atual = None
+        self.item_atual_id = None
+        self.item_atual_conteudo = None
+        self.messages_history = None
+        self.prefetch = PrefetchPropostas()
+
+class SessaoChat:
+    """Estado de conversa e de processamento de um chat."""
+
+    def __init__(self, chat_id: int, system_prompt: str):
+        self.chat_id = chat_id
+        self.estado = EstadoProcessamento()
+        self.historico = MemoriaConversa(system_prompt)
+        self.lock = asyncio.Lock()
+        self.ultimo_uso = time.monotonic()
+
+    def ocupada(self) -> bool:
+        """Há mensagem sendo atendida ou processamento da Caixa de Entrada em andamento."""
+        return self.lock.locked() or self.estado.processando
+
+class RegistroSessoes:
+    """Sessões por chat_id, criadas sob demanda e descartadas após um período ocioso."""
+
+    def __init__(self, system_prompt: str, ociosidade: float = OCIOSIDADE_PADRAO):
+        self.system_prompt = system_prompt
+        self.ociosidade = ociosidade
+        self._sessoes: Dict[int, SessaoChat] = {}
+        self._ultima_varredura = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._sessoes)
+
+    def obter(self, chat_id: int) -> Tuple[SessaoChat, bool]:
+        """Retorna (sessão do chat, se acabou de ser criada), marcando-a como usada agora."""
+        agora = time.monotonic()
+        if agora - self._ultima_varredura >= INTERVALO_VARREDURA:
+            self.expirar_ociosas(agora)
+        sessao_chat = self._sessoes.get(chat_id)
+        nova = sessao_chat is None
+        if nova:
+            sessao_chat = self._sessoes[chat_id] = SessaoChat(chat_id, self.system_prompt)
+        sessao_chat.ultimo_uso = agora
+        return sessao_chat, nova
+
+    def expirar_ociosas(self, agora: float = None) -> int:
+        """Descarta as sessões ociosas que não estão ocupadas; retorna quantas foram descartadas."""
+        agora = time.monotonic() if agora is None else agora
+        self._ultima_varredura = agora
+        ociosas = [
+            chat_id for chat_id, sessao_chat in self._sessoes.items()
+            if agora - sessao_chat.ultimo_uso > self.ociosidade and not sessao_chat.ocupada()
+        ]
+        for chat_id in ociosas:
+            self._sessoes.pop(chat_id).estado.prefetch.cancelar()
+        return len(ociosas)
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Os módulos do projeto são de nível superior: o repositório entra no sys.path
+diretorio_repositorio = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, diretorio_repositorio)
+
+# O bot exige estas variáveis na importação; nenhum teste chama o Gemini nem o Telegram de verdade
+os.environ.setdefault("TELEGRAM_ALLOWED_USER", "1")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "testes")
+os.environ.setdefault("GOOGLE_API_KEY", "testes")
+# Sem limite de taxa no gateway e sem métricas gravadas em arquivo
+os.environ["LLM_REQUISICOES_POR_MINUTO"] = "0"
+os.environ.pop("METRICAS_ARQUIVO", None)
+
+def pytest_sessionstart(session):
+    # modelo.py cria o banco (e os caches, o índice) no diretório atual: os testes rodam num diretório
+    # temporário, nunca sobre o conceitos.db do repositório. Antes da coleta, que importa os módulos.
+    os.chdir(tempfile.mkdtemp(prefix="testes_infos_n_tasks_"))
+
+
+@pytest.fixture
+def caixa_vazia():
+    """Caixa de Entrada sem itens (o banco é compartilhado pelos testes da sessão)."""
+    from sqlalchemy import delete
+    from modelo import CaixaEntrada, PropostaPendente, nova_sessao
+    with nova_sessao() as sessao:
+        sessao.execute(delete(PropostaPendente))
+        sessao.execute(delete(CaixaEntrada))
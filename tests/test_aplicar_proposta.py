@@ -0,0 +1,83 @@
+from sqlalchemy import func, select
+from modelo import CaixaEntrada, Informacao, nova_sessao
+from graph import SuggestionClasses, aplicar_proposta, formatar_vinculos_sugeridos
+
+DONO = "testes:aplicar"
+
+
+def _novo_item(conteudo: str, dono: str = DONO) -> int:
+    """Item da CaixaEntrada sob o lease de `dono`, como depois de reivindicado."""
+    with nova_sessao() as sessao:
+        item = CaixaEntrada(conteudo_bruto=conteudo, status="em_processamento", lease_dono=dono, lease_expira_em=0)
+        sessao.add(item)
+        sessao.flush()
+        return item.id
+
+
+def _na_caixa(item_id: int) -> bool:
+    with nova_sessao() as sessao:
+        return sessao.get(CaixaEntrada, item_id) is not None
+
+
+def _caixa_vazia() -> bool:
+    with nova_sessao() as sessao:
+        return sessao.scalar(select(func.count()).select_from(CaixaEntrada)) == 0
+
+
+def test_aplicar_proposta_retorna_os_vinculos_sugeridos():
+    primeiro = _novo_item("reforma do banheiro")
+    resultado = aplicar_proposta(SuggestionClasses(informacoes=["Orçamento da reforma do banheiro: 8 mil"]), primeiro, DONO)
+    assert resultado == ("aplicada", [])
+
+    segundo = _novo_item("ideia de reforma")
+    vinculos = aplicar_proposta(SuggestionClasses(ideias=["Reforma do banheiro com orçamento de 8 mil"]),
+                                segundo, DONO).vinculos
+
+    assert vinculos and vinculos[0].startswith("🔗 Ideia ")
+    assert "↔ Informação" in formatar_vinculos_sugeridos(vinculos)
+    assert formatar_vinculos_sugeridos([]) == ""
+
+
+def test_aplicar_proposta_duas_vezes_nao_grava_de_novo():
+    item_id = _novo_item("comprar lâmpadas")
+    proposta = SuggestionClasses(informacoes=["Lâmpadas LED gastam menos energia"])
+
+    assert aplicar_proposta(proposta, item_id, DONO).situacao == "aplicada"
+    assert aplicar_proposta(proposta, item_id, DONO).situacao == "indisponivel"
+    with nova_sessao() as sessao:
+        assert sessao.scalar(select(func.count()).where(Informacao.conteudo == proposta.informacoes[0])) == 1
+
+
+def test_item_reivindicado_por_outro_processo_nao_e_aplicado():
+    # A revisão demorou, o lease venceu e outro processador assumiu o item
+    item_id = _novo_item("pagar o IPTU", dono="outro:processo")
+    proposta = SuggestionClasses(tarefas=["Pagar a cota única do IPTU"])
+
+    assert aplicar_proposta(proposta, item_id, DONO).situacao == "indisponivel"
+    assert _na_caixa(item_id)
+    # Sem dono, só se aplica um item aguardando a revisão em bloco
+    assert aplicar_proposta(proposta, item_id).situacao == "indisponivel"
+    assert _na_caixa(item_id)
+
+
+def test_cli_estende_o_lease_antes_de_esperar_a_revisao(caixa_vazia, monkeypatch):
+    import time
+    import graph
+    from fila_caixa_entrada import DURACAO_LEASE
+    with nova_sessao() as sessao:
+        sessao.add(CaixaEntrada(conteudo_bruto="marcar dentista"))
+    lease_na_revisao = []
+
+    def revisar(proposta):
+        with nova_sessao() as sessao:
+            lease_na_revisao.append(sessao.scalar(select(CaixaEntrada.lease_expira_em)))
+        return True, None
+
+    monkeypatch.setattr(graph, "processar_item_com_llm",
+                        lambda conteudo, messages_history=None: SuggestionClasses(tarefas=["Marcar o dentista"]))
+    monkeypatch.setattr(graph, "exibir_proposta_para_revisao", revisar)
+
+    graph.processar_caixa_entrada()
+
+    assert lease_na_revisao[0] > time.time() + DURACAO_LEASE
+    assert _caixa_vazia()
@@ -0,0 +1,48 @@
+from sqlalchemy import insert
+from modelo import Ideia, Informacao, criar_indice_busca, nova_sessao, processar_informacao
+from busca import ideias_relacionadas
+
+
+def test_processar_informacao_sugere_para_todas_as_ideias_relacionadas():
+    with nova_sessao() as sessao:
+        sessao.execute(insert(Ideia), [{"conteudo": f"horta urbana comunitaria numero {i}"} for i in range(15)])
+
+    sugestoes = processar_informacao(Informacao(conteudo="Como montar uma horta urbana"))
+
+    assert len(sugestoes) == 15
+    assert len(processar_informacao(Informacao(conteudo="horta urbana"), limite=3)) == 3
+
+
+def test_ideias_relacionadas_ordena_pela_relevancia():
+    with nova_sessao() as sessao:
+        sessao.execute(insert(Ideia), [{"conteudo": "bicicleta eletrica"},
+                                       {"conteudo": "bicicleta eletrica dobravel barata"}])
+
+    resultados = ideias_relacionadas("bicicleta eletrica dobravel")
+
+    assert [conteudo for _, conteudo, _ in resultados][0] == "bicicleta eletrica dobravel barata"
+    assert [rank for _, _, rank in resultados] == sorted(rank for _, _, rank in resultados)
+
+
+def test_indice_vazio_sobre_tabelas_populadas_e_completado(tmp_path):
+    from sqlalchemy import create_engine
+    from migracoes import MIGRACOES, aplicar_migracoes
+    engine = create_engine(f"sqlite:///{tmp_path / 'banco.db'}")
+    aplicar_migracoes(engine)
+    with engine.begin() as conexao:
+        conexao.exec_driver_sql("INSERT INTO ideias (conteudo) VALUES ('horta no terraço'), ('bicicleta eletrica')")
+        conexao.exec_driver_sql("INSERT INTO caixa_de_entrada (conteudo_bruto) VALUES ('ligar para o síndico')")
+        # Índice criado e nunca populado: o estado deixado pela migração 2 que caía antes do preenchimento
+        conexao.exec_driver_sql("DELETE FROM busca_fts")
+        conexao.exec_driver_sql(f"PRAGMA user_version = {len(MIGRACOES) - 1}")
+
+    aplicar_migracoes(engine)
+
+    with engine.connect() as conexao:
+        assert conexao.exec_driver_sql("SELECT count(*) FROM busca_fts").scalar() == 3
+        assert conexao.exec_driver_sql("SELECT count(*) FROM busca_fts WHERE busca_fts MATCH 'terraco'").scalar() == 1
+
+    # Rodar de novo não duplica nada
+    with engine.begin() as conexao:
+        criar_indice_busca(conexao)
+        assert conexao.exec_driver_sql("SELECT count(*) FROM busca_fts").scalar() == 3
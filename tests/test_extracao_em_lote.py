@@ -0,0 +1,35 @@
+import asyncio
+import graph
+from graph import SuggestionClasses, aprocessar_itens_em_lote, cache_propostas
+
+
+def _instalar_llm_falso(monkeypatch):
+    """Extração em lote e individual falsas, que registram o que foi enviado a cada uma."""
+    chamadas = {"lote": [], "individual": []}
+
+    async def extrair_lote(itens):
+        chamadas["lote"].append([conteudo for _, conteudo in itens])
+        return {item_id: SuggestionClasses(ideias=[f"lote: {conteudo}"]) for item_id, conteudo in itens}
+
+    async def extrair_individual(conteudo, messages_history=None):
+        chamadas["individual"].append(conteudo)
+        return SuggestionClasses(ideias=[f"individual: {conteudo}"])
+
+    monkeypatch.setattr(graph, "_extrair_lote", extrair_lote)
+    monkeypatch.setattr(graph, "aprocessar_item_com_llm", extrair_individual)
+    return chamadas
+
+
+def test_proposta_do_lote_nao_vaza_para_a_extracao_individual(monkeypatch):
+    chamadas = _instalar_llm_falso(monkeypatch)
+    itens = [(1, "trocar o filtro de água"), (2, "ler sobre compostagem")]
+
+    primeira = asyncio.run(aprocessar_itens_em_lote(itens))
+    segunda = asyncio.run(aprocessar_itens_em_lote(itens))
+
+    assert primeira == segunda
+    assert len(chamadas["lote"]) == 1 and chamadas["individual"] == []
+    # A chave do prompt individual continua vazia: o bot e a CLI não recebem a proposta do outro prompt
+    for _, conteudo in itens:
+        assert cache_propostas.obter(graph._chave_se_cacheavel(conteudo, None)) is None
+        assert cache_propostas.obter(graph._chave_lote(conteudo)) is not None
@@ -0,0 +1,72 @@
+import time
+from sqlalchemy import insert, text
+from modelo import CaixaEntrada, nova_sessao
+from fila_caixa_entrada import (adiar, assumir_lease, contar_por_status, espiar_proximos, liberar,
+                                reivindicar_proximo, reivindicar_varios, renovar_lease)
+
+
+def _popular(*conteudos):
+    with nova_sessao() as sessao:
+        sessao.execute(insert(CaixaEntrada), [{"conteudo_bruto": c} for c in conteudos])
+    return [item_id for item_id, _ in espiar_proximos(len(conteudos))]
+
+
+def _vencer_lease(item_id):
+    with nova_sessao() as sessao:
+        sessao.execute(text("UPDATE caixa_de_entrada SET lease_expira_em = :antes WHERE id = :id"),
+                       {"antes": time.time() - 1, "id": item_id})
+
+
+def test_item_reivindicado_nao_e_entregue_a_outro_dono(caixa_vazia):
+    primeiro, segundo = _popular("a", "b")
+
+    assert reivindicar_proximo("bot") == (primeiro, "a")
+    assert reivindicar_proximo("lote") == (segundo, "b")
+    assert reivindicar_proximo("cli") is None
+    assert contar_por_status()["em_processamento"] == 2
+
+
+def test_lease_vencido_devolve_o_item_a_fila(caixa_vazia):
+    (item_id,) = _popular("a")
+    reivindicar_proximo("processo_morto")
+    _vencer_lease(item_id)
+
+    assert reivindicar_proximo("outro") == (item_id, "a")
+    # O dono antigo perdeu o lease: não renova nem libera o item de quem o reivindicou
+    assert renovar_lease(item_id, "processo_morto") is False
+    liberar(item_id, "processo_morto")
+    assert reivindicar_proximo("terceiro") is None
+
+
+def test_renovar_e_assumir_lease(caixa_vazia):
+    (item_id,) = _popular("a")
+    reivindicar_proximo("bot:1")
+
+    assert renovar_lease(item_id, "bot:1", duracao=3600) is True
+    assert assumir_lease(item_id, "bot:1", "bot:2") is True
+    assert assumir_lease(item_id, "bot:1", "bot:3") is False
+    assert renovar_lease(item_id, "bot:2") is True
+
+
+def test_liberar_e_adiar(caixa_vazia):
+    primeiro, segundo = _popular("a", "b")
+    reivindicar_proximo("bot")
+    adiar(primeiro, "bot", segundos=3600)
+    reivindicar_proximo("bot")
+    liberar(segundo, "bot")
+
+    assert espiar_proximos(5) == [(segundo, "b")]
+    assert contar_por_status()["adiados"] == 1
+    assert reivindicar_proximo("bot") == (segundo, "b")
+
+    adiar(segundo, "bot", segundos=-1)
+    assert reivindicar_proximo("bot") == (segundo, "b")
+
+
+def test_reivindicar_varios_respeita_quantidade_e_ordem(caixa_vazia):
+    ids = _popular(*"abcde")
+
+    assert reivindicar_varios("lote", 3) == list(zip(ids[:3], "abc"))
+    assert reivindicar_varios("lote", 3) == list(zip(ids[3:], "de"))
+    assert reivindicar_varios("lote", 3) == []
+    assert reivindicar_varios("lote", 0) == []
@@ -0,0 +1,128 @@
+import pytest
+from gateway_llm import INTERVALO_REDUCAO, ConcorrenciaAdaptativa, LimitadorTaxa, classificar_erro
+
+
+class RelogioFalso:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+    def avancar(self, segundos: float) -> None:
+        self.agora += segundos
+
+
+class ErroDaApi(Exception):
+    def __init__(self, mensagem, code=None, status=None):
+        super().__init__(mensagem)
+        self.code = code
+        self.status = status
+
+
+class ReadTimeout(Exception):
+    pass
+
+
+class ChatGoogleGenerativeAIError(Exception):
+    pass
+
+
+def _embrulhado(causa: Exception) -> Exception:
+    try:
+        raise ChatGoogleGenerativeAIError("Erro ao chamar o Gemini") from causa
+    except ChatGoogleGenerativeAIError as e:
+        return e
+
+
+@pytest.mark.parametrize("erro, tipo", [
+    (ErroDaApi("429 RESOURCE_EXHAUSTED. {'error': ...}", code=429), "limite"),
+    (ErroDaApi("503 UNAVAILABLE.", code=503), "transitorio"),
+    # O código decide antes do texto: um 400 que menciona "500" e "quota" continua definitivo
+    (ErroDaApi("400 INVALID_ARGUMENT: max 500 tokens, see quota docs", code=400), "definitivo"),
+    (ErroDaApi("sem código", status="RESOURCE_EXHAUSTED"), "limite"),
+    (_embrulhado(ErroDaApi("429 RESOURCE_EXHAUSTED.", code=429)), "limite"),
+    (TimeoutError(), "transitorio"),
+    (ReadTimeout("leitura expirou"), "transitorio"),
+    # Só pela mensagem: código em posição de status ou nome de status inteiro
+    (ValueError("Falha: 503 Service Unavailable"), "transitorio"),
+    (ValueError("API respondeu com status code 500"), "transitorio"),
+    (ValueError("Gemini retornou RESOURCE_EXHAUSTED"), "limite"),
+    # Números e palavras soltas não classificam o erro
+    (ValueError("Invalid argument: 500 tokens exceed the limit"), "definitivo"),
+    (ValueError("item 15003 (request id 5004291) malformado"), "definitivo"),
+    (ValueError("connection string inválida no quotation_id"), "definitivo"),
+    (ValueError("falha de validação"), "definitivo"),
+])
+def test_classificar_erro(erro, tipo):
+    assert classificar_erro(erro) == tipo
+
+
+def test_limitador_libera_a_rajada_e_depois_espaca_as_chamadas():
+    relogio = RelogioFalso()
+    limitador = LimitadorTaxa(por_minuto=60, rajada=2, relogio=relogio)
+
+    assert [limitador.reservar() for _ in range(4)] == [0.0, 0.0, 1.0, 2.0]
+
+    # Em 3 s entram 3 fichas: a dívida de 2 é paga e sobra uma
+    relogio.avancar(3)
+    assert limitador.reservar() == 0.0
+    assert limitador.reservar() == 1.0
+
+
+def test_limitador_nao_acumula_mais_que_a_rajada():
+    relogio = RelogioFalso()
+    limitador = LimitadorTaxa(por_minuto=60, rajada=2, relogio=relogio)
+
+    relogio.avancar(3600)
+
+    assert [limitador.reservar() for _ in range(3)] == [0.0, 0.0, 1.0]
+
+
+def test_limitador_desativado_nunca_espera():
+    limitador = LimitadorTaxa(por_minuto=0, rajada=1, relogio=RelogioFalso())
+
+    assert {limitador.reservar() for _ in range(100)} == {0.0}
+
+
+def test_concorrencia_cai_pela_metade_no_maximo_uma_vez_por_intervalo():
+    relogio = RelogioFalso()
+    concorrencia = ConcorrenciaAdaptativa(maximo=8, relogio=relogio)
+
+    concorrencia.registrar_limitacao()
+    concorrencia.registrar_limitacao()
+    assert concorrencia.limite == 4
+
+    relogio.avancar(INTERVALO_REDUCAO)
+    concorrencia.registrar_limitacao()
+    relogio.avancar(INTERVALO_REDUCAO)
+    concorrencia.registrar_limitacao()
+    relogio.avancar(INTERVALO_REDUCAO)
+    concorrencia.registrar_limitacao()
+    assert concorrencia.limite == 1
+
+
+def test_concorrencia_sobe_uma_vaga_a_cada_limite_sucessos():
+    relogio = RelogioFalso()
+    concorrencia = ConcorrenciaAdaptativa(maximo=4, relogio=relogio)
+    concorrencia.registrar_limitacao()
+    assert concorrencia.limite == 2
+
+    concorrencia.registrar_sucesso()
+    assert int(concorrencia.limite) == 2
+    concorrencia.registrar_sucesso()
+    concorrencia.registrar_sucesso()
+    assert int(concorrencia.limite) == 3
+
+    for _ in range(20):
+        concorrencia.registrar_sucesso()
+    assert concorrencia.limite == 4
+
+
+def test_concorrencia_nao_passa_do_limite_atual():
+    concorrencia = ConcorrenciaAdaptativa(maximo=4, relogio=RelogioFalso())
+    concorrencia.registrar_limitacao()
+
+    assert [concorrencia._tentar_ocupar() for _ in range(3)] == [True, True, False]
+    concorrencia.liberar()
+    assert concorrencia._tentar_ocupar()
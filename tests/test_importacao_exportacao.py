@@ -0,0 +1,55 @@
+import json
+import pytest
+from sqlalchemy import select
+from modelo import CaixaEntrada, nova_sessao
+import importacao_exportacao
+from importacao_exportacao import gravar_em_lotes, importar
+
+
+def _conteudos():
+    with nova_sessao() as sessao:
+        return list(sessao.scalars(select(CaixaEntrada.conteudo_bruto).order_by(CaixaEntrada.id)))
+
+
+def test_arquivo_json_e_lido_como_lista(caixa_vazia, tmp_path):
+    caminho = tmp_path / "notas.json"
+    caminho.write_text(json.dumps(["comprar leite", {"texto": "ligar para o banco"}, {"outro": 1}], indent=2),
+                       encoding="utf-8")
+
+    assert importar(str(caminho)) == 2
+    assert _conteudos() == ["comprar leite", "ligar para o banco"]
+
+
+def test_arquivo_json_sem_lista_e_recusado(caixa_vazia, tmp_path):
+    caminho = tmp_path / "notas.json"
+    caminho.write_text('{"texto": "a"}\n{"texto": "b"}\n', encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        importar(str(caminho))
+    assert _conteudos() == []
+
+
+def test_pular_conta_registros_do_arquivo_e_nao_itens(caixa_vazia, tmp_path, monkeypatch):
+    monkeypatch.setattr(importacao_exportacao, "MAX_CARACTERES_ITEM", 10)
+    caminho = tmp_path / "notas.jsonl"
+    caminho.write_text("\n".join(json.dumps(registro) for registro in
+                                 ["primeiro\nsegundo\nterceiro", "curto", "outro"]), encoding="utf-8")
+
+    assert importar(str(caminho), pular=1) == 2
+    assert _conteudos() == ["curto", "outro"]
+
+
+def test_interrupcao_informa_o_pular_que_retoma_sem_duplicar(caixa_vazia, capsys, monkeypatch):
+    monkeypatch.setattr(importacao_exportacao, "MAX_CARACTERES_ITEM", 10)
+    registros = ["um", "dois\ndois bis", "tres", "quatro"]
+
+    def ate_cair():
+        yield from registros[:3]
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        gravar_em_lotes(ate_cair(), tamanho_lote=2)
+    assert "--pular 2." in capsys.readouterr().out
+
+    gravar_em_lotes(registros, tamanho_lote=2, pular=2)
+    assert _conteudos() == ["um", "dois", "dois bis", "tres", "quatro"]
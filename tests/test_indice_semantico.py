@@ -0,0 +1,70 @@
+import multiprocessing
+import numpy as np
+from indice_semantico import IndiceSemantico, _chave, vetorizar
+
+
+def _texto(item_id: int) -> str:
+    return f"nota {item_id} sobre assunto {item_id % 7}"
+
+
+def test_remocao_em_outra_instancia_nao_apaga_chave_alheia(tmp_path):
+    a = IndiceSemantico(str(tmp_path))
+    b = IndiceSemantico(str(tmp_path))
+    a.adicionar([('informacoes', 1, "orçamento da reforma")])
+    b.adicionar([('ideias', 7, "reforma da cozinha")])
+    # b removendo o próprio item não pode atingir a linha do item de a
+    b.remover('ideias', 7)
+    a.adicionar([('tarefas', 3, "pedir orçamento")])
+
+    recarregado = IndiceSemantico(str(tmp_path))
+
+    assert set(recarregado._linha_por_chave) == {_chave('informacoes', 1), _chave('tarefas', 3)}
+    assert len(a) == len(b) == 2
+    assert b.buscar_lote(["orçamento da reforma"], k=1)[0][0][:2] == ('informacoes', 1)
+
+
+def _acrescentar(diretorio: str, inicio: int) -> None:
+    indice = IndiceSemantico(diretorio)
+    for item_id in range(inicio, inicio + 200, 2):
+        indice.adicionar([('informacoes', item_id, _texto(item_id))])
+
+
+def test_acrescimos_concorrentes_mantem_vetor_e_chave_pareados(tmp_path):
+    contexto = multiprocessing.get_context("spawn")
+    processos = [contexto.Process(target=_acrescentar, args=(str(tmp_path), inicio)) for inicio in (1, 2)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join()
+        assert processo.exitcode == 0
+
+    indice = IndiceSemantico(str(tmp_path))
+
+    assert len(indice) == 200
+    for item_id in range(1, 201):
+        linha = indice._linha_por_chave[_chave('informacoes', item_id)]
+        assert np.allclose(indice._vetores[linha], vetorizar([_texto(item_id)])[0])
+
+
+def test_instancia_ve_itens_de_outra_sem_recarregar(tmp_path):
+    a = IndiceSemantico(str(tmp_path))
+    b = IndiceSemantico(str(tmp_path))
+    a.adicionar([('ideias', 5, "viagem de férias para a praia")])
+
+    assert b.buscar_lote(["férias na praia"], k=1)[0][0][:2] == ('ideias', 5)
+
+
+def test_compactacao_e_percebida_pelas_outras_instancias(tmp_path):
+    a = IndiceSemantico(str(tmp_path))
+    b = IndiceSemantico(str(tmp_path))
+    a.adicionar([('informacoes', item_id, _texto(item_id)) for item_id in range(1, 11)])
+    a._remover_chaves([_chave('informacoes', item_id) for item_id in range(1, 9)])
+    assert len(b) == 2
+    with a._exclusivo():
+        a._compactar()
+
+    b.adicionar([('ideias', 1, "item novo depois da compactação")])
+
+    assert set(IndiceSemantico(str(tmp_path))._linha_por_chave) == {
+        _chave('informacoes', 9), _chave('informacoes', 10), _chave('ideias', 1)}
+    assert len(a) == 3
@@ -0,0 +1,87 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from memoria_conversa import MemoriaConversa, estimar_tokens
+
+
+def _turno_com_ferramenta(memoria: MemoriaConversa, numero: int, tamanho: int = 200) -> None:
+    """Um turno completo: pergunta, chamada de ferramenta, resultado e resposta final."""
+    memoria.iniciar_turno(HumanMessage(content=f"pergunta {numero} " + "p" * tamanho))
+    memoria.adicionar(AIMessage(content="", tool_calls=[
+        {"id": f"chamada-{numero}", "name": "buscar_itens", "args": {"termo": str(numero)}}]))
+    memoria.adicionar(ToolMessage(content="resultado " + "r" * tamanho, tool_call_id=f"chamada-{numero}"))
+    memoria.adicionar(AIMessage(content=f"resposta {numero} " + "a" * tamanho))
+
+
+def _pares_de_ferramenta_intactos(mensagens) -> bool:
+    """Cada chamada de ferramenta tem o seu resultado logo em seguida, e nenhum resultado fica sem chamada."""
+    pendentes = set()
+    for mensagem in mensagens:
+        if isinstance(mensagem, ToolMessage):
+            if mensagem.tool_call_id not in pendentes:
+                return False
+            pendentes.discard(mensagem.tool_call_id)
+        else:
+            if pendentes:
+                return False
+            if isinstance(mensagem, AIMessage) and mensagem.tool_calls:
+                pendentes = {chamada["id"] for chamada in mensagem.tool_calls}
+    return True
+
+
+@pytest.mark.parametrize("max_tokens_resumo", [100, 1000])
+def test_janela_respeita_o_orcamento_de_tokens(max_tokens_resumo):
+    memoria = MemoriaConversa("sistema", max_tokens=400, max_tokens_resumo=max_tokens_resumo)
+
+    for numero in range(30):
+        _turno_com_ferramenta(memoria, numero)
+        memoria.iniciar_turno(HumanMessage(content="oi"))
+        assert memoria.total_tokens() <= 400
+        assert sum(estimar_tokens(linha) for linha in memoria.resumo) <= max_tokens_resumo
+    assert memoria.resumo
+
+
+def test_resumo_guarda_os_turnos_que_sairam_da_janela():
+    memoria = MemoriaConversa("sistema", max_tokens=700, max_tokens_resumo=1000)
+
+    for numero in range(3):
+        _turno_com_ferramenta(memoria, numero, tamanho=600)
+    memoria.iniciar_turno(HumanMessage(content="e agora?"))
+
+    sistema = memoria.mensagens()[0]
+    assert isinstance(sistema, SystemMessage)
+    for numero in range(2):
+        assert any(linha.startswith(f"- Usuário: pergunta {numero}") and f"Assistente: resposta {numero}" in linha
+                   for linha in memoria.resumo)
+        assert f"pergunta {numero}" in sistema.content
+    # O resumo guarda as falas, não as chamadas de ferramenta nem os resultados
+    assert "resultado" not in sistema.content
+
+
+def test_turno_atual_mantem_as_chamadas_de_ferramenta_e_os_anteriores_as_perdem():
+    memoria = MemoriaConversa("sistema")
+    _turno_com_ferramenta(memoria, 1, tamanho=10)
+
+    atual = memoria.mensagens()
+    assert [type(m) for m in atual[1:]] == [HumanMessage, AIMessage, ToolMessage, AIMessage]
+
+    memoria.iniciar_turno(HumanMessage(content="próxima"))
+
+    assert [type(m) for m in memoria.mensagens()[1:]] == [HumanMessage, AIMessage, HumanMessage]
+    assert not any(isinstance(m, ToolMessage) or getattr(m, "tool_calls", None) for m in memoria.mensagens())
+
+
+def test_chamada_e_resultado_de_ferramenta_nunca_sao_separados():
+    memoria = MemoriaConversa("sistema", max_tokens=300, max_tokens_resumo=80)
+
+    for numero in range(20):
+        memoria.iniciar_turno(HumanMessage(content=f"pergunta {numero} " + "p" * (numero * 20)))
+        assert _pares_de_ferramenta_intactos(memoria.mensagens())
+        for passo in range(numero % 3):
+            chamada = f"chamada-{numero}-{passo}"
+            memoria.adicionar(AIMessage(content="", tool_calls=[{"id": chamada, "name": "contar", "args": {}}]))
+            memoria.adicionar(ToolMessage(content="r" * 300, tool_call_id=chamada))
+            assert _pares_de_ferramenta_intactos(memoria.mensagens())
+        memoria.adicionar(AIMessage(content=f"resposta {numero}"))
+        assert _pares_de_ferramenta_intactos(memoria.mensagens())
+        # A janela sempre começa numa fala do usuário, logo depois do prompt de sistema
+        assert isinstance(memoria.mensagens()[1], HumanMessage)
@@ -0,0 +1,100 @@
+import sqlite3
+import pytest
+from sqlalchemy import create_engine, inspect
+from migracoes import MIGRACOES, aplicar_migracoes
+
+# Esquema do conceitos.db antes das migrações (user_version 0): associações sem chave primária,
+# CaixaEntrada só com o conteúdo, sem índice de busca
+ESQUEMA_VERSAO_0 = """
+CREATE TABLE informacoes (id INTEGER PRIMARY KEY, conteudo VARCHAR NOT NULL UNIQUE);
+CREATE TABLE ideias (id INTEGER PRIMARY KEY, conteudo VARCHAR NOT NULL);
+CREATE TABLE planos (id INTEGER PRIMARY KEY, ideia_id INTEGER REFERENCES ideias (id));
+CREATE TABLE tarefas (id INTEGER PRIMARY KEY, conteudo VARCHAR NOT NULL, plano_id INTEGER REFERENCES planos (id));
+CREATE TABLE caixa_de_entrada (id INTEGER PRIMARY KEY, conteudo_bruto VARCHAR NOT NULL);
+CREATE TABLE ideia_informacao_association (ideia_id INTEGER REFERENCES ideias (id),
+                                           informacao_id INTEGER REFERENCES informacoes (id));
+CREATE TABLE tarefa_informacao_association (tarefa_id INTEGER REFERENCES tarefas (id),
+                                            informacao_id INTEGER REFERENCES informacoes (id));
+INSERT INTO informacoes (id, conteudo) VALUES (1, 'Reunião de condomínio na quinta');
+INSERT INTO ideias (id, conteudo) VALUES (1, 'Propor horta no condomínio');
+INSERT INTO caixa_de_entrada (id, conteudo_bruto) VALUES (1, 'ligar para o síndico');
+INSERT INTO ideia_informacao_association VALUES (1, 1), (1, 1), (NULL, 1);
+"""
+
+
+def _esquema(engine) -> dict:
+    """Colunas e índices de cada tabela, para comparar bancos."""
+    inspetor = inspect(engine)
+    return {
+        tabela: ({c["name"] for c in inspetor.get_columns(tabela)}, {i["name"] for i in inspetor.get_indexes(tabela)})
+        for tabela in inspetor.get_table_names() if not tabela.startswith("busca_fts")
+    }
+
+
+def test_banco_na_versao_0_chega_a_ultima_versao(tmp_path):
+    caminho = tmp_path / "antigo.db"
+    with sqlite3.connect(caminho) as conexao:
+        conexao.executescript(ESQUEMA_VERSAO_0)
+    engine = create_engine(f"sqlite:///{caminho}")
+
+    aplicar_migracoes(engine)
+
+    with engine.connect() as conexao:
+        assert conexao.exec_driver_sql("PRAGMA user_version").scalar() == len(MIGRACOES)
+        # Vínculos duplicados ou nulos somem com a chave composta
+        assert conexao.exec_driver_sql("SELECT * FROM ideia_informacao_association").all() == [(1, 1)]
+        assert conexao.exec_driver_sql(
+            "SELECT status, tentativas FROM caixa_de_entrada WHERE id = 1").one() == ("pendente", 0)
+        # O índice de busca foi populado com as linhas já existentes
+        assert conexao.exec_driver_sql(
+            "SELECT rowid FROM busca_fts WHERE busca_fts MATCH 'sindico'").scalar() == 1 * 4 + 0
+
+    novo = create_engine(f"sqlite:///{tmp_path / 'novo.db'}")
+    aplicar_migracoes(novo)
+    assert _esquema(engine) == _esquema(novo)
+    assert "ix_caixa_de_entrada_status_id" in _esquema(engine)["caixa_de_entrada"][1]
+
+
+def test_migracoes_sao_idempotentes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'banco.db'}")
+    aplicar_migracoes(engine)
+    with engine.begin() as conexao:
+        conexao.exec_driver_sql("PRAGMA user_version = 0")
+
+    aplicar_migracoes(engine)
+
+    with engine.connect() as conexao:
+        assert conexao.exec_driver_sql("PRAGMA user_version").scalar() == len(MIGRACOES)
+
+
+def _falhar_depois_de(migracao):
+    def falha(conexao):
+        migracao(conexao)
+        raise RuntimeError("queda simulada")
+    falha.__doc__ = migracao.__doc__
+    return falha
+
+
+def test_migracao_que_falha_nao_deixa_nada_gravado(tmp_path, monkeypatch):
+    import migracoes
+    caminho = tmp_path / "antigo.db"
+    with sqlite3.connect(caminho) as conexao:
+        conexao.executescript(ESQUEMA_VERSAO_0)
+    engine = create_engine(f"sqlite:///{caminho}")
+    # A migração 2 cria o índice de busca e cai antes do commit
+    monkeypatch.setattr(migracoes, "MIGRACOES", [MIGRACOES[0], _falhar_depois_de(MIGRACOES[1]), *MIGRACOES[2:]])
+
+    with pytest.raises(RuntimeError):
+        aplicar_migracoes(engine)
+
+    with engine.connect() as conexao:
+        assert conexao.exec_driver_sql("PRAGMA user_version").scalar() == 1
+        assert "busca_fts" not in inspect(conexao).get_table_names()
+
+    monkeypatch.setattr(migracoes, "MIGRACOES", MIGRACOES)
+    aplicar_migracoes(engine)
+
+    with engine.connect() as conexao:
+        assert conexao.exec_driver_sql("PRAGMA user_version").scalar() == len(MIGRACOES)
+        assert conexao.exec_driver_sql(
+            "SELECT rowid FROM busca_fts WHERE busca_fts MATCH 'sindico'").scalar() == 1 * 4 + 0
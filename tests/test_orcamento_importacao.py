@@ -0,0 +1,19 @@
+from orcamento_importacao import resumo_erro
+
+
+def test_resumo_erro_mostra_o_traceback_e_nao_so_a_ultima_linha():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 | os",
+        "Traceback (most recent call last):",
+        '  File "<string>", line 1, in <module>',
+        "import time:        80 |         80 | infos_n_tasks",
+        "AttributeError: 'NoneType' object has no attribute 'split'",
+        "sys:1: ResourceWarning: unclosed file",
+    ])
+
+    resumo = resumo_erro(stderr)
+
+    assert resumo.startswith("Traceback (most recent call last):")
+    assert "AttributeError: 'NoneType' object has no attribute 'split'" in resumo
+    assert "import time:" not in resumo
@@ -0,0 +1,111 @@
+import asyncio
+import prefetch_propostas
+from prefetch_propostas import PrefetchPropostas
+
+
+def _llm_contado(monkeypatch):
+    """Substitui a extração por uma versão falsa que registra cada conteúdo enviado ao LLM."""
+    chamadas = []
+
+    async def aprocessar_item_com_llm(conteudo, messages_history=None):
+        chamadas.append(conteudo)
+        await asyncio.sleep(0.01)
+        return f"proposta de {conteudo}"
+
+    monkeypatch.setattr(prefetch_propostas, "aprocessar_item_com_llm", aprocessar_item_com_llm)
+    return chamadas
+
+
+def test_n_itens_custam_n_chamadas_ao_llm(monkeypatch):
+    chamadas = _llm_contado(monkeypatch)
+    fila = [(item_id, f"item {item_id}") for item_id in range(1, 7)]
+
+    async def revisar_todos():
+        prefetch = PrefetchPropostas(profundidade=3)
+        propostas = []
+        while fila:
+            # Mesma ordem do bot: reivindica o item, espia os seguintes, agenda e obtém a proposta
+            item_id, conteudo = fila.pop(0)
+            prefetch.agendar(fila[:prefetch.profundidade], atual=item_id)
+            propostas.append(await prefetch.obter(item_id, conteudo))
+        prefetch.cancelar()
+        return propostas
+
+    propostas = asyncio.run(revisar_todos())
+
+    assert propostas == [f"proposta de item {i}" for i in range(1, 7)]
+    assert sorted(chamadas) == [f"item {i}" for i in range(1, 7)]
+
+
+def test_conteudo_alterado_recalcula(monkeypatch):
+    chamadas = _llm_contado(monkeypatch)
+
+    async def cenario():
+        prefetch = PrefetchPropostas(profundidade=2)
+        prefetch.agendar([(1, "antes")])
+        await asyncio.sleep(0)
+        return await prefetch.obter(1, "depois")
+
+    assert asyncio.run(cenario()) == "proposta de depois"
+    assert chamadas == ["antes", "depois"]
+
+
+def test_item_fora_da_janela_e_cancelado(monkeypatch):
+    chamadas = _llm_contado(monkeypatch)
+
+    async def cenario():
+        prefetch = PrefetchPropostas(profundidade=2)
+        prefetch.agendar([(1, "um"), (2, "dois")])
+        await asyncio.sleep(0)
+        prefetch.agendar([(2, "dois"), (3, "tres")])
+        await asyncio.sleep(0.05)
+        ativos = sorted(prefetch._reservas)
+        prefetch.cancelar()
+        return ativos
+
+    assert asyncio.run(cenario()) == [2, 3]
+    assert sorted(chamadas) == ["dois", "tres", "um"]
+
+
+def test_dois_chats_compartilham_as_extracoes(monkeypatch):
+    chamadas = _llm_contado(monkeypatch)
+    fila = [(item_id, f"compartilhado {item_id}") for item_id in range(1, 7)]
+
+    async def revisar_em_dois_chats():
+        chats = [PrefetchPropostas(profundidade=3), PrefetchPropostas(profundidade=3)]
+        propostas = []
+        vez = 0
+        while fila:
+            # Os dois chats espiam a mesma fila; cada um reivindica o próximo item na sua vez
+            for prefetch in chats:
+                prefetch.agendar(fila[:prefetch.profundidade])
+            await asyncio.sleep(0)
+            item_id, conteudo = fila.pop(0)
+            prefetch = chats[vez % 2]
+            prefetch.agendar(fila[:prefetch.profundidade], atual=item_id)
+            propostas.append(await prefetch.obter(item_id, conteudo))
+            vez += 1
+        for prefetch in chats:
+            prefetch.cancelar()
+        return propostas
+
+    propostas = asyncio.run(revisar_em_dois_chats())
+
+    assert propostas == [f"proposta de compartilhado {i}" for i in range(1, 7)]
+    assert sorted(chamadas) == [f"compartilhado {i}" for i in range(1, 7)]
+    assert prefetch_propostas._em_andamento == {}
+
+
+def test_cancelar_um_chat_mantem_a_extracao_do_outro(monkeypatch):
+    chamadas = _llm_contado(monkeypatch)
+
+    async def cenario():
+        chat_a, chat_b = PrefetchPropostas(profundidade=2), PrefetchPropostas(profundidade=2)
+        chat_a.agendar([(1, "um")])
+        chat_b.agendar([(1, "um")])
+        await asyncio.sleep(0)
+        chat_a.cancelar()
+        return await chat_b.obter(1, "um")
+
+    assert asyncio.run(cenario()) == "proposta de um"
+    assert chamadas == ["um"]
@@ -0,0 +1,99 @@
+import asyncio
+from sqlalchemy import insert, text
+from modelo import CaixaEntrada, nova_sessao
+from fila_caixa_entrada import contar_por_status
+from graph import SuggestionClasses
+import processamento_lote
+
+
+def _popular(quantidade):
+    with nova_sessao() as sessao:
+        sessao.execute(insert(CaixaEntrada), [{"conteudo_bruto": f"item {i}"} for i in range(quantidade)])
+
+
+def test_lote_guarda_propostas_para_revisao(caixa_vazia, monkeypatch):
+    async def extrair(itens):
+        return {item_id: SuggestionClasses(informacoes=[conteudo]) for item_id, conteudo in itens}
+
+    monkeypatch.setattr(processamento_lote, "aprocessar_itens_em_lote", extrair)
+    _popular(5)
+
+    progresso = asyncio.run(processamento_lote.processar_lote(workers=2))
+
+    assert progresso.concluidos == 5
+    assert contar_por_status()["aguardando_revisao"] == 5
+    assert [conteudo for _, conteudo, _ in processamento_lote.listar_pendentes()] == [f"item {i}" for i in range(5)]
+
+
+def test_falha_do_lote_inteiro_nao_deixa_itens_presos(caixa_vazia, monkeypatch):
+    async def extrair(itens):
+        raise RuntimeError("cache indisponível")
+
+    monkeypatch.setattr(processamento_lote, "aprocessar_itens_em_lote", extrair)
+    _popular(3)
+
+    progresso = asyncio.run(processamento_lote.processar_lote(workers=1))
+
+    situacao = contar_por_status()
+    assert progresso.erros == 3
+    assert situacao["em_processamento"] == 0
+    assert situacao["adiados"] == 3
+
+
+def test_cancelamento_devolve_os_itens_a_fila(caixa_vazia, monkeypatch):
+    iniciou = asyncio.Event()
+
+    async def extrair(itens):
+        iniciou.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(processamento_lote, "aprocessar_itens_em_lote", extrair)
+    _popular(3)
+
+    async def interromper():
+        tarefa = asyncio.create_task(processamento_lote.processar_lote(workers=1))
+        await iniciou.wait()
+        tarefa.cancel()
+        try:
+            await tarefa
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(interromper())
+
+    situacao = contar_por_status()
+    assert situacao["em_processamento"] == 0
+    assert situacao["disponiveis"] == 3
+
+
+def test_item_rejeitado_recebe_proposta_nova_e_nao_a_do_cache(caixa_vazia, monkeypatch):
+    import graph
+    chamadas = []
+
+    async def extrair_lote(itens):
+        chamadas.append([item_id for item_id, _ in itens])
+        return {item_id: SuggestionClasses(ideias=[f"{conteudo} (proposta {len(chamadas)})"])
+                for item_id, conteudo in itens}
+
+    monkeypatch.setattr(graph, "_extrair_lote", extrair_lote)
+    with nova_sessao() as sessao:
+        sessao.execute(insert(CaixaEntrada), [{"conteudo_bruto": "rejeitar: regar as plantas"},
+                                              {"conteudo_bruto": "rejeitar: consertar a torneira"}])
+    asyncio.run(processamento_lote.processar_lote(workers=1))
+    (rejeitado, conteudo, proposta), _ = processamento_lote.listar_pendentes()
+    # Uma proposta individual do mesmo conteúdo também não pode voltar
+    graph.cache_propostas.guardar(graph._chave_se_cacheavel(conteudo, None), proposta.model_dump_json())
+
+    processamento_lote.rejeitar_pendente(rejeitado)
+    with nova_sessao() as sessao:
+        sessao.execute(text("UPDATE caixa_de_entrada SET adiada_ate = 0 WHERE id = :id"), {"id": rejeitado})
+
+    async def extrair_individual(conteudo, messages_history=None):
+        return (await extrair_lote([(rejeitado, conteudo)]))[rejeitado]
+
+    monkeypatch.setattr(graph, "aprocessar_item_com_llm", extrair_individual)
+    asyncio.run(processamento_lote.processar_lote(workers=1))
+
+    pendentes = {item_id: nova for item_id, _, nova in processamento_lote.listar_pendentes()}
+    assert len(chamadas) == 2
+    assert pendentes[rejeitado].ideias == [f"{conteudo} (proposta 2)"]
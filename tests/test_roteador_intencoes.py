@@ -0,0 +1,42 @@
+import pytest
+from roteador_intencoes import Intencao, rotear
+
+
+@pytest.mark.parametrize("mensagem", [
+    "não processa agora",
+    "nao processe a caixa ainda",
+    "ainda não processa",
+    "nunca processar tudo",
+    "não quantos itens",
+])
+def test_negacoes_vao_para_o_llm(mensagem):
+    assert rotear(mensagem) is None
+
+
+@pytest.mark.parametrize("mensagem, ferramenta", [
+    ("processa a caixa", "processar_caixa_entrada"),
+    ("quantos itens?", "verificar_status_caixa_entrada"),
+])
+def test_comandos_sem_argumentos(mensagem, ferramenta):
+    assert rotear(mensagem) == Intencao(ferramenta, {})
+
+
+@pytest.mark.parametrize("mensagem, conteudo", [
+    ("anota: comprar leite", "comprar leite"),
+    ("adiciona na caixa de entrada: não esquecer o guarda-chuva", "não esquecer o guarda-chuva"),
+    ("anota aí comprar leite", "comprar leite"),
+    ("anota que a reunião mudou para sexta", "a reunião mudou para sexta"),
+    ("anota aí que o Pedro ligou", "o Pedro ligou"),
+])
+def test_capturas(mensagem, conteudo):
+    assert rotear(mensagem) == Intencao("adicionar_na_caixa_entrada", {"conteudo": conteudo})
+
+
+@pytest.mark.parametrize("mensagem", ["anota aí", "anota que", "anota isso aí", "anote aí pra mim"])
+def test_captura_livre_sem_conteudo_vai_para_o_llm(mensagem):
+    assert rotear(mensagem) is None
+
+
+def test_busca():
+    assert rotear("busca copel") == Intencao("buscar_itens", {"termo": "copel"})
+    assert rotear("procura por qual é a melhor forma de organizar minhas ideias da semana") is None